@@ -1,16 +1,152 @@
-"""Deduplication by URL hash."""
-import hashlib
-from typing import List
+"""Deduplication: canonical URLs plus MinHash-LSH near-duplicate detection."""
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import numpy as np
 from agent.state import Article
 
+_near_threshold = float(os.getenv("DEDUPE_NEAR_THRESHOLD", "0.7"))
+
+_NUM_PERM = 128
+_BANDS = 32  # 32 bands x 4 rows: pairs above ~0.45 Jaccard usually share a bucket
+_ROWS = _NUM_PERM // _BANDS
+_PRIME = 4294967311  # > 2**32, so (a * h + b) % p stays a universal hash over crc32 values
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 2 ** 31, size=_NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2 ** 31, size=_NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Click ids and campaign tags added by ad/analytics platforms; never part of the content address
+_TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi", "guccounter", "guce_referrer", "guce_referrer_sig",
+}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Dedupe key for a URL, so tracking variants of the same page compare equal.
+
+    https scheme, lower-case host without www. or default port, no fragment,
+    no utm_* or known click-id parameters, remaining parameters sorted, no
+    trailing slash. This is a comparison key only; articles keep the URL as
+    fetched.
+    """
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url
+
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def _shingles(text: str, size: int = 3) -> List[str]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of the word 3-gram set, or None for empty text."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in set(shingles)), dtype=np.uint64)
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """
+    Incremental LSH index of representative articles, bucketed per ticker.
+
+    add() returns the representative an article duplicates (after attaching
+    the article to its raw["duplicates"]), or None if the article is new and
+    becomes a representative itself. Each article is compared only with the
+    representatives it shares an LSH band with, so a batch costs near-linear time.
+    """
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = threshold if threshold is not None else _near_threshold
+        self._by_url: Dict[str, Article] = {}  # canonical URL -> representative
+        self._buckets: Dict[Tuple[str, int, bytes], List[int]] = {}
+        self._reps: List[Tuple[Article, np.ndarray]] = []
+
+    @staticmethod
+    def _attach(representative: Article, duplicate: Article, reason: str):
+        raw = dict(representative.raw or {})
+        raw["duplicates"] = [
+            *raw.get("duplicates", []),
+            {"url": duplicate.url, "source": duplicate.source, "title": duplicate.title, "match": reason},
+        ]
+        representative.raw = raw
+
+    def add(self, article: Article) -> Optional[Article]:
+        key = canonicalize_url(article.url)
+        existing = self._by_url.get(key)
+        if existing is not None:
+            if existing is not article:
+                self._attach(existing, article, "url")
+            return existing
+        self._by_url[key] = article
+
+        signature = minhash_signature(f"{article.title} {article.summary or ''}")
+        if signature is None:
+            return None
+        bands = [signature[b * _ROWS:(b + 1) * _ROWS].tobytes() for b in range(_BANDS)]
+
+        candidates = set()
+        for b, band in enumerate(bands):
+            candidates.update(self._buckets.get((article.ticker, b, band), ()))
+        for rep_id in sorted(candidates):
+            representative, rep_signature = self._reps[rep_id]
+            if float(np.mean(rep_signature == signature)) >= self.threshold:
+                self._attach(representative, article, "content")
+                self._by_url[key] = representative
+                return representative
+
+        rep_id = len(self._reps)
+        self._reps.append((article, signature))
+        for b, band in enumerate(bands):
+            self._buckets.setdefault((article.ticker, b, band), []).append(rep_id)
+        return None
+
+
+def dedupe_articles(articles: List[Article], index: Optional[NearDuplicateIndex] = None) -> List[Article]:
+    """
+    Drop URL-variant and near-duplicate articles, keeping the first of each group.
+
+    Dropped copies are listed in the kept article's raw["duplicates"]. Pass
+    the same index across calls to dedupe a stream batch by batch.
+    """
+    index = index or NearDuplicateIndex()
+    return [article for article in articles if index.add(article) is None]
+
+
 def dedupe_by_url(articles: List[Article]) -> List[Article]:
-    """Remove duplicate articles by URL."""
+    """Remove duplicate articles by canonical URL, keeping the first as fetched."""
     seen = set()
     unique = []
     for article in articles:
-        url_hash = hashlib.md5(article.url.encode()).hexdigest()
-        if url_hash not in seen:
-            seen.add(url_hash)
+        key = canonicalize_url(article.url)
+        if key not in seen:
+            seen.add(key)
             unique.append(article)
     return unique
-
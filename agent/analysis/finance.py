@@ -1,35 +1,95 @@
 """Finance analysis: sentiment and impact scoring."""
-from typing import List
+import re
+from typing import List, Sequence
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
 from agent.state import Article, PriceSnapshot
 
+# Weighted finance lexicon: positive terms > 0, negative < 0
+LEXICON = {
+    # positive
+    "beat": 1.0, "beats": 1.0, "surge": 1.0, "surges": 1.0, "soar": 1.0, "soars": 1.0,
+    "rally": 0.8, "rallies": 0.8, "jump": 0.7, "jumps": 0.7, "upgrade": 1.0, "upgraded": 1.0,
+    "outperform": 0.8, "bullish": 1.0, "record": 0.5, "profit": 0.5, "profits": 0.5,
+    "gain": 0.6, "gains": 0.6, "rise": 0.5, "rises": 0.5, "growth": 0.6, "strong": 0.6,
+    "positive": 0.5, "up": 0.3,
+    # negative
+    "miss": -1.0, "misses": -1.0, "missed": -1.0, "plunge": -1.0, "plunges": -1.0,
+    "slump": -0.8, "slumps": -0.8, "downgrade": -1.0, "downgraded": -1.0, "underperform": -0.8,
+    "bearish": -1.0, "lawsuit": -0.6, "recall": -0.5, "layoffs": -0.5, "loss": -0.7, "losses": -0.7,
+    "fall": -0.6, "falls": -0.6, "drop": -0.6, "drops": -0.6, "decline": -0.6, "declines": -0.6,
+    "weak": -0.6, "cut": -0.4, "cuts": -0.4, "negative": -0.5, "down": -0.3,
+}
+NEGATED_WEIGHT = 0.5  # "not strong" is weakly negative, not strongly
+
+# One pass: an optional negator followed by a word; a negated word becomes "not_<word>"
+_TOKEN_RE = re.compile(r"\b(?:(not|no|never|without|cannot|[a-z]+n't)\s+)?([a-z]+)\b")
+
+_vectorizer = None
+_weights = None
+
+
+def _tokens(text: str) -> List[str]:
+    return [f"not_{word}" if negator else word for negator, word in _TOKEN_RE.findall(text.lower())]
+
+
+def _get_vectorizer():
+    """Count vectorizer over the lexicon (plain and negated forms) and the matching weight vector."""
+    global _vectorizer, _weights
+    if _vectorizer is None:
+        vocabulary = list(LEXICON) + [f"not_{word}" for word in LEXICON]
+        _weights = np.array(
+            list(LEXICON.values()) + [-NEGATED_WEIGHT * w for w in LEXICON.values()], dtype=np.float64
+        )
+        _vectorizer = CountVectorizer(analyzer=_tokens, vocabulary=vocabulary)
+    return _vectorizer, _weights
+
+
+def batch_sentiment(texts: Sequence[str]) -> np.ndarray:
+    """
+    Sentiment in (-1, 1) for every text at once.
+
+    score = sum(weights of matched terms) / (sum of |weights| + 1), so more
+    (and stronger) agreeing terms push the score towards +-1.
+    """
+    if not len(texts):
+        return np.zeros(0)
+    vectorizer, weights = _get_vectorizer()
+    counts = vectorizer.transform(texts)
+    raw = counts @ weights
+    magnitude = counts @ np.abs(weights)
+    return raw / (magnitude + 1)
+
+
 def simple_sentiment(text: str) -> float:
     """Simple sentiment score (-1 to 1)."""
-    text_lower = text.lower()
-    positive = sum(1 for word in ["up", "gain", "rise", "growth", "beat", "strong", "bullish", "positive"])
-    negative = sum(1 for word in ["down", "fall", "drop", "loss", "miss", "weak", "bearish", "negative", "decline"])
-    if positive + negative == 0:
-        return 0.0
-    return (positive - negative) / (positive + negative + 1)
+    return float(batch_sentiment([text])[0])
+
 
 def score_impact(articles: List[Article], prices: List[PriceSnapshot]) -> List[Article]:
     """Score article impact based on relevance, sentiment, and price context."""
+    if not articles:
+        return articles
     price_map = {p.ticker: p for p in prices}
 
-    for article in articles:
-        # Sentiment
-        text = f"{article.title} {article.summary or ''}"
-        article.sentiment = simple_sentiment(text)
+    # Sentiment (already set when the streaming pipeline scored it on arrival)
+    unscored = [a for a in articles if a.sentiment is None]
+    if unscored:
+        scores = batch_sentiment([f"{a.title} {a.summary or ''}" for a in unscored])
+        for article, score in zip(unscored, scores.tolist()):
+            article.sentiment = score
 
-        # Impact = relevance * |sentiment| * price_magnitude_factor
-        relevance = article.relevance or 0.0
-        sentiment_mag = abs(article.sentiment or 0.0)
-        price = price_map.get(article.ticker)
-        price_factor = 1.0
-        if price and price.d1_change:
-            # Higher price volatility increases impact potential
-            price_factor = 1.0 + abs(price.d1_change) / 100.0
+    sentiment = np.array([a.sentiment for a in articles], dtype=np.float64)
+    relevance = np.array([a.relevance or 0.0 for a in articles], dtype=np.float64)
+    d1_change = np.array([
+        (price_map[a.ticker].d1_change or 0.0) if a.ticker in price_map else 0.0
+        for a in articles
+    ], dtype=np.float64)
 
-        article.impact = relevance * sentiment_mag * price_factor
+    # Impact = relevance * |sentiment| * price_magnitude_factor;
+    # higher price volatility increases impact potential
+    impact = relevance * np.abs(sentiment) * (1.0 + np.abs(d1_change) / 100.0)
+    for article, value in zip(articles, impact.tolist()):
+        article.impact = value
 
     return articles
-
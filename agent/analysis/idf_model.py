@@ -0,0 +1,153 @@
+"""Persistent document-frequency statistics for corpus-level IDF, updated incrementally."""
+import os
+import json
+import hashlib
+import threading
+import contextlib
+import structlog
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Sequence
+from sklearn.feature_extraction.text import CountVectorizer
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer is assumed
+    fcntl = None
+
+logger = structlog.get_logger()
+
+_model_path = os.getenv("IDF_MODEL_PATH", os.path.join(os.getenv("CACHE_DIR", ".cache"), "idf_model.json"))
+_max_tracked_docs = int(os.getenv("IDF_MAX_TRACKED_DOCS", "200000"))
+
+
+def _doc_hash(text: str) -> str:
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()[:16]
+
+
+class IdfModel:
+    """
+    Document frequencies over every article seen so far, stored as JSON.
+
+    update() counts each distinct document once (by content hash), so
+    re-scoring the same articles does not skew the statistics. save() merges
+    this process's pending counts into the file under a lock, so workers
+    sharing the file do not overwrite each other.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.n_docs = 0
+        self.df: Counter = Counter()
+        self._seen: Dict[str, None] = {}  # insertion-ordered set of doc hashes
+        self._pending: Dict[str, List[str]] = {}  # doc hash -> distinct terms, not yet saved
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {"n_docs": 0, "df": {}, "seen": []}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read IDF model, starting empty", path=self.path, error=str(e))
+            return {"n_docs": 0, "df": {}, "seen": []}
+
+    def _load(self):
+        data = self._read()
+        self.n_docs = data["n_docs"]
+        self.df = Counter(data["df"])
+        self._seen = dict.fromkeys(data["seen"])
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(self, texts: Sequence[str]) -> int:
+        """Count documents not seen before. Returns how many were new."""
+        with self._lock:
+            new_docs: Dict[str, str] = {}
+            for text in texts:
+                key = _doc_hash(text)
+                if key not in self._seen and key not in new_docs:
+                    new_docs[key] = text
+            if not new_docs:
+                return 0
+
+            # Binary counts: one per document containing the term
+            counter = CountVectorizer(binary=True)
+            try:
+                presence = counter.fit_transform(new_docs.values()).tocsr()
+                vocabulary = counter.get_feature_names_out()
+            except ValueError:  # no tokens at all
+                presence, vocabulary = None, []
+            for row, key in enumerate(new_docs):
+                terms = []
+                if presence is not None:
+                    columns = presence.indices[presence.indptr[row]:presence.indptr[row + 1]]
+                    terms = vocabulary[columns].tolist()
+                self._pending[key] = terms
+                self._seen[key] = None
+            if presence is not None:
+                doc_freq = np.asarray(presence.sum(axis=0)).ravel()
+                self.df.update(dict(zip(vocabulary, doc_freq.tolist())))
+            self.n_docs += len(new_docs)
+            return len(new_docs)
+
+    def idf(self, terms: Sequence[str]) -> np.ndarray:
+        """Smoothed IDF, ln((1 + n) / (1 + df)) + 1, as in scikit-learn."""
+        with self._lock:
+            df = np.array([self.df.get(term, 0) for term in terms], dtype=np.float64)
+            return np.log((1 + self.n_docs) / (1 + df)) + 1
+
+    def save(self):
+        """Merge pending documents into the file (skipping any another process already counted) and reload."""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._file_lock():
+                data = self._read()
+                df = Counter(data["df"])
+                seen = dict.fromkeys(data["seen"])
+                n_docs = data["n_docs"]
+                for key, terms in self._pending.items():
+                    if key in seen:
+                        continue
+                    seen[key] = None
+                    df.update(terms)
+                    n_docs += 1
+                tracked = list(seen)[-_max_tracked_docs:]
+
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"n_docs": n_docs, "df": dict(df), "seen": tracked}, f)
+                os.replace(tmp_path, self.path)
+
+            self.n_docs, self.df, self._seen = n_docs, df, dict.fromkeys(tracked)
+            self._pending = {}
+            logger.info("Saved IDF model", path=self.path, n_docs=self.n_docs, terms=len(self.df))
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_idf_model() -> IdfModel:
+    """Process-wide model, loaded from IDF_MODEL_PATH on first use."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = IdfModel(_model_path)
+    return _model
@@ -1,10 +1,20 @@
 """NLP analysis: relevance scoring via TF-IDF."""
 from typing import List
-from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
 from agent.state import Article
+from agent.analysis.idf_model import get_idf_model
+
 
 def score_articles(articles: List[Article], tickers: List[str]) -> List[Article]:
-    """Score article relevance using TF-IDF baseline."""
+    """
+    Score article relevance using TF-IDF baseline.
+
+    IDF comes from the persistent corpus model (updated with this batch
+    first), so scores are comparable across runs; relevance is the row sum
+    of the L2-normalized TF-IDF matrix over the ticker terms.
+    """
     if not articles:
         return articles
 
@@ -17,20 +27,18 @@ def score_articles(articles: List[Article], tickers: List[str]) -> List[Article]
     # TF-IDF on ticker-related terms
     ticker_terms = [t.lower() for t in tickers]
     ticker_terms.extend(["stock", "shares", "earnings", "revenue", "growth", "price", "market"])
-
-    vectorizer = TfidfVectorizer(
-        ngram_range=(1, 2),
-        max_features=100,
-        vocabulary=ticker_terms,
-        min_df=1,
-    )
+    ticker_terms = list(dict.fromkeys(ticker_terms))
 
     try:
-        tfidf_matrix = vectorizer.fit_transform(texts)
-        # Simple relevance = sum of ticker term scores
-        for i, article in enumerate(articles):
-            scores = tfidf_matrix[i].toarray()[0]
-            article.relevance = float(scores.sum()) if len(scores) > 0 else 0.0
+        model = get_idf_model()
+        model.update(texts)
+        model.save()
+
+        counts = CountVectorizer(vocabulary=ticker_terms).transform(texts)
+        tfidf = normalize(counts.multiply(model.idf(ticker_terms)).tocsr(), norm="l2")
+        relevance = np.asarray(tfidf.sum(axis=1)).ravel()
+        for article, score in zip(articles, relevance.tolist()):
+            article.relevance = float(score)
     except ValueError:
         # Fallback: simple keyword count
         for article in articles:
@@ -39,4 +47,3 @@ def score_articles(articles: List[Article], tickers: List[str]) -> List[Article]
             article.relevance = float(count) / len(ticker_terms) if ticker_terms else 0.0
 
     return articles
-
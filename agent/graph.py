@@ -1,103 +1,184 @@
 """LangGraph agent orchestration."""
+import os
+import time
+import functools
+import threading
+from typing import Any, Callable, Dict
 from langgraph.graph import StateGraph, END
 from agent.state import RunState
 from agent.tools.tavily_client import fetch_news_for_tickers
 from agent.tools.rss_client import fetch_rss_fallback
 from agent.tools.alpha_vantage import fetch_prices_snapshot
-from agent.analysis.dedupe import dedupe_by_url
+from agent.analysis.dedupe import dedupe_articles
+from agent.pipeline import stream_news
 from agent.analysis.nlp import score_articles
 from agent.analysis.finance import score_impact
 from agent.reporting.render import render_and_store_report
 from memory.vector_store import upsert_embeddings_for_articles
 from memory.kv_store import create_run, update_run_status
+from memory.supabase_client import get_supabase_client
+from memory.seen_index import get_seen_index
 import structlog
 
 logger = structlog.get_logger()
 
+_pipeline_mode = os.getenv("PIPELINE_MODE", "batch").lower()  # batch | streaming
 
-def plan(state: RunState) -> RunState:
+
+def _timed(name: str, node: Callable[[RunState], Dict[str, Any]]):
+    """Wrap a node so its wall-clock time is recorded in state.timings."""
+    @functools.wraps(node)
+    def wrapper(state: RunState) -> Dict[str, Any]:
+        start = time.perf_counter()
+        update = dict(node(state) or {})
+        elapsed = round(time.perf_counter() - start, 3)
+        update["timings"] = {**update.get("timings", {}), name: elapsed}
+        logger.info("Node finished", node=name, seconds=elapsed, run_id=update.get("run_id") or state.run_id)
+        return update
+    return wrapper
+
+
+def plan(state: RunState) -> Dict[str, Any]:
     """Planning node."""
-    state.notes.append("plan: fetch news & prices")
+    update = {"notes": ["plan: fetch news & prices"]}
     if not state.run_id:
-        state.run_id = create_run(state.tickers, state.time_window_hours)
-    return state
+        update["run_id"] = create_run(state.tickers, state.time_window_hours)
+    return update
 
 
-def news(state: RunState) -> RunState:
+def news(state: RunState) -> Dict[str, Any]:
     """Fetch news articles."""
+    if _pipeline_mode == "streaming":
+        return news_streaming(state)
     try:
         articles = fetch_news_for_tickers(state.tickers, state.time_window_hours, state.run_id)
         # Fallback to RSS if Tavily returns few results
         if len(articles) < 5:
             rss_articles = fetch_rss_fallback(state.tickers, state.time_window_hours)
             articles.extend(rss_articles)
-        state.articles = dedupe_by_url(articles)
-        state.notes.append(f"news: fetched {len(state.articles)} articles")
-        logger.info("News fetch completed", count=len(state.articles), run_id=state.run_id)
+        fetched = len(articles)
+        articles = dedupe_articles(articles)
+        logger.info("News fetch completed", count=len(articles), duplicates=fetched - len(articles), run_id=state.run_id)
+        return {"articles": articles, "notes": [f"news: fetched {len(articles)} articles"]}
     except Exception as e:
         error_msg = f"news error: {str(e)}"
-        state.errors.append(error_msg)
         logger.error("News fetch failed", error=str(e), run_id=state.run_id, exc_info=True)
-    return state
+        return {"errors": [error_msg]}
+
+
+def news_streaming(state: RunState) -> Dict[str, Any]:
+    """Fetch, dedupe, sentiment-score and embed articles as they arrive (PIPELINE_MODE=streaming)."""
+    try:
+        result = stream_news(state.tickers, state.time_window_hours, state.run_id)
+        articles = result["articles"]
+        logger.info("News stream completed", count=len(articles), run_id=state.run_id)
+        return {
+            "articles": articles,
+            "notes": [f"news: streamed {len(articles)} articles"],
+            "errors": result["errors"],
+            "timings": result["timings"],
+        }
+    except Exception as e:
+        error_msg = f"news error: {str(e)}"
+        logger.error("News stream failed", error=str(e), run_id=state.run_id, exc_info=True)
+        return {"errors": [error_msg]}
 
 
-def prices(state: RunState) -> RunState:
+def prices(state: RunState) -> Dict[str, Any]:
     """Fetch price data."""
     try:
-        state.prices = fetch_prices_snapshot(state.tickers, state.run_id)
-        state.notes.append(f"prices: fetched {len(state.prices)} snapshots")
-        logger.info("Price fetch completed", count=len(state.prices), run_id=state.run_id)
+        snapshots = fetch_prices_snapshot(state.tickers, state.run_id)
+        logger.info("Price fetch completed", count=len(snapshots), run_id=state.run_id)
+        return {"prices": snapshots, "notes": [f"prices: fetched {len(snapshots)} snapshots"]}
     except Exception as e:
         error_msg = f"prices error: {str(e)}"
-        state.errors.append(error_msg)
         logger.error("Price fetch failed", error=str(e), run_id=state.run_id, exc_info=True)
-    return state
+        return {"errors": [error_msg]}
 
 
-def analyze(state: RunState) -> RunState:
-    """Analyze articles."""
+def analyze(state: RunState) -> Dict[str, Any]:
+    """
+    Analyze articles.
+
+    Articles whose canonical URL and content were already stored by an
+    earlier run keep their saved relevance/sentiment and skip storage; only
+    new or changed ones are scored and embedded. Impact is recomputed for
+    all of them against this run's prices. An article is only remembered as
+    embedded once its vector write is confirmed, so a queued or failed write
+    is retried by the next run.
+    """
     try:
-        state.articles = score_articles(state.articles, state.tickers)
-        state.articles = score_impact(state.articles, state.prices)
-        upsert_embeddings_for_articles(state.articles, state.run_id)
-        state.notes.append(f"analyze: scored {len(state.articles)} articles")
-        logger.info("Analysis completed", count=len(state.articles), run_id=state.run_id)
+        articles = state.articles
+        seen = get_seen_index()
+        fresh, known = articles, []
+        if seen is not None:
+            seen.warm_once(get_supabase_client)
+            fresh, known = seen.partition(articles)
+            for article, entry in known:
+                article.relevance = entry.get("relevance")
+                article.sentiment = entry.get("sentiment")
+
+        score_articles(fresh, state.tickers)
+        articles = score_impact(articles, state.prices)
+        on_embedded = None
+        if seen is not None:
+            # The write-behind thread may confirm before or after the pending record below
+            seen_lock = threading.Lock()
+            confirmed = set()
+
+            def on_embedded(written, article_ids):
+                with seen_lock:
+                    seen.record(written, article_ids)
+                    confirmed.update(a.url for a in written)
+
+        stored = upsert_embeddings_for_articles(fresh, state.run_id, on_embedded=on_embedded) or {}
+        if seen is not None and stored.get("article_ids"):
+            with seen_lock:
+                pending = [a for a in fresh if a.url not in confirmed]
+                seen.record(pending, stored["article_ids"], embedded=False)
+
+        logger.info("Analysis completed", count=len(articles), new=len(fresh), known=len(known), run_id=state.run_id)
+        notes = [f"analyze: scored {len(articles)} articles"]
+        if known:
+            notes.append(f"analyze: reused stored scores for {len(known)}/{len(articles)} articles")
+        if stored.get("embedded"):
+            notes.append(
+                f"analyze: embedding cache hits {stored.get('cache_hits', 0)}/{stored['embedded']}"
+            )
+        return {"articles": articles, "notes": notes}
     except Exception as e:
         error_msg = f"analyze error: {str(e)}"
-        state.errors.append(error_msg)
         logger.error("Analysis failed", error=str(e), run_id=state.run_id, exc_info=True)
-    return state
+        return {"errors": [error_msg]}
 
 
-def report(state: RunState) -> RunState:
+def report(state: RunState) -> Dict[str, Any]:
     """Generate and store report."""
     try:
         path = render_and_store_report(state)
-        state.artifacts.append(path)
-        state.notes.append(f"report: generated {path}")
+        return {"artifacts": [path], "notes": [f"report: generated {path}"]}
     except Exception as e:
         error_msg = f"report error: {str(e)}"
-        state.errors.append(error_msg)
         logger.error("Report generation failed", error=str(e))
         # Don't fail the whole run if report generation fails
         # Continue anyway - articles and prices are already collected
-    return state
+        return {"errors": [error_msg]}
 
 
-# Build graph
+# Build graph: news and prices are independent, so they fan out after plan
+# and join at analyze (which waits for both branches).
 graph = StateGraph(RunState)
-graph.add_node("plan", plan)
-graph.add_node("news", news)
-graph.add_node("prices", prices)
-graph.add_node("analyze", analyze)
-graph.add_node("report", report)
+graph.add_node("plan", _timed("plan", plan))
+graph.add_node("news", _timed("news", news))
+graph.add_node("prices", _timed("prices", prices))
+graph.add_node("analyze", _timed("analyze", analyze))
+graph.add_node("report", _timed("report", report))
 
 graph.set_entry_point("plan")
 graph.add_edge("plan", "news")
-graph.add_edge("news", "prices")
-graph.add_edge("prices", "analyze")
+graph.add_edge("plan", "prices")
+graph.add_edge(["news", "prices"], "analyze")
 graph.add_edge("analyze", "report")
 graph.add_edge("report", END)
 
 app = graph.compile()
-
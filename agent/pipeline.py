@@ -0,0 +1,170 @@
+"""Streaming news pipeline: fetch -> dedupe -> sentiment -> embedding as threaded stages with bounded queues."""
+import os
+import time
+import queue
+import threading
+import structlog
+from typing import Callable, Dict, Iterator, List, Optional
+from agent.state import Article
+from agent.tools.tavily_client import iter_news_for_tickers
+from agent.tools.rss_client import fetch_rss_fallback
+from agent.analysis.dedupe import NearDuplicateIndex, dedupe_articles
+from agent.analysis.finance import batch_sentiment
+from memory.embedding_provider import embedding_cache_enabled, generate_embeddings_cached
+from memory.vector_store import embedding_text
+
+logger = structlog.get_logger()
+
+_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+_embed_batch = int(os.getenv("PIPELINE_EMBED_BATCH", "64"))
+
+_DONE = object()
+
+Batches = Iterator[List[Article]]
+
+
+def _drain(inbox: "queue.Queue") -> Batches:
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            return
+        yield item
+
+
+class _Stage(threading.Thread):
+    """Runs one transform over the batches of its inbox, forwarding results to a bounded outbox."""
+
+    def __init__(
+        self,
+        name: str,
+        transform: Callable[[Batches], Batches],
+        inbox: Optional["queue.Queue"],
+        run_id: Optional[str],
+    ):
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        self.stage = name
+        self.transform = transform
+        self.inbox = inbox
+        self.outbox: "queue.Queue" = queue.Queue(maxsize=max(1, _queue_size))
+        self.run_id = run_id
+        self.busy = 0.0  # seconds spent in the transform, excluding waits on either queue
+        self.error: Optional[str] = None
+        self._waited = 0.0
+
+    def _upstream(self) -> Batches:
+        if self.inbox is None:
+            return
+        while True:
+            start = time.perf_counter()
+            item = self.inbox.get()
+            self._waited += time.perf_counter() - start
+            if item is _DONE:
+                return
+            yield item
+
+    def run(self):
+        upstream = self._upstream()
+        try:
+            batches = self.transform(upstream)
+            while True:
+                start, waited = time.perf_counter(), self._waited
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    break
+                finally:
+                    self.busy += time.perf_counter() - start - (self._waited - waited)
+                self.outbox.put(batch)
+        except Exception as e:
+            self.error = f"{self.stage} error: {str(e)}"
+            logger.error("Pipeline stage failed", stage=self.stage, error=str(e), run_id=self.run_id, exc_info=True)
+            for batch in upstream:  # pass the rest through unprocessed; upstream never blocks on a full queue
+                self.outbox.put(batch)
+        finally:
+            self.outbox.put(_DONE)
+
+
+def _fetch(tickers: List[str], time_window_hours: int, run_id: Optional[str]) -> Callable[[Batches], Batches]:
+    def transform(_: Batches) -> Batches:
+        total = 0
+        for articles in iter_news_for_tickers(tickers, time_window_hours, run_id):
+            total += len(articles)
+            yield articles
+        # Fallback to RSS if Tavily returns few results
+        if total < 5:
+            rss_articles = fetch_rss_fallback(tickers, time_window_hours)
+            if rss_articles:
+                yield rss_articles
+    return transform
+
+
+def _dedupe(batches: Batches) -> Batches:
+    index = NearDuplicateIndex()  # shared across batches: later copies attach to earlier stories
+    for batch in batches:
+        unique = dedupe_articles(batch, index)
+        if unique:
+            yield unique
+
+
+def _sentiment(batches: Batches) -> Batches:
+    for batch in batches:
+        scores = batch_sentiment([f"{article.title} {article.summary or ''}" for article in batch])
+        for article, score in zip(batch, scores.tolist()):
+            article.sentiment = score
+        yield batch
+
+
+def _embed(batches: Batches) -> Batches:
+    """
+    Embed articles in groups of PIPELINE_EMBED_BATCH as they arrive.
+
+    Vectors land in the embedding cache, so analyze only writes them once
+    article ids exist; without the cache this stage just passes batches on.
+    """
+    pending: List[Article] = []
+    for batch in batches:
+        if embedding_cache_enabled():
+            pending.extend(batch)
+            if len(pending) >= _embed_batch:
+                generate_embeddings_cached([embedding_text(a) for a in pending])
+                pending = []
+        yield batch
+    if pending:
+        generate_embeddings_cached([embedding_text(a) for a in pending])
+
+
+def stream_news(
+    tickers: List[str], time_window_hours: int = 24, run_id: Optional[str] = None
+) -> Dict[str, object]:
+    """
+    Run the streaming news pipeline to completion.
+
+    Returns {"articles", "errors", "timings"} where timings holds each
+    stage's busy seconds; relevance, impact and ranking are left to analyze,
+    which needs the full article set.
+    """
+    stages: List[_Stage] = []
+    inbox = None
+    for name, transform in [
+        ("fetch", _fetch(tickers, time_window_hours, run_id)),
+        ("dedupe", _dedupe),
+        ("sentiment", _sentiment),
+        ("embed", _embed),
+    ]:
+        stage = _Stage(name, transform, inbox, run_id)
+        stages.append(stage)
+        inbox = stage.outbox
+    for stage in stages:
+        stage.start()
+
+    articles: List[Article] = []
+    for batch in _drain(inbox):
+        articles.extend(batch)
+    for stage in stages:
+        stage.join()
+
+    return {
+        "articles": articles,
+        "errors": [stage.error for stage in stages if stage.error],
+        "timings": {f"news.{stage.stage}": round(stage.busy, 3) for stage in stages},
+    }
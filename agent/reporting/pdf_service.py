@@ -0,0 +1,210 @@
+"""PDF rendering on a process pool, with inline, background and on-demand modes."""
+import os
+import time
+import threading
+import multiprocessing
+import structlog
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from markdown import markdown
+
+# Optional PDF generation
+try:
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
+    WEASYPRINT_AVAILABLE = True
+except (ImportError, OSError):
+    # OSError occurs when WeasyPrint can't load system libraries (GTK+ on Windows)
+    WEASYPRINT_AVAILABLE = False
+
+logger = structlog.get_logger()
+
+_pdf_mode = os.getenv("REPORT_PDF_MODE", "inline").lower()  # inline | background | on_demand
+_workers = int(os.getenv("REPORT_PDF_WORKERS", "2"))
+_timeout = float(os.getenv("REPORT_PDF_TIMEOUT_SEC", "120"))
+
+REPORT_CSS = """
+body { font-family: system-ui, -apple-system, sans-serif; padding: 2rem; line-height: 1.6; }
+h1 { color: #00D1FF; }
+h2 { margin-top: 2rem; }
+a { color: #00D1FF; }
+code { background: #f5f5f5; padding: 0.2rem 0.4rem; border-radius: 0.25rem; }
+pre { background: #f5f5f5; padding: 1rem; border-radius: 0.5rem; overflow-x: auto; }
+"""
+
+_HTML_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+</head>
+<body class="dark">
+{body}
+</body>
+</html>"""
+
+# Per worker process: stylesheet and font configuration are built once by
+# _init_worker and shared by every document that worker renders.
+_worker_css = None
+_worker_fonts = None
+
+
+def pdf_mode() -> str:
+    """Configured REPORT_PDF_MODE (inline, background or on_demand)."""
+    return _pdf_mode if _pdf_mode in ("inline", "background", "on_demand") else "inline"
+
+
+def _init_worker():
+    global _worker_css, _worker_fonts
+    _worker_fonts = FontConfiguration()
+    _worker_css = CSS(string=REPORT_CSS, font_config=_worker_fonts)
+
+
+def _render_pdf(md: str) -> Tuple[bytes, float]:
+    """Markdown -> PDF bytes in a worker process; also returns render time (ms)."""
+    start = time.perf_counter()
+    if _worker_css is None:
+        _init_worker()
+    html = _HTML_PAGE.format(body=markdown(md, extensions=['extra', 'codehilite']))
+    pdf = HTML(string=html).write_pdf(stylesheets=[_worker_css], font_config=_worker_fonts)
+    return pdf, (time.perf_counter() - start) * 1000
+
+
+class PdfService:
+    """
+    Renders report PDFs on a spawn-context process pool and stores them.
+
+    store() renders, uploads and records a report's PDF on a dispatcher
+    thread; concurrent requests for the same report share one job, so an
+    on-demand request racing a background build never renders twice.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers or _workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._dispatch: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "pool_pending": 0, "running": 0, "completed": 0, "failed": 0, "store_failed": 0,
+            "render_ms_total": 0.0, "render_ms_max": 0.0, "wait_ms_total": 0.0,
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that holds HTTP pools and worker threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+                self._dispatch = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pdf")
+
+    def render(self, md: str) -> bytes:
+        """Render on the pool and wait for the PDF bytes."""
+        if not WEASYPRINT_AVAILABLE:
+            raise RuntimeError("WeasyPrint is not available")
+        self._ensure_started()
+        submitted = time.perf_counter()
+        with self._lock:
+            self._stats["pool_pending"] += 1
+        try:
+            pdf, render_ms = self._pool.submit(_render_pdf, md).result(timeout=_timeout)
+        except Exception:
+            with self._lock:
+                self._stats["pool_pending"] -= 1
+                self._stats["failed"] += 1
+            raise
+        total_ms = (time.perf_counter() - submitted) * 1000
+        with self._lock:
+            self._stats["pool_pending"] -= 1
+            self._stats["completed"] += 1
+            self._stats["render_ms_total"] += render_ms
+            self._stats["render_ms_max"] = max(self._stats["render_ms_max"], render_ms)
+            self._stats["wait_ms_total"] += max(0.0, total_ms - render_ms)
+        return pdf
+
+    def _store(self, sb, bucket: str, md_path: str, md: str, report_id: Optional[str]) -> str:
+        with self._lock:
+            self._stats["running"] += 1
+        try:
+            pdf_path = md_path[:-len(".md")] + ".pdf" if md_path.endswith(".md") else f"{md_path}.pdf"
+            pdf = self.render(md)
+            sb.storage.from_(bucket).upload(
+                pdf_path,
+                pdf,
+                file_options={"content-type": "application/pdf", "upsert": "true"}
+            )
+            query = sb.table("reports").update({"pdf_path": pdf_path})
+            query = query.eq("id", report_id) if report_id else query.eq("supabase_path", md_path)
+            query.execute()
+            logger.info("Stored PDF report", path=pdf_path)
+            return pdf_path
+        except Exception:
+            with self._lock:
+                self._stats["store_failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats["running"] -= 1
+
+    def store(self, sb, bucket: str, md_path: str, md: str, report_id: Optional[str] = None) -> Future:
+        """
+        Render, upload and record the PDF for a Markdown report in the background.
+
+        The future resolves to the PDF's storage path.
+        """
+        self._ensure_started()
+        with self._lock:
+            future = self._inflight.get(md_path)
+            if future is not None:
+                return future
+            future = self._dispatch.submit(self._store, sb, bucket, md_path, md, report_id)
+            self._inflight[md_path] = future
+
+        def _done(f: Future):
+            with self._lock:
+                self._inflight.pop(md_path, None)
+            if f.exception():
+                logger.warning("PDF generation failed", path=md_path, error=str(f.exception()))
+
+        future.add_done_callback(_done)
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue depth, job counts and average/max render latency.
+
+        failed counts renders that raised; store_failed counts store() jobs
+        (render, upload or reports update) that did not produce a stored PDF.
+        """
+        with self._lock:
+            s = dict(self._stats)
+            inflight = len(self._inflight)
+        done = s["completed"] or 1
+        return {
+            "mode": pdf_mode(),
+            "workers": self.workers,
+            "available": WEASYPRINT_AVAILABLE,
+            "queued": max(0, inflight - s["running"]),
+            "running": s["running"],
+            "pool_pending": s["pool_pending"],
+            "completed": s["completed"],
+            "failed": s["failed"],
+            "store_failed": s["store_failed"],
+            "render_ms_avg": round(s["render_ms_total"] / done, 1),
+            "render_ms_max": round(s["render_ms_max"], 1),
+            "wait_ms_avg": round(s["wait_ms_total"] / done, 1),
+        }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            pool, dispatch = self._pool, self._dispatch
+            self._pool = self._dispatch = None
+        if dispatch:
+            dispatch.shutdown(wait=wait)
+        if pool:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+pdf_service = PdfService()
@@ -1,44 +1,160 @@
 """Render Markdown report and upload to Supabase Storage."""
 import os
 import io
+import json
+import hashlib
+import threading
 import structlog
+from collections import OrderedDict
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 from jinja2 import Environment, FileSystemLoader
-from markdown import markdown
-from supabase import create_client
-from agent.state import RunState
-
-# Optional PDF generation
-try:
-    from weasyprint import HTML
-    WEASYPRINT_AVAILABLE = True
-except (ImportError, OSError):
-    # OSError occurs when WeasyPrint can't load system libraries (GTK+ on Windows)
-    WEASYPRINT_AVAILABLE = False
+from memory.supabase_client import get_supabase_client
+from agent.state import Article, PriceSnapshot, RunState
+from agent.reporting.pdf_service import WEASYPRINT_AVAILABLE, pdf_mode, pdf_service
 
 logger = structlog.get_logger()
 
 # Template environment
 _template_dir = os.path.join(os.path.dirname(__file__))
 env = Environment(loader=FileSystemLoader(searchpath=_template_dir))
+_template_name = "template.md.j2"
 
+_render_cache_size = int(os.getenv("REPORT_RENDER_CACHE_SIZE", "32"))
+_rendered: "OrderedDict[str, str]" = OrderedDict()
+_render_lock = threading.Lock()
+_render_stats = {"hits": 0, "misses": 0, "unchanged": 0}
 
-def _get_supabase_client():
-    """Lazy initialization of Supabase client."""
-    SB_URL = os.getenv("SUPABASE_URL")
-    SB_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-    
-    if not SB_URL:
-        raise ValueError("SUPABASE_URL must be set in environment variables")
-    if not SB_KEY:
-        raise ValueError("SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY must be set in environment variables")
-    
-    return create_client(SB_URL, SB_KEY)
+
+def _fmt(value: Optional[float], spec: str = "%.2f") -> str:
+    return spec % (value or 0)
+
+
+def report_content_hash(
+    date_str: str,
+    tickers: List[str],
+    time_window_hours: int,
+    articles: List[Article],
+    prices: List[PriceSnapshot],
+) -> str:
+    """
+    sha256 of everything the template renders, formatted as the template formats it.
+
+    Scores are hashed at the template's two decimals, so re-scoring noise that
+    does not change the document does not change the key. The template source
+    is part of the key, so template edits invalidate stored reports.
+    """
+    with open(os.path.join(_template_dir, _template_name), "rb") as f:
+        template_digest = hashlib.sha256(f.read()).hexdigest()
+    payload = {
+        "template": template_digest,
+        "date": date_str,
+        "tickers": list(tickers),
+        "hours": time_window_hours,
+        "prices": [
+            [p.ticker, _fmt(p.close), _fmt(p.d1_change), _fmt(p.volume, "%.0f"), _fmt(p.d5_change) if p.d5_change else None]
+            for p in prices
+        ],
+        "articles": [
+            [
+                a.ticker, a.title, a.url, a.source,
+                a.published_at.strftime("%Y-%m-%d %H:%M") if a.published_at else None,
+                _fmt(a.relevance), _fmt(a.sentiment), _fmt(a.impact),
+                (a.summary or "")[:500],
+                [[d.get("source"), d.get("url")] for d in (a.raw or {}).get("duplicates", [])],
+            ]
+            for a in articles
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _render_markdown(content_hash: str, **context: Any) -> str:
+    """Render the template, reusing the output for a content hash seen recently."""
+    with _render_lock:
+        md = _rendered.get(content_hash)
+        if md is not None:
+            _rendered.move_to_end(content_hash)
+            _render_stats["hits"] += 1
+            return md
+        _render_stats["misses"] += 1
+    md = env.get_template(_template_name).render(**context)
+    with _render_lock:
+        _rendered[content_hash] = md
+        while len(_rendered) > _render_cache_size:
+            _rendered.popitem(last=False)
+    return md
+
+
+def _stored_report(sb, md_path: str) -> Optional[Dict[str, Any]]:
+    """Latest reports row for a storage path, or None (also on lookup errors)."""
+    try:
+        result = (
+            sb.table("reports")
+            .select("id, content_hash, pdf_path")
+            .eq("supabase_path", md_path)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return result.data[0] if result.data else None
+    except Exception as e:
+        logger.warning("Failed to look up stored report", path=md_path, error=str(e))
+        return None
+
+
+def _save_report_row(
+    sb,
+    state: RunState,
+    date_str: str,
+    md_path: str,
+    pdf_path: Optional[str],
+    content_hash: str,
+) -> Optional[str]:
+    """Insert this run's reports row; returns its id (None if the insert failed)."""
+    try:
+        result = sb.table("reports").insert({
+            "run_id": state.run_id,
+            "date_utc": date_str,
+            "tickers": state.tickers,
+            "supabase_path": md_path,
+            "pdf_path": pdf_path,
+            "content_hash": content_hash,
+        }).execute()
+        logger.info("Saved report metadata to database", path=md_path, run_id=state.run_id)
+        return result.data[0]["id"] if result.data else None
+    except Exception as e:
+        # Log but don't fail - report is already uploaded to storage
+        logger.warning("Failed to save report metadata", path=md_path, error=str(e), run_id=state.run_id)
+        return None
+
+
+def cached_markdown(content_hash: Optional[str]) -> Optional[str]:
+    """Rendered Markdown for a content hash if this process still has it."""
+    with _render_lock:
+        return _rendered.get(content_hash) if content_hash else None
+
+
+def report_render_stats() -> Dict[str, int]:
+    """Rendered-Markdown cache counters and reports skipped as unchanged."""
+    with _render_lock:
+        return {"entries": len(_rendered), **_render_stats}
 
 
 def render_and_store_report(state: RunState) -> str:
-    """Render Markdown, convert to PDF, upload both to Supabase Storage."""
-    sb = _get_supabase_client()
+    """
+    Render Markdown, convert to PDF, upload both to Supabase Storage.
+
+    The PDF is rendered on the PDF worker pool: awaited here with
+    REPORT_PDF_MODE=inline, stored after this returns with background, and
+    left to the first /reports/pdf request with on_demand.
+
+    When the stored report for this date and watchlist has the same content
+    hash (and already has its PDF, if PDFs are enabled), nothing is rendered
+    or uploaded: the run gets a reports row pointing at the stored artifacts
+    and the existing artifact path is returned.
+    """
+    sb = get_supabase_client()
     BUCKET = os.getenv("REPORT_BUCKET", "reports")
     pdf_enabled = os.getenv("REPORT_PDF_ENABLED", "false").lower() == "true"
     
@@ -51,9 +167,25 @@ def render_and_store_report(state: RunState) -> str:
         reverse=True
     )[:20]  # Limit to top 20
 
+    base_path = f"{date_str}/report_{'_'.join(sorted(state.tickers))}"
+    md_path = f"{base_path}.md"
+    mode = pdf_mode()
+    want_pdf = pdf_enabled and WEASYPRINT_AVAILABLE and mode != "on_demand"
+
+    key = report_content_hash(date_str, state.tickers, state.time_window_hours, sorted_articles, state.prices)
+    stored = _stored_report(sb, md_path)
+    unchanged = bool(stored) and stored.get("content_hash") == key
+    if unchanged and (stored.get("pdf_path") or not want_pdf):
+        with _render_lock:
+            _render_stats["unchanged"] += 1
+        logger.info("Report unchanged, reusing stored artifact", path=md_path, run_id=state.run_id)
+        _save_report_row(sb, state, date_str, md_path, stored.get("pdf_path"), key)
+        return f"{BUCKET}/{md_path}"
+
     # Render Markdown
     try:
-        md = env.get_template("template.md.j2").render(
+        md = _render_markdown(
+            key,
             date=date_str,
             tickers=state.tickers,
             time_window_hours=state.time_window_hours,
@@ -64,58 +196,25 @@ def render_and_store_report(state: RunState) -> str:
         logger.error("Template rendering failed", error=str(e), run_id=state.run_id, exc_info=True)
         raise
 
-    # Upload Markdown first (always succeeds even if PDF fails)
-    base_path = f"{date_str}/report_{'_'.join(sorted(state.tickers))}"
-    md_path = f"{base_path}.md"
-    
-    try:
-        sb.storage.from_(BUCKET).upload(
-            md_path,
-            md.encode('utf-8'),
-            file_options={"content-type": "text/markdown", "upsert": "true"}
-        )
-        logger.info("Uploaded Markdown report", path=md_path, run_id=state.run_id)
-        
-        # Save report metadata to reports table
+    # Upload Markdown first (always succeeds even if PDF fails); an unchanged
+    # report only got here because its PDF is missing
+    if not unchanged:
         try:
-            sb.table("reports").insert({
-                "run_id": state.run_id,
-                "date_utc": date_str,
-                "tickers": state.tickers,
-                "supabase_path": md_path,
-            }).execute()
-            logger.info("Saved report metadata to database", path=md_path, run_id=state.run_id)
+            sb.storage.from_(BUCKET).upload(
+                md_path,
+                md.encode('utf-8'),
+                file_options={"content-type": "text/markdown", "upsert": "true"}
+            )
+            logger.info("Uploaded Markdown report", path=md_path, run_id=state.run_id)
         except Exception as e:
-            # Log but don't fail - report is already uploaded to storage
-            logger.warning("Failed to save report metadata", path=md_path, error=str(e), run_id=state.run_id)
-    except Exception as e:
-        logger.error("Failed to upload Markdown", error=str(e), path=md_path, run_id=state.run_id)
-        raise
+            logger.error("Failed to upload Markdown", error=str(e), path=md_path, run_id=state.run_id)
+            raise
 
-    # Generate PDF only if enabled and WeasyPrint available
+    # Generate PDF inline only if enabled, WeasyPrint available and REPORT_PDF_MODE=inline
     pdf_bytes = None
-    if pdf_enabled and WEASYPRINT_AVAILABLE:
+    if want_pdf and mode == "inline":
         try:
-            # Convert to HTML for PDF
-            html_content = markdown(md, extensions=['extra', 'codehilite'])
-            html_full = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <style>
-        body {{ font-family: system-ui, -apple-system, sans-serif; padding: 2rem; line-height: 1.6; }}
-        h1 {{ color: #00D1FF; }}
-        h2 {{ margin-top: 2rem; }}
-        a {{ color: #00D1FF; }}
-        code {{ background: #f5f5f5; padding: 0.2rem 0.4rem; border-radius: 0.25rem; }}
-        pre {{ background: #f5f5f5; padding: 1rem; border-radius: 0.5rem; overflow-x: auto; }}
-    </style>
-</head>
-<body class="dark">
-{html_content}
-</body>
-</html>"""
-            pdf_bytes = HTML(string=html_full).write_pdf()
+            pdf_bytes = pdf_service.render(md)
             logger.info("Generated PDF", run_id=state.run_id)
         except Exception as e:
             logger.warning("PDF generation failed, continuing with Markdown only", error=str(e), run_id=state.run_id)
@@ -124,17 +223,25 @@ def render_and_store_report(state: RunState) -> str:
         logger.info("PDF generation disabled via REPORT_PDF_ENABLED=false", run_id=state.run_id)
 
     # Upload PDF if generated
+    pdf_path = None
     if pdf_bytes:
-        pdf_path = f"{base_path}.pdf"
         try:
             sb.storage.from_(BUCKET).upload(
-                pdf_path,
+                f"{base_path}.pdf",
                 pdf_bytes,
                 file_options={"content-type": "application/pdf", "upsert": "true"}
             )
+            pdf_path = f"{base_path}.pdf"
             logger.info("Uploaded PDF report", path=pdf_path, run_id=state.run_id)
         except Exception as e:
-            logger.warning("Failed to upload PDF", error=str(e), path=pdf_path, run_id=state.run_id)
+            logger.warning("Failed to upload PDF", error=str(e), path=f"{base_path}.pdf", run_id=state.run_id)
+
+    # Save report metadata to reports table (pdf_path only when a PDF was stored)
+    report_id = _save_report_row(sb, state, date_str, md_path, pdf_path, key)
+
+    if want_pdf and mode == "background":
+        pdf_service.store(sb, BUCKET, md_path, md, report_id)
+        logger.info("Queued PDF generation", path=md_path, run_id=state.run_id)
 
     return f"{BUCKET}/{md_path}"
 
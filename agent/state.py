@@ -1,9 +1,15 @@
 """Pydantic state for LangGraph agent."""
-from typing import List, Optional, Dict, Any
+import operator
+from typing import Annotated, List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 from datetime import datetime
 
 
+def merge_dicts(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """LangGraph reducer: merge dict updates from parallel branches."""
+    return {**(left or {}), **(right or {})}
+
+
 class Article(BaseModel):
     """News article model."""
     ticker: str
@@ -33,13 +39,20 @@ class PriceSnapshot(BaseModel):
 
 
 class RunState(BaseModel):
-    """State passed through LangGraph nodes."""
+    """
+    State passed through LangGraph nodes.
+
+    Nodes return partial updates. notes/errors/artifacts are append-only and
+    timings is merged, so the parallel news and prices branches can both
+    write them in the same step.
+    """
     tickers: List[str] = Field(default_factory=list)
     time_window_hours: int = 24
     articles: List[Article] = Field(default_factory=list)
     prices: List[PriceSnapshot] = Field(default_factory=list)
-    notes: List[str] = Field(default_factory=list)
-    errors: List[str] = Field(default_factory=list)
-    artifacts: List[str] = Field(default_factory=list)
+    notes: Annotated[List[str], operator.add] = Field(default_factory=list)
+    errors: Annotated[List[str], operator.add] = Field(default_factory=list)
+    artifacts: Annotated[List[str], operator.add] = Field(default_factory=list)
+    timings: Annotated[Dict[str, float], merge_dicts] = Field(default_factory=dict)
     run_id: Optional[str] = None
 
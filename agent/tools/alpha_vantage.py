@@ -3,17 +3,71 @@ import os
 import time
 import httpx
 import structlog
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from agent.state import PriceSnapshot
+from agent.tools.market_hours import is_market_open, next_open
+from agent.tools.rate_limit import RateLimiter, RateLimitExceeded, parse_retry_after
+from memory.local_cache import SqliteCache
 
 logger = structlog.get_logger()
 
 _timeout = float(os.getenv("HTTP_TIMEOUT_SEC", "40"))
-
-
-def _retry_request(func, max_attempts=3, run_id=None, is_rate_limit=False):
-    """Retry HTTP request with exponential backoff. Special handling for 429."""
+# Free tier: 5 calls/min, 25 calls/day
+_calls_per_min = float(os.getenv("ALPHAVANTAGE_CALLS_PER_MIN", "5"))
+_calls_per_day = int(os.getenv("ALPHAVANTAGE_CALLS_PER_DAY", "25"))
+_max_wait = float(os.getenv("ALPHAVANTAGE_MAX_WAIT_SEC", "120"))
+_default_backoff = 15.0
+_cache_enabled = os.getenv("PRICE_CACHE_ENABLED", "true").lower() == "true"
+_cache_ttl_open = float(os.getenv("PRICE_CACHE_TTL_OPEN_SEC", "60"))
+_cache_max_entries = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "5000"))
+
+_limiter: Optional[RateLimiter] = None
+_price_cache: Optional[SqliteCache] = None
+
+
+def _get_limiter() -> RateLimiter:
+    """Get or create the process-wide Alpha Vantage rate limiter."""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(
+            "alphavantage",
+            calls_per_minute=_calls_per_min,
+            calls_per_day=_calls_per_day,
+            max_wait=_max_wait,
+        )
+    return _limiter
+
+
+def _get_price_cache() -> SqliteCache:
+    """Get or create the shared quote cache."""
+    global _price_cache
+    if _price_cache is None:
+        _price_cache = SqliteCache("prices", max_entries=_cache_max_entries)
+    return _price_cache
+
+
+def price_cache_stats() -> Dict[str, object]:
+    """Hit/miss counters of the quote cache."""
+    if not _cache_enabled:
+        return {"enabled": False}
+    return {"enabled": True, "market_open": is_market_open(), **_get_price_cache().stats()}
+
+
+def _cache_expiry(now: datetime) -> float:
+    """
+    Epoch time a quote fetched at `now` stays valid.
+
+    During the regular session quotes move, so they get a short TTL. Outside
+    it (nights, weekends, holidays) the quote cannot change before the next open.
+    """
+    if is_market_open(now):
+        return time.time() + _cache_ttl_open
+    return next_open(now).timestamp()
+
+
+def _retry_request(func, max_attempts=3, run_id=None, limiter: Optional[RateLimiter] = None):
+    """Retry HTTP request with exponential backoff. 429s block the shared limiter for Retry-After."""
     delays = [2, 4, 8]
     last_error = None
     
@@ -22,10 +76,14 @@ def _retry_request(func, max_attempts=3, run_id=None, is_rate_limit=False):
             return func()
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 429:
-                # Rate limit: wait longer, one retry
+                # Rate limit: block every caller for Retry-After, one retry
                 if attempt == 0:
-                    logger.warning("Rate limit hit (429), backing off", ticker=e.request.url.params.get("symbol", ""), run_id=run_id)
-                    time.sleep(15)
+                    backoff = parse_retry_after(e.response.headers.get("Retry-After")) or _default_backoff
+                    logger.warning("Rate limit hit (429), backing off", ticker=e.request.url.params.get("symbol", ""), backoff=backoff, run_id=run_id)
+                    if limiter is not None:
+                        limiter.penalize(backoff)
+                    else:
+                        time.sleep(backoff)
                     continue
                 last_error = e
                 break
@@ -53,20 +111,49 @@ def _retry_request(func, max_attempts=3, run_id=None, is_rate_limit=False):
 
 
 def fetch_prices_snapshot(tickers: List[str], run_id: str = None) -> List[PriceSnapshot]:
-    """Fetch current price data for tickers from Alpha Vantage with retries."""
+    """
+    Fetch current price data for tickers from Alpha Vantage with retries.
+
+    Quotes are served from the market-hours-aware cache when fresh; only the
+    remaining tickers are requested (and metered by the rate limiter).
+    """
     api_key = os.getenv("ALPHAVANTAGE_API_KEY")
     if not api_key:
         logger.warning("ALPHAVANTAGE_API_KEY not set, returning empty prices", run_id=run_id)
         return []
 
-    prices = []
+    snapshots: Dict[str, PriceSnapshot] = {}
+    if _cache_enabled:
+        cached = _get_price_cache().get_many(tickers)
+        snapshots.update({ticker: PriceSnapshot(**data) for ticker, data in cached.items()})
+        logger.info("Price cache lookup", hits=len(cached), misses=len(set(tickers)) - len(cached), run_id=run_id)
+
+    missing = [ticker for ticker in dict.fromkeys(tickers) if ticker not in snapshots]
+    if missing:
+        fetched = _fetch_quotes(api_key, missing, run_id)
+        snapshots.update(fetched)
+        if _cache_enabled and fetched:
+            _get_price_cache().set_many(
+                {ticker: snapshot.model_dump(mode="json") for ticker, snapshot in fetched.items()},
+                expires_at=_cache_expiry(datetime.utcnow()),
+            )
+
+    return [snapshots[ticker] for ticker in dict.fromkeys(tickers) if ticker in snapshots]
+
+
+def _fetch_quotes(api_key: str, tickers: List[str], run_id: str = None) -> Dict[str, PriceSnapshot]:
+    """Request GLOBAL_QUOTE for each ticker, drawing from the shared rate limiter."""
+    prices = {}
     as_of = datetime.utcnow()
+    limiter = _get_limiter()
 
     with httpx.Client(timeout=_timeout) as client:
         for ticker in tickers:
             try:
                 def _make_request():
-                    return client.get(
+                    # Every attempt, including retries, draws from the shared budget
+                    limiter.acquire(run_id=run_id)
+                    response = client.get(
                         "https://www.alphavantage.co/query",
                         params={
                             "function": "GLOBAL_QUOTE",
@@ -74,14 +161,20 @@ def fetch_prices_snapshot(tickers: List[str], run_id: str = None) -> List[PriceS
                             "apikey": api_key,
                         },
                     )
+                    response.raise_for_status()
+                    return response
                 
-                response = _retry_request(_make_request, run_id=run_id)
-                response.raise_for_status()
+                response = _retry_request(_make_request, run_id=run_id, limiter=limiter)
                 data = response.json()
 
                 quote = data.get("Global Quote", {})
                 if not quote:
-                    logger.warning("No quote data", ticker=ticker)
+                    # Alpha Vantage signals throttling with a 200 and a Note/Information message
+                    if data.get("Note") or data.get("Information"):
+                        limiter.penalize(60)
+                        logger.warning("Alpha Vantage throttled request", ticker=ticker, message=str(data.get("Note") or data.get("Information"))[:100], run_id=run_id)
+                    else:
+                        logger.warning("No quote data", ticker=ticker)
                     continue
 
                 try:
@@ -108,15 +201,15 @@ def fetch_prices_snapshot(tickers: List[str], run_id: str = None) -> List[PriceS
                         d5_change=None,
                         vol_z=None,
                     )
-                    prices.append(snapshot)
+                    prices[ticker] = snapshot
                     logger.info("Fetched price", ticker=ticker, close=close, run_id=run_id)
                 except (ValueError, KeyError) as e:
                     logger.warning("Failed to parse quote", ticker=ticker, error=str(e), run_id=run_id)
                     continue
 
-                # Rate limit: free tier is 5 calls/min
-                time.sleep(12)  # Conservative delay
-
+            except RateLimitExceeded as e:
+                logger.error("Alpha Vantage budget exhausted, skipping remaining tickers", ticker=ticker, error=str(e), run_id=run_id)
+                break
             except Exception as e:
                 logger.error("Alpha Vantage API error", ticker=ticker, error=str(e), run_id=run_id)
                 continue
@@ -0,0 +1,35 @@
+"""Helpers for driving asyncio code from the synchronous graph nodes."""
+import asyncio
+import threading
+from typing import Any, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code.
+
+    Uses asyncio.run when no loop is running in this thread. When called from
+    inside a running loop (e.g. a node invoked from an async FastAPI handler),
+    the coroutine runs on a fresh loop in a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result: dict[str, Any] = {}
+
+    def _runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:  # re-raised in the calling thread
+            result["error"] = e
+
+    thread = threading.Thread(target=_runner, daemon=True)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
@@ -0,0 +1,95 @@
+"""US equity market session calendar (NYSE regular hours and holidays)."""
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Set
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th given weekday (0=Mon) of a month; n=-1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    weekday_offset = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * weekday_offset) // 451
+    month, day = divmod(h + weekday_offset - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=32)
+def nyse_holidays(year: int) -> Set[date]:
+    """Full-day NYSE closures for a year."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),   # Independence Day
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)), # Christmas
+    }
+    # New Year's Day falling on Saturday is not observed on the prior Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+def is_trading_day(day: date) -> bool:
+    """Weekday that is not an NYSE holiday."""
+    return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+
+def _to_market_time(now: Optional[datetime]) -> datetime:
+    if now is None:
+        now = datetime.now(timezone.utc)
+    elif now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)  # naive timestamps in this codebase are UTC
+    return now.astimezone(MARKET_TZ)
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """True during the regular session (9:30-16:00 ET) on trading days."""
+    local = _to_market_time(now)
+    return is_trading_day(local.date()) and REGULAR_OPEN <= local.time() < REGULAR_CLOSE
+
+
+def next_open(now: Optional[datetime] = None) -> datetime:
+    """Start of the next regular session strictly after `now`, as an aware UTC datetime."""
+    local = _to_market_time(now)
+    day = local.date()
+    if local.time() >= REGULAR_OPEN:
+        day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return datetime.combine(day, REGULAR_OPEN, tzinfo=MARKET_TZ).astimezone(timezone.utc)
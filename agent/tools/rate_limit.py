@@ -0,0 +1,184 @@
+"""Token-bucket rate limiter shared across threads and worker processes via SQLite."""
+import os
+import time
+import sqlite3
+import threading
+import structlog
+from typing import Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+logger = structlog.get_logger()
+
+_default_db_path = os.getenv(
+    "RATE_LIMIT_DB", os.path.join(os.getenv("CACHE_DIR", ".cache"), "rate_limits.sqlite3")
+)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the call budget cannot be satisfied (daily quota used up or wait too long)."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    Token bucket with a per-minute refill rate and an optional per-day quota.
+
+    State lives in a SQLite row keyed by `name`, updated under BEGIN IMMEDIATE,
+    so every thread and uvicorn worker process pointing at the same file draws
+    from one budget. Callers only wait when the bucket is actually empty.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        calls_per_minute: float,
+        calls_per_day: Optional[int] = None,
+        db_path: Optional[str] = None,
+        max_wait: Optional[float] = None,
+    ):
+        if calls_per_minute <= 0:
+            raise ValueError("calls_per_minute must be positive")
+        self.name = name
+        self.calls_per_minute = float(calls_per_minute)
+        self.calls_per_day = calls_per_day or None
+        self.db_path = db_path or _default_db_path
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _init_db(self):
+        parent = os.path.dirname(self.db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    """create table if not exists rate_limits (
+                        name text primary key,
+                        tokens real not null,
+                        updated_at real not null,
+                        day text not null,
+                        day_count integer not null default 0,
+                        blocked_until real not null default 0
+                    )"""
+                )
+            finally:
+                conn.close()
+
+    def try_acquire(self) -> float:
+        """
+        Take one token if available.
+
+        Returns 0.0 when a call may proceed now, otherwise the number of seconds
+        to wait before trying again. Raises RateLimitExceeded if the daily
+        quota is exhausted.
+        """
+        capacity = self.calls_per_minute
+        refill_per_sec = self.calls_per_minute / 60.0
+        now = time.time()
+        today = datetime.now(timezone.utc).date().isoformat()
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("begin immediate")
+                row = conn.execute(
+                    "select tokens, updated_at, day, day_count, blocked_until from rate_limits where name = ?",
+                    (self.name,),
+                ).fetchone()
+                if row is None:
+                    tokens, updated_at, day, day_count, blocked_until = capacity, now, today, 0, 0.0
+                else:
+                    tokens, updated_at, day, day_count, blocked_until = row
+
+                tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_per_sec)
+                if day != today:
+                    day, day_count = today, 0
+
+                if self.calls_per_day and day_count >= self.calls_per_day:
+                    conn.execute("rollback")
+                    raise RateLimitExceeded(
+                        f"{self.name}: daily quota of {self.calls_per_day} calls used up"
+                    )
+
+                if blocked_until > now:
+                    wait = blocked_until - now
+                elif tokens >= 1.0:
+                    tokens -= 1.0
+                    day_count += 1
+                    wait = 0.0
+                else:
+                    wait = (1.0 - tokens) / refill_per_sec
+
+                conn.execute(
+                    """insert into rate_limits (name, tokens, updated_at, day, day_count, blocked_until)
+                       values (?, ?, ?, ?, ?, ?)
+                       on conflict(name) do update set
+                         tokens = excluded.tokens, updated_at = excluded.updated_at,
+                         day = excluded.day, day_count = excluded.day_count,
+                         blocked_until = excluded.blocked_until""",
+                    (self.name, tokens, now, day, day_count, blocked_until),
+                )
+                conn.execute("commit")
+                return wait
+            finally:
+                conn.close()
+
+    def acquire(self, run_id: Optional[str] = None) -> float:
+        """Block until a call is allowed. Returns the total time spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                if waited:
+                    logger.info("Rate limiter released call", limiter=self.name, waited=round(waited, 2), run_id=run_id)
+                return waited
+            if self.max_wait is not None and waited + wait > self.max_wait:
+                raise RateLimitExceeded(
+                    f"{self.name}: next call slot is {wait:.1f}s away (max wait {self.max_wait}s)"
+                )
+            logger.debug("Rate limiter waiting", limiter=self.name, wait=round(wait, 2), run_id=run_id)
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, seconds: float):
+        """Block all callers for `seconds` (e.g. from a Retry-After header) and drain the bucket."""
+        until = time.time() + max(0.0, seconds)
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("begin immediate")
+                conn.execute(
+                    """insert into rate_limits (name, tokens, updated_at, day, day_count, blocked_until)
+                       values (?, 0, ?, ?, 0, ?)
+                       on conflict(name) do update set
+                         tokens = 0, updated_at = excluded.updated_at,
+                         blocked_until = max(rate_limits.blocked_until, excluded.blocked_until)""",
+                    (self.name, time.time(), datetime.now(timezone.utc).date().isoformat(), until),
+                )
+                conn.execute("commit")
+            finally:
+                conn.close()
+        logger.warning("Rate limiter penalized", limiter=self.name, seconds=round(seconds, 2))
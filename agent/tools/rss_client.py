@@ -1,68 +1,185 @@
 """RSS fallback for news aggregation."""
+import os
+import json
+import asyncio
+import hashlib
 import feedparser
+import httpx
 import structlog
-from typing import List
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 from agent.state import Article
+from agent.tools.async_utils import run_sync
+from agent.tools.ticker_matcher import get_matcher
 
 logger = structlog.get_logger()
 
 # Common finance RSS feeds
-RSS_FEEDS = [
+DEFAULT_RSS_FEEDS = [
     "https://feeds.finance.yahoo.com/rss/2.0/headline",
     "https://www.cnbc.com/id/100003114/device/rss/rss.html",
     "https://feeds.marketwatch.com/marketwatch/topstories/",
 ]
 
+_timeout = float(os.getenv("RSS_TIMEOUT_SEC", "10"))
+_max_concurrency = int(os.getenv("RSS_MAX_CONCURRENCY", "10"))
+_max_entries = int(os.getenv("RSS_MAX_ENTRIES_PER_FEED", "20"))
+_cache_dir = os.getenv("RSS_CACHE_DIR", os.path.join(os.getenv("CACHE_DIR", ".cache"), "rss"))
+
+
+def _load_feed_list() -> List[str]:
+    """Feeds from RSS_FEEDS_FILE (one URL per line) or RSS_FEEDS (comma-separated)."""
+    feeds_file = os.getenv("RSS_FEEDS_FILE")
+    if feeds_file:
+        try:
+            with open(feeds_file, encoding="utf-8") as f:
+                feeds = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+            if feeds:
+                return feeds
+        except OSError as e:
+            logger.warning("Failed to read RSS_FEEDS_FILE, using defaults", path=feeds_file, error=str(e))
+    feeds_env = os.getenv("RSS_FEEDS")
+    if feeds_env:
+        return [url.strip() for url in feeds_env.split(",") if url.strip()]
+    return list(DEFAULT_RSS_FEEDS)
+
+
+RSS_FEEDS = _load_feed_list()
+
+
+def _cache_path(feed_url: str) -> str:
+    return os.path.join(_cache_dir, hashlib.sha1(feed_url.encode()).hexdigest() + ".json")
+
+
+def _read_cache(feed_url: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_cache_path(feed_url), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(feed_url: str, entry: Dict[str, Any]):
+    """Write atomically so concurrent workers never read a half-written file."""
+    try:
+        os.makedirs(_cache_dir, exist_ok=True)
+        path = _cache_path(feed_url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Failed to write RSS cache", feed=feed_url, error=str(e))
+
+
+def _parse_feed(content: bytes) -> List[Dict[str, Any]]:
+    """Parse a feed body into plain entry dicts (cacheable as JSON)."""
+    feed = feedparser.parse(content)
+    entries = []
+    for entry in feed.entries[:_max_entries]:  # Limit per feed
+        published = None
+        if getattr(entry, "published_parsed", None):
+            try:
+                published = datetime(*entry.published_parsed[:6]).isoformat()
+            except (ValueError, TypeError):
+                pass
+        entries.append({
+            "title": entry.get("title", ""),
+            "summary": entry.get("summary", ""),
+            "link": entry.get("link", ""),
+            "published": published,
+        })
+    return entries
+
+
+async def _fetch_feed(
+    client: httpx.AsyncClient, semaphore: asyncio.Semaphore, feed_url: str
+) -> List[Dict[str, Any]]:
+    """Conditional GET of one feed; serves cached entries on 304 or on failure."""
+    cached = _read_cache(feed_url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    async with semaphore:
+        try:
+            response = await client.get(feed_url, headers=headers)
+            if response.status_code == 304 and cached:
+                logger.debug("RSS feed not modified", feed=feed_url)
+                return cached.get("entries", [])
+            response.raise_for_status()
+            content = response.content
+        except Exception as e:
+            logger.warning("Failed to fetch RSS feed", feed=feed_url, error=str(e), cached=bool(cached))
+            return cached.get("entries", []) if cached else []
+
+    try:
+        entries = _parse_feed(content)
+    except Exception as e:
+        logger.warning("Failed to parse RSS feed", feed=feed_url, error=str(e))
+        return cached.get("entries", []) if cached else []
+
+    _write_cache(feed_url, {
+        "url": feed_url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": datetime.utcnow().isoformat(),
+        "entries": entries,
+    })
+    return entries
+
+
+async def fetch_feed_entries_async(feeds: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch all feeds concurrently, keyed by feed URL."""
+    feeds = feeds if feeds is not None else RSS_FEEDS
+    semaphore = asyncio.Semaphore(max(1, _max_concurrency))
+    async with httpx.AsyncClient(timeout=_timeout, follow_redirects=True) as client:
+        results = await asyncio.gather(*(_fetch_feed(client, semaphore, url) for url in feeds))
+    return dict(zip(feeds, results))
+
 
 def fetch_rss_fallback(tickers: List[str], time_window_hours: int = 24) -> List[Article]:
-    """Fetch articles from RSS feeds as fallback."""
+    """
+    Fetch articles from RSS feeds as fallback.
+
+    Each entry is attributed to the first watchlist ticker it mentions; all
+    mentioned tickers are kept in raw["tickers"].
+    """
     articles = []
     cutoff = datetime.utcnow() - timedelta(hours=time_window_hours)
-    ticker_set = {t.upper() for t in tickers}
+    matcher = get_matcher(tickers)
 
-    for feed_url in RSS_FEEDS:
-        try:
-            feed = feedparser.parse(feed_url)
-            for entry in feed.entries[:20]:  # Limit per feed
-                try:
-                    title = entry.get("title", "")
-                    content = entry.get("summary", "")
-
-                    # Simple ticker matching in title/content
-                    matched_ticker = None
-                    for ticker in ticker_set:
-                        if ticker in title.upper() or ticker in content.upper():
-                            matched_ticker = ticker
-                            break
-
-                    if not matched_ticker:
-                        continue
+    for feed_url, entries in run_sync(fetch_feed_entries_async()).items():
+        for entry in entries:
+            try:
+                title = entry.get("title", "")
+                content = entry.get("summary", "")
 
-                    published_at = None
-                    if hasattr(entry, "published_parsed") and entry.published_parsed:
-                        try:
-                            published_at = datetime(*entry.published_parsed[:6])
-                            if published_at < cutoff:
-                                continue
-                        except (ValueError, TypeError):
-                            pass
-
-                    article = Article(
-                        ticker=matched_ticker,
-                        title=title,
-                        url=entry.get("link", ""),
-                        source=feed_url,
-                        published_at=published_at,
-                        summary=content[:500] if content else None,
-                    )
-                    articles.append(article)
-                except Exception as e:
-                    logger.warning("Failed to parse RSS entry", error=str(e))
+                matched = matcher.match(f"{title}\n{content}")
+                if not matched:
                     continue
-        except Exception as e:
-            logger.warning("Failed to fetch RSS feed", feed=feed_url, error=str(e))
-            continue
 
-    return articles
+                published_at = None
+                if entry.get("published"):
+                    published_at = datetime.fromisoformat(entry["published"])
+                    if published_at < cutoff:
+                        continue
+
+                article = Article(
+                    ticker=matched[0],
+                    title=title,
+                    url=entry.get("link", ""),
+                    source=feed_url,
+                    published_at=published_at,
+                    summary=content[:500] if content else None,
+                    raw={"tickers": matched},
+                )
+                articles.append(article)
+            except Exception as e:
+                logger.warning("Failed to parse RSS entry", error=str(e))
+                continue
 
+    return articles
@@ -1,22 +1,64 @@
 """Tavily API client for news search with retries and timeouts."""
 import os
 import time
+import queue
+import asyncio
+import threading
 import httpx
 import structlog
-from typing import List
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime, timedelta
 from agent.state import Article
+from agent.tools.async_utils import run_sync
+from agent.tools.ticker_matcher import TickerMatcher, get_matcher
+from memory.local_cache import SqliteCache
 
 logger = structlog.get_logger()
 
 _timeout = float(os.getenv("HTTP_TIMEOUT_SEC", "40"))
 _max_results = int(os.getenv("NEWS_MAX_RESULTS", "5"))
 _search_depth = os.getenv("NEWS_SEARCH_DEPTH", "basic")
+_async_enabled = os.getenv("NEWS_ASYNC_ENABLED", "true").lower() == "true"
+_max_concurrency = int(os.getenv("NEWS_MAX_CONCURRENCY", "5"))
+_ticker_deadline = float(os.getenv("NEWS_TICKER_DEADLINE_SEC", "60"))
+_cache_enabled = os.getenv("NEWS_CACHE_ENABLED", "true").lower() == "true"
+_cache_ttl = float(os.getenv("NEWS_CACHE_TTL_SEC", "900"))
+_cache_max_entries = int(os.getenv("NEWS_CACHE_MAX_ENTRIES", "2000"))
+
+_TAVILY_URL = "https://api.tavily.com/search"
+_RETRY_DELAYS = [2, 4, 8]
+
+_news_cache: Optional[SqliteCache] = None
+
+
+def _get_news_cache() -> SqliteCache:
+    """Get or create the shared Tavily response cache."""
+    global _news_cache
+    if _news_cache is None:
+        _news_cache = SqliteCache("tavily", max_entries=_cache_max_entries, default_ttl=_cache_ttl)
+    return _news_cache
+
+
+def news_cache_stats() -> Dict[str, object]:
+    """Hit/miss counters of the Tavily response cache."""
+    if not _cache_enabled:
+        return {"enabled": False}
+    return {"enabled": True, "ttl_sec": _cache_ttl, **_get_news_cache().stats()}
+
+
+def _cache_key(ticker: str, time_window_hours: int) -> str:
+    return "|".join([
+        ticker,
+        _query_for(ticker),
+        _search_depth,
+        str(_max_results),
+        f"{time_window_hours}h",
+    ])
 
 
 def _retry_request(func, max_attempts=3, run_id=None):
     """Retry HTTP request with exponential backoff."""
-    delays = [2, 4, 8]
+    delays = _RETRY_DELAYS
     last_error = None
     
     for attempt in range(max_attempts):
@@ -43,76 +85,345 @@ def _retry_request(func, max_attempts=3, run_id=None):
     raise last_error
 
 
+async def _retry_request_async(func, max_attempts=3, run_id=None):
+    """Async variant of _retry_request; backs off with asyncio.sleep."""
+    delays = _RETRY_DELAYS
+    last_error = None
+
+    for attempt in range(max_attempts):
+        try:
+            return await func()
+        except (httpx.HTTPError, httpx.ReadTimeout) as e:
+            last_error = e
+            if attempt < max_attempts - 1:
+                delay = delays[attempt]
+                logger.warning(
+                    "HTTP request failed, retrying",
+                    attempt=attempt + 1,
+                    delay=delay,
+                    error=str(e)[:100],
+                    run_id=run_id,
+                )
+                await asyncio.sleep(delay)
+            else:
+                logger.error("HTTP request failed after retries", error=str(e), run_id=run_id)
+        except Exception as e:
+            logger.error("Unexpected error in HTTP request", error=str(e), run_id=run_id)
+            raise
+
+    raise last_error
+
+
+def _query_for(ticker: str) -> str:
+    return f"{ticker} stock news"
+
+
+def _search_payload(api_key: str, ticker: str) -> dict:
+    """Build the Tavily search request body for a ticker."""
+    return {
+        "api_key": api_key,
+        "query": _query_for(ticker),
+        "search_depth": _search_depth,
+        "include_answer": True,
+        "include_raw_content": False,
+        "max_results": _max_results,
+    }
+
+
+def _parse_results(ticker: str, data: dict, cutoff: datetime) -> List[Article]:
+    """Convert a Tavily response into articles, dropping results older than cutoff."""
+    articles = []
+    for result in data.get("results", []):
+        try:
+            published_at = None
+            if result.get("published_date"):
+                try:
+                    published_at = datetime.fromisoformat(
+                        result["published_date"].replace("Z", "+00:00")
+                    )
+                except (ValueError, AttributeError):
+                    pass
+
+            if published_at and published_at < cutoff:
+                continue
+
+            article = Article(
+                ticker=ticker,
+                title=result.get("title", ""),
+                url=result.get("url", ""),
+                source=result.get("source", ""),
+                published_at=published_at,
+                summary=result.get("content", ""),
+                raw=result,
+            )
+            articles.append(article)
+        except Exception as e:
+            logger.warning("Failed to parse article", ticker=ticker, error=str(e))
+            continue
+    return articles
+
+
+def _fetch_ticker(
+    client: httpx.Client, api_key: str, ticker: str, cutoff: datetime, run_id: str = None
+) -> Optional[List[Article]]:
+    """Fetch one ticker on a blocking client. Returns None if the request failed."""
+    try:
+        def _make_request():
+            return client.post(
+                _TAVILY_URL,
+                json=_search_payload(api_key, ticker),
+                headers={"Content-Type": "application/json"},
+            )
+
+        response = _retry_request(_make_request, run_id=run_id)
+        response.raise_for_status()
+        data = response.json()
+        logger.info(
+            "Fetched Tavily results",
+            ticker=ticker,
+            count=len(data.get("results", [])),
+            run_id=run_id,
+        )
+        return _parse_results(ticker, data, cutoff)
+    except Exception as e:
+        logger.error("Tavily API error", ticker=ticker, error=str(e), run_id=run_id)
+        return None
+
+
+async def _fetch_ticker_async(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    api_key: str,
+    ticker: str,
+    cutoff: datetime,
+    deadline: float,
+    run_id: str = None,
+) -> Optional[List[Article]]:
+    """Fetch one ticker on the shared async client, bounded by the semaphore and deadline."""
+    async def _make_request():
+        return await client.post(
+            _TAVILY_URL,
+            json=_search_payload(api_key, ticker),
+            headers={"Content-Type": "application/json"},
+        )
+
+    async with semaphore:
+        try:
+            response = await asyncio.wait_for(
+                _retry_request_async(_make_request, run_id=run_id), timeout=deadline
+            )
+            response.raise_for_status()
+            data = response.json()
+        except asyncio.TimeoutError:
+            logger.error("Tavily ticker deadline exceeded", ticker=ticker, deadline=deadline, run_id=run_id)
+            return None
+        except Exception as e:
+            logger.error("Tavily API error", ticker=ticker, error=str(e), run_id=run_id)
+            return None
+
+    logger.info(
+        "Fetched Tavily results",
+        ticker=ticker,
+        count=len(data.get("results", [])),
+        run_id=run_id,
+    )
+    return _parse_results(ticker, data, cutoff)
+
+
+async def _fetch_all_async(
+    api_key: str,
+    tickers: List[str],
+    cutoff: datetime,
+    run_id: str = None,
+    max_concurrency: Optional[int] = None,
+    ticker_deadline: Optional[float] = None,
+) -> Dict[str, Optional[List[Article]]]:
+    """Query every ticker concurrently. Maps ticker -> articles, or None if it failed."""
+    max_concurrency = max(1, max_concurrency or _max_concurrency)
+    deadline = ticker_deadline or _ticker_deadline
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+
+    async with httpx.AsyncClient(timeout=_timeout, limits=limits) as client:
+        results = await asyncio.gather(*(
+            _fetch_ticker_async(client, semaphore, api_key, ticker, cutoff, deadline, run_id)
+            for ticker in tickers
+        ))
+    return dict(zip(tickers, results))
+
+
+def _fetch_all_sync(
+    api_key: str, tickers: List[str], cutoff: datetime, run_id: str = None
+) -> Dict[str, Optional[List[Article]]]:
+    """Query tickers one by one on a blocking client."""
+    with httpx.Client(timeout=_timeout) as client:
+        return {ticker: _fetch_ticker(client, api_key, ticker, cutoff, run_id) for ticker in tickers}
+
+
+async def fetch_news_for_tickers_async(
+    tickers: List[str],
+    time_window_hours: int = 24,
+    run_id: str = None,
+    max_concurrency: Optional[int] = None,
+    ticker_deadline: Optional[float] = None,
+) -> List[Article]:
+    """
+    Fetch news for all tickers concurrently on one httpx.AsyncClient.
+
+    At most max_concurrency queries are in flight at once, and each ticker
+    (including its retries) is abandoned after ticker_deadline seconds.
+    Results are returned grouped per ticker, in the order of `tickers`.
+    """
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        logger.warning("TAVILY_API_KEY not set, returning empty results", run_id=run_id)
+        return []
+
+    cutoff = datetime.utcnow() - timedelta(hours=time_window_hours)
+    results = await _fetch_all_async(api_key, tickers, cutoff, run_id, max_concurrency, ticker_deadline)
+
+    articles = []
+    for ticker in tickers:
+        articles.extend(results[ticker] or [])
+    return articles
+
+
+def _cached_results(tickers: List[str], time_window_hours: int, cutoff: datetime) -> Dict[str, List[Article]]:
+    """Cached articles per ticker, trimmed to this run's window (empty if caching is off)."""
+    if not _cache_enabled:
+        return {}
+    keys = {ticker: _cache_key(ticker, time_window_hours) for ticker in tickers}
+    cached = _get_news_cache().get_many(keys.values())
+    results = {}
+    for ticker, key in keys.items():
+        if key in cached:
+            articles = [Article(**a) for a in cached[key]]
+            # Cached entries may predate the cutoff of this run's window
+            results[ticker] = [
+                a for a in articles
+                if not (a.published_at and a.published_at.replace(tzinfo=None) < cutoff)
+            ]
+    return results
+
+
+def _store_results(fetched: Dict[str, Optional[List[Article]]], time_window_hours: int):
+    """Cache successful ticker queries; failed ones are not cached, so the next run retries them."""
+    if not _cache_enabled:
+        return
+    to_cache = {
+        _cache_key(ticker, time_window_hours): [a.model_dump(mode="json") for a in articles]
+        for ticker, articles in fetched.items()
+        if articles is not None
+    }
+    if to_cache:
+        _get_news_cache().set_many(to_cache)
+
+
+def _attribute(articles: List[Article], matcher: TickerMatcher) -> List[Article]:
+    """Record every watchlist ticker an article mentions in raw["tickers"], its queried ticker first."""
+    for article in articles:
+        mentioned = matcher.match(f"{article.title}\n{article.summary or ''}")
+        article.raw = {
+            **(article.raw or {}),
+            "tickers": [article.ticker] + [t for t in mentioned if t != article.ticker],
+        }
+    return articles
+
+
 def fetch_news_for_tickers(tickers: List[str], time_window_hours: int = 24, run_id: str = None) -> List[Article]:
-    """Fetch news articles for given tickers using Tavily API with retries."""
+    """
+    Fetch news articles for given tickers using Tavily API with retries.
+
+    Tickers searched within the last NEWS_CACHE_TTL_SEC (by any run or worker)
+    are served from the response cache. The rest fan out concurrently unless
+    NEWS_ASYNC_ENABLED=false, in which case they are queried one by one.
+    """
     api_key = os.getenv("TAVILY_API_KEY")
     if not api_key:
         logger.warning("TAVILY_API_KEY not set, returning empty results", run_id=run_id)
         return []
 
+    cutoff = datetime.utcnow() - timedelta(hours=time_window_hours)
+    results: Dict[str, List[Article]] = _cached_results(tickers, time_window_hours, cutoff)
+
+    missing = [ticker for ticker in tickers if ticker not in results]
+    if missing:
+        if _async_enabled:
+            fetched = run_sync(_fetch_all_async(api_key, missing, cutoff, run_id))
+        else:
+            fetched = _fetch_all_sync(api_key, missing, cutoff, run_id)
+        _store_results(fetched, time_window_hours)
+        for ticker, articles in fetched.items():
+            results[ticker] = articles or []
+
+    if _cache_enabled:
+        logger.info(
+            "Tavily cache lookup",
+            hits=len(tickers) - len(missing),
+            misses=len(missing),
+            run_id=run_id,
+        )
+
     articles = []
+    for ticker in tickers:
+        articles.extend(results.get(ticker, []))
+    return _attribute(articles, get_matcher(tickers))
+
+
+def iter_news_for_tickers(
+    tickers: List[str], time_window_hours: int = 24, run_id: str = None
+) -> Iterator[List[Article]]:
+    """
+    Yield each ticker's articles as soon as they are available.
+
+    Cached tickers come first; the rest are queried concurrently on a helper
+    thread and yielded in completion order, so callers can start processing
+    while slower tickers are still in flight.
+    """
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        logger.warning("TAVILY_API_KEY not set, returning empty results", run_id=run_id)
+        return
+
     cutoff = datetime.utcnow() - timedelta(hours=time_window_hours)
+    matcher = get_matcher(tickers)
+    cached = _cached_results(tickers, time_window_hours, cutoff)
+    for ticker in tickers:
+        if cached.get(ticker):
+            yield _attribute(cached[ticker], matcher)
 
-    with httpx.Client(timeout=_timeout) as client:
-        for ticker in tickers:
-            try:
-                query = f"{ticker} stock news"
-                
-                def _make_request():
-                    return client.post(
-                        "https://api.tavily.com/search",
-                        json={
-                            "api_key": api_key,
-                            "query": query,
-                            "search_depth": _search_depth,
-                            "include_answer": True,
-                            "include_raw_content": False,
-                            "max_results": _max_results,
-                        },
-                        headers={"Content-Type": "application/json"},
-                    )
-                
-                response = _retry_request(_make_request, run_id=run_id)
-                response.raise_for_status()
-                data = response.json()
-
-                for result in data.get("results", []):
-                    try:
-                        published_at = None
-                        if result.get("published_date"):
-                            try:
-                                published_at = datetime.fromisoformat(
-                                    result["published_date"].replace("Z", "+00:00")
-                                )
-                            except (ValueError, AttributeError):
-                                pass
-
-                        if published_at and published_at < cutoff:
-                            continue
-
-                        article = Article(
-                            ticker=ticker,
-                            title=result.get("title", ""),
-                            url=result.get("url", ""),
-                            source=result.get("source", ""),
-                            published_at=published_at,
-                            summary=result.get("content", ""),
-                            raw=result,
-                        )
-                        articles.append(article)
-                    except Exception as e:
-                        logger.warning("Failed to parse article", ticker=ticker, error=str(e))
-                        continue
-
-                logger.info(
-                    "Fetched Tavily results",
-                    ticker=ticker,
-                    count=len(data.get("results", [])),
-                    run_id=run_id,
+    missing = [ticker for ticker in tickers if ticker not in cached]
+    if not missing:
+        return
+
+    done = object()
+    results: "queue.Queue" = queue.Queue()
+
+    async def _produce():
+        semaphore = asyncio.Semaphore(max(1, _max_concurrency))
+        limits = httpx.Limits(max_connections=_max_concurrency, max_keepalive_connections=_max_concurrency)
+        async with httpx.AsyncClient(timeout=_timeout, limits=limits) as client:
+            async def _one(ticker: str):
+                return ticker, await _fetch_ticker_async(
+                    client, semaphore, api_key, ticker, cutoff, _ticker_deadline, run_id
                 )
-            except Exception as e:
-                logger.error("Tavily API error", ticker=ticker, error=str(e), run_id=run_id)
-                continue
+            for next_done in asyncio.as_completed([_one(ticker) for ticker in missing]):
+                results.put(await next_done)
 
-    return articles
+    def _run():
+        try:
+            asyncio.run(_produce())
+        except Exception as e:
+            logger.error("Tavily streaming fetch failed", error=str(e), run_id=run_id)
+        finally:
+            results.put(done)
 
+    threading.Thread(target=_run, name="tavily-stream", daemon=True).start()
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        ticker, articles = item
+        _store_results({ticker: articles}, time_window_hours)
+        if articles:
+            yield _attribute(articles, matcher)
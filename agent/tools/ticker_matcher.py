@@ -0,0 +1,115 @@
+"""Attribute news text to watchlist tickers in one scan (symbols, cashtags and company-name aliases)."""
+import os
+import re
+import json
+import structlog
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = structlog.get_logger()
+
+_aliases_file = os.getenv("TICKER_ALIASES_FILE")
+_short_symbol_len = int(os.getenv("TICKER_SHORT_SYMBOL_LEN", "2"))
+
+DEFAULT_ALIASES: Dict[str, List[str]] = {
+    "AAPL": ["Apple"],
+    "MSFT": ["Microsoft"],
+    "NVDA": ["Nvidia", "NVIDIA"],
+    "GOOGL": ["Alphabet", "Google"],
+    "GOOG": ["Alphabet", "Google"],
+    "AMZN": ["Amazon"],
+    "META": ["Meta Platforms", "Facebook"],
+    "TSLA": ["Tesla"],
+    "NFLX": ["Netflix"],
+    "AMD": ["Advanced Micro Devices"],
+    "INTC": ["Intel"],
+    "JPM": ["JPMorgan", "JPMorgan Chase"],
+    "BRK.B": ["Berkshire Hathaway"],
+}
+
+# Symbols that are also everyday words; like short symbols they only count
+# as a cashtag ($NOW), in parentheses ((NOW)) or after an exchange prefix.
+AMBIGUOUS_SYMBOLS = {
+    "ALL", "ANY", "ARE", "BIG", "CAN", "CAR", "CAT", "EAT", "FAST", "FUN", "GO", "HAS",
+    "KEY", "LOVE", "LOW", "NOW", "ONE", "OPEN", "PLAY", "REAL", "SEE", "TRUE", "TWO", "WELL",
+}
+
+# prefix ($, "(" or "NYSE:"), then a symbol-like word (BRK.B, BF-B); trailing char for "(IT)"
+_TOKEN_RE = re.compile(
+    r"(\$|\(|\b(?:NYSE|NASDAQ|Nasdaq|AMEX|NYSEARCA)\s*:\s*)?"
+    r"\b([A-Za-z][A-Za-z0-9]*(?:[.\-][A-Za-z])?)\b(\))?"
+)
+
+
+def _load_aliases() -> Dict[str, List[str]]:
+    """DEFAULT_ALIASES, extended/overridden by TICKER_ALIASES_FILE ({"TICKER": ["Name", ...]})."""
+    aliases = {k: list(v) for k, v in DEFAULT_ALIASES.items()}
+    if _aliases_file:
+        try:
+            with open(_aliases_file, encoding="utf-8") as f:
+                aliases.update({k.upper(): list(v) for k, v in json.load(f).items()})
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to load ticker aliases, using defaults", path=_aliases_file, error=str(e))
+    return aliases
+
+
+class TickerMatcher:
+    """
+    Matches a fixed watchlist against free text.
+
+    Each text is tokenized once; every token (and every alias-length n-gram)
+    is a dict lookup, so cost grows with text length, not watchlist size.
+    Symbols must appear upper-case as written; short or word-like symbols
+    additionally need a cashtag, parentheses or an exchange prefix.
+    """
+
+    def __init__(self, tickers: Iterable[str], aliases: Optional[Dict[str, List[str]]] = None):
+        self.tickers = [t.upper() for t in tickers]
+        self._symbols = set(self.tickers)
+        self._needs_marker = {
+            t for t in self._symbols if len(t) <= _short_symbol_len or t in AMBIGUOUS_SYMBOLS
+        }
+        self._aliases: Dict[Tuple[str, ...], str] = {}
+        for ticker, names in (aliases or {}).items():
+            if ticker.upper() not in self._symbols:
+                continue
+            for name in names:
+                words = tuple(name.split())
+                self._aliases.setdefault(words, ticker.upper())
+                self._aliases.setdefault(tuple(w.upper() for w in words), ticker.upper())
+        self._max_alias_len = max((len(k) for k in self._aliases), default=0)
+
+    def match(self, text: str) -> List[str]:
+        """Watchlist tickers mentioned in text, in order of first mention."""
+        if not text:
+            return []
+        first_seen: Dict[str, int] = {}
+        words: List[str] = []
+        for position, (prefix, word, closing) in enumerate(_TOKEN_RE.findall(text)):
+            words.append(word)
+            symbol = word.upper() if prefix == "$" else word
+            if symbol not in self._symbols or symbol in first_seen:
+                continue
+            if symbol in self._needs_marker:
+                marked = prefix == "$" or (prefix == "(" and closing) or prefix.rstrip().endswith(":")
+                if not marked:
+                    continue
+            first_seen[symbol] = position
+
+        if self._aliases:
+            for i in range(len(words)):
+                for n in range(1, min(self._max_alias_len, len(words) - i) + 1):
+                    ticker = self._aliases.get(tuple(words[i:i + n]))
+                    if ticker and first_seen.get(ticker, i + 1) > i:
+                        first_seen[ticker] = i
+        return sorted(first_seen, key=first_seen.get)
+
+
+@lru_cache(maxsize=32)
+def _cached_matcher(tickers: Tuple[str, ...]) -> TickerMatcher:
+    return TickerMatcher(tickers, _load_aliases())
+
+
+def get_matcher(tickers: Iterable[str]) -> TickerMatcher:
+    """Matcher for a watchlist (with the configured aliases), built once per distinct watchlist."""
+    return _cached_matcher(tuple(sorted({t.upper() for t in tickers})))
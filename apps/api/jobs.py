@@ -0,0 +1,272 @@
+"""Persistent run queue with a bounded worker pool for asynchronous /run requests."""
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+import structlog
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from agent.graph import app as agent_app
+from agent.state import RunState
+from memory.kv_store import update_run_status
+
+logger = structlog.get_logger()
+
+_db_path = os.getenv("JOB_QUEUE_DB", os.path.join(os.getenv("CACHE_DIR", ".cache"), "jobs.sqlite3"))
+_max_workers = int(os.getenv("RUN_WORKERS", "2"))
+_heartbeat_sec = float(os.getenv("JOB_HEARTBEAT_SEC", "15"))
+_stale_sec = float(os.getenv("JOB_STALE_SEC", "60"))
+
+GRAPH_NODES = ["plan", "news", "prices", "analyze", "report"]
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of agent runs executed on a bounded thread pool.
+
+    Jobs are persisted before they are submitted, so queued work (and work
+    interrupted by a restart) is picked up again by start(). A job is claimed
+    with a conditional UPDATE that records the claiming process as owner, and
+    the owner refreshes updated_at while the job runs. Only running jobs whose
+    heartbeat is older than JOB_STALE_SEC are re-queued, so several API
+    processes sharing the database never execute the same run twice.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_workers: Optional[int] = None):
+        self.db_path = db_path or _db_path
+        self.max_workers = max(1, max_workers or _max_workers)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._db_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._db_ready:
+            self._init_db()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        parent = os.path.dirname(self.db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute(
+                """create table if not exists jobs (
+                    run_id text primary key,
+                    tickers text not null,
+                    time_window_hours integer not null,
+                    status text not null default 'queued',
+                    progress text not null default '{}',
+                    artifacts text not null default '[]',
+                    errors text not null default '[]',
+                    created_at real not null,
+                    started_at real,
+                    finished_at real,
+                    owner text,
+                    updated_at real
+                )"""
+            )
+            columns = {r[1] for r in conn.execute("pragma table_info(jobs)")}
+            for column, kind in (("owner", "text"), ("updated_at", "real")):
+                if column not in columns:
+                    conn.execute(f"alter table jobs add column {column} {kind}")
+            conn.execute("create index if not exists idx_jobs_status on jobs (status, created_at)")
+        finally:
+            conn.close()
+        self._db_ready = True
+
+    def start(self):
+        """Start the worker pool and heartbeat, and resubmit queued or abandoned jobs."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="run-worker")
+            self._stop.clear()
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+        interrupted = self._requeue_stale()
+        conn = self._connect()
+        try:
+            pending = [r["run_id"] for r in conn.execute(
+                "select run_id from jobs where status = 'queued' order by created_at"
+            )]
+        finally:
+            conn.close()
+
+        for run_id in pending:
+            self._submit(run_id)
+        logger.info("Job queue started", workers=self.max_workers, resumed=len(pending), interrupted=interrupted)
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work. Unfinished jobs stay queued in the database."""
+        self._stop.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _submit(self, run_id: str):
+        executor = self._executor
+        if executor is not None:
+            executor.submit(self._execute, run_id)
+
+    def _requeue_stale(self) -> int:
+        """Re-queue running jobs whose owner stopped heartbeating (crashed or killed process)."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "update jobs set status = 'queued', owner = null "
+                "where status = 'running' and (updated_at is null or updated_at < ?)",
+                (time.time() - _stale_sec,),
+            ).rowcount
+        finally:
+            conn.close()
+
+    def _heartbeat_loop(self):
+        """Refresh this process's running jobs and pick up jobs abandoned by dead processes."""
+        while not self._stop.wait(_heartbeat_sec):
+            try:
+                conn = self._connect()
+                try:
+                    conn.execute(
+                        "update jobs set updated_at = ? where owner = ? and status = 'running'",
+                        (time.time(), self.owner),
+                    )
+                finally:
+                    conn.close()
+                if self._requeue_stale():
+                    conn = self._connect()
+                    try:
+                        pending = [r["run_id"] for r in conn.execute(
+                            "select run_id from jobs where status = 'queued' order by created_at"
+                        )]
+                    finally:
+                        conn.close()
+                    for run_id in pending:
+                        self._submit(run_id)
+            except Exception as e:
+                logger.warning("Job heartbeat failed", error=str(e))
+
+    def enqueue(self, run_id: str, tickers: List[str], time_window_hours: int):
+        """Persist a job and hand it to the worker pool."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "insert into jobs (run_id, tickers, time_window_hours, created_at) values (?, ?, ?, ?)",
+                (run_id, json.dumps(tickers), time_window_hours, time.time()),
+            )
+        finally:
+            conn.close()
+        logger.info("Queued run", run_id=run_id, tickers=tickers)
+        if self._executor is None:
+            self.start()
+        else:
+            self._submit(run_id)
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's status and progress, or None if it was not queued here."""
+        conn = self._connect()
+        try:
+            row = conn.execute("select * from jobs where run_id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            for key in ("tickers", "progress", "artifacts", "errors"):
+                job[key] = json.loads(job[key])
+            if job["status"] == "queued":
+                job["progress"]["queue_position"] = conn.execute(
+                    "select count(*) from jobs where status = 'queued' and created_at < ?",
+                    (job["created_at"],),
+                ).fetchone()[0]
+            return job
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts per status plus the pool size."""
+        conn = self._connect()
+        try:
+            counts = {r["status"]: r["n"] for r in conn.execute(
+                "select status, count(*) as n from jobs group by status"
+            )}
+        finally:
+            conn.close()
+        return {"workers": self.max_workers, **counts}
+
+    def _claim(self, run_id: str) -> Optional[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            now = time.time()
+            claimed = conn.execute(
+                "update jobs set status = 'running', started_at = ?, updated_at = ?, owner = ? "
+                "where run_id = ? and status = 'queued'",
+                (now, now, self.owner, run_id),
+            ).rowcount
+            if not claimed:
+                return None
+            return conn.execute("select * from jobs where run_id = ?", (run_id,)).fetchone()
+        finally:
+            conn.close()
+
+    def _update(self, run_id: str, **fields):
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        values = [json.dumps(v) if isinstance(v, (dict, list)) else v for v in fields.values()]
+        conn = self._connect()
+        try:
+            conn.execute(f"update jobs set {columns} where run_id = ?", (*values, run_id))
+        finally:
+            conn.close()
+
+    def _execute(self, run_id: str):
+        """Worker entry point: run the graph, streaming per-node progress into the job row."""
+        job = self._claim(run_id)
+        if job is None:
+            return
+
+        state = RunState(
+            run_id=run_id,
+            tickers=json.loads(job["tickers"]),
+            time_window_hours=job["time_window_hours"],
+        )
+        progress: Dict[str, Any] = {"completed_nodes": [], "total_nodes": len(GRAPH_NODES), "timings": {}}
+        final: Dict[str, Any] = {}
+        try:
+            for mode, chunk in agent_app.stream(state, stream_mode=["updates", "values"]):
+                if mode == "values":
+                    final = chunk
+                    continue
+                for node, update in chunk.items():
+                    progress["completed_nodes"].append(node)
+                    progress["timings"].update((update or {}).get("timings", {}))
+                self._update(run_id, progress=progress, updated_at=time.time())
+
+            errors = list(final.get("errors", []))
+            status = "completed" if not errors else "failed"
+            self._update(
+                run_id,
+                status=status,
+                artifacts=list(final.get("artifacts", [])),
+                errors=errors,
+                finished_at=time.time(),
+            )
+        except Exception as e:
+            logger.error("Queued run failed", run_id=run_id, error=str(e), exc_info=True)
+            status, errors = "failed", [f"run error: {str(e)}"]
+            self._update(run_id, status=status, errors=errors, finished_at=time.time())
+
+        try:
+            update_run_status(run_id, status, errors)
+        except Exception as e:
+            logger.warning("Failed to update run status", run_id=run_id, error=str(e))
+        logger.info("Queued run finished", run_id=run_id, status=status, timings=progress["timings"])
+
+
+job_queue = JobQueue()
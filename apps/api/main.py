@@ -1,20 +1,34 @@
 """FastAPI main application."""
 import os
 import re
+import asyncio
+import uuid
+import base64
 import traceback
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, field_validator
 import logging
 import structlog
 from dotenv import load_dotenv
-from supabase import create_client
 from agent.graph import app as agent_app
 from agent.state import RunState
-from memory.kv_store import update_run_status, _get_supabase_client
+from memory.kv_store import create_run, update_run_status
+from memory.supabase_client import get_supabase_client, supabase_pool_stats
+from apps.api.jobs import job_queue
+from apps.api.signed_urls import signed_url_cache
+from agent.reporting.render import cached_markdown, report_render_stats
+from agent.reporting.pdf_service import WEASYPRINT_AVAILABLE, pdf_service
+from agent.tools.tavily_client import news_cache_stats
+from agent.tools.alpha_vantage import price_cache_stats
+from memory.vector_store import embedding_writer_stats, find_similar_articles
+from memory.embedding_provider import embedding_cache_stats, preload_embedding_model
+from memory.seen_index import seen_index_stats
+from memory import supabase_sql
 
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent.parent / ".env"
@@ -59,6 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -82,6 +97,7 @@ class RunResponse(BaseModel):
     artifacts: List[str]
     notes: List[str]
     errors: List[str]
+    timings: Dict[str, float] = Field(default_factory=dict)
 
 
 class RunStatusResponse(BaseModel):
@@ -91,6 +107,12 @@ class RunStatusResponse(BaseModel):
     finished_at: Optional[str]
     errors: List[str] = Field(default_factory=list)
     artifacts: List[str] = Field(default_factory=list)
+    progress: Optional[Dict[str, Any]] = None
+
+
+class SimilarArticle(BaseModel):
+    article_id: str
+    distance: float
 
 
 class ReportItem(BaseModel):
@@ -101,30 +123,95 @@ class ReportItem(BaseModel):
     tickers: List[str]
 
 
+class ReportPdf(BaseModel):
+    path: str
+    pdf_path: str
+    signed_url_pdf: Optional[str] = None
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    """Start run workers and resume jobs left queued by a previous process."""
+    await run_in_threadpool(job_queue.start)
+
+
+@app.on_event("startup")
+async def preload_models():
+    """Load the local embedding model before serving (EMBED_PRELOAD=true)."""
+    if os.getenv("EMBED_PRELOAD", "false").lower() != "true":
+        return
+    try:
+        await run_in_threadpool(preload_embedding_model)
+    except Exception as e:
+        logger.warning("Embedding model preload failed, will load on first use", error=str(e))
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    """Stop run workers; unfinished jobs stay queued for the next start."""
+    job_queue.shutdown(wait=False)
+
+
+@app.on_event("shutdown")
+async def close_sql_engine():
+    """Close pooled database connections."""
+    await supabase_sql.dispose_engine()
+
+
+@app.on_event("shutdown")
+async def stop_pdf_workers():
+    """Stop the PDF render pool."""
+    pdf_service.shutdown(wait=False)
+
+
 @app.get("/health")
 async def health():
     """Health check endpoint."""
     return {"status": "healthy", "service": "ai-stock-agent-api"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Queue depth and cache counters for this API process."""
+    return {
+        "jobs": await run_in_threadpool(job_queue.stats),
+        "news_cache": await run_in_threadpool(news_cache_stats),
+        "price_cache": await run_in_threadpool(price_cache_stats),
+        "embedding_writer": embedding_writer_stats(),
+        "embedding_cache": await run_in_threadpool(embedding_cache_stats),
+        "seen_index": await run_in_threadpool(seen_index_stats),
+        "supabase_pool": supabase_pool_stats(),
+        "signed_urls": signed_url_cache.stats(),
+        "report_render": report_render_stats(),
+        "pdf": pdf_service.stats(),
+    }
+
+
 @app.post("/run", response_model=RunResponse)
 async def run_agent(request: RunRequest, sync: bool = Query(default=True)):
     """
     Trigger agent run.
     
-    Returns run_id immediately if sync=false (future async mode).
-    Currently synchronous: runs to completion before returning.
+    sync=true runs the graph to completion (on a worker thread) before returning.
+    sync=false queues the run on the job pool and returns its run_id immediately;
+    poll /runs/{run_id} for progress.
     """
-    logger.info("Starting agent run", tickers=request.tickers, hours=request.hours)
+    logger.info("Starting agent run", tickers=request.tickers, hours=request.hours, sync=sync)
 
     try:
+        hours = request.hours or 24
+        if not sync:
+            run_id = await run_in_threadpool(create_run, request.tickers, hours)
+            await run_in_threadpool(job_queue.enqueue, run_id, request.tickers, hours)
+            return RunResponse(run_id=run_id, artifacts=[], notes=["queued"], errors=[])
+
         state = RunState(
             tickers=request.tickers,
-            time_window_hours=request.hours or 24,
+            time_window_hours=hours,
         )
 
-        # Invoke agent graph
-        result = agent_app.invoke(state)
+        # Invoke agent graph off the event loop
+        result = await run_in_threadpool(agent_app.invoke, state)
 
         # Handle both dict and RunState object (LangGraph may return either)
         if isinstance(result, dict):
@@ -132,24 +219,27 @@ async def run_agent(request: RunRequest, sync: bool = Query(default=True)):
             run_id = result.get("run_id", "")
             artifacts = result.get("artifacts", [])
             notes = result.get("notes", [])
+            timings = result.get("timings", {})
         else:
             # RunState object
             errors = result.errors if hasattr(result, 'errors') else []
             run_id = result.run_id if hasattr(result, 'run_id') else ""
             artifacts = result.artifacts if hasattr(result, 'artifacts') else []
             notes = result.notes if hasattr(result, 'notes') else []
+            timings = result.timings if hasattr(result, 'timings') else {}
 
         # Update run status
         status = "completed" if not errors else "failed"
-        update_run_status(run_id, status, errors)
+        await run_in_threadpool(update_run_status, run_id, status, errors)
 
-        logger.info("Agent run completed", run_id=run_id, status=status, artifacts_count=len(artifacts))
+        logger.info("Agent run completed", run_id=run_id, status=status, artifacts_count=len(artifacts), timings=timings)
 
         return RunResponse(
             run_id=run_id,
             artifacts=artifacts,
             notes=notes,
             errors=errors,
+            timings=timings,
         )
     except Exception as e:
         error_msg = str(e)
@@ -158,43 +248,58 @@ async def run_agent(request: RunRequest, sync: bool = Query(default=True)):
         raise HTTPException(status_code=500, detail=f"Agent execution failed: {error_msg}")
 
 
+def _iso(value: Any) -> Optional[str]:
+    """Timestamps come back as datetimes from SQL and as ISO strings from PostgREST."""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _fetch_run_with_reports_rest(run_id: str) -> Optional[Dict[str, Any]]:
+    """PostgREST fallback for fetch_run_with_reports when SUPABASE_DB_URL is not set."""
+    sb = get_supabase_client()
+    result = sb.table("runs").select("*").eq("id", run_id).limit(1).execute()
+    if not result.data:
+        return None
+    reports = sb.table("reports").select("supabase_path").eq("run_id", run_id).execute()
+    return {**result.data[0], "artifacts": [r["supabase_path"] for r in (reports.data or [])]}
+
+
 @app.get("/runs/{run_id}", response_model=RunStatusResponse)
 async def get_run_status(run_id: str):
     """Get run status and details."""
     # Validate UUID format
     try:
-        import uuid
         uuid.UUID(run_id)
     except (ValueError, TypeError):
         raise HTTPException(status_code=400, detail=f"Invalid run_id format: {run_id}")
     
+    job = await run_in_threadpool(job_queue.get, run_id)
+
     try:
-        sb = _get_supabase_client()
-        result = sb.table("runs").select("*").eq("id", run_id).limit(1).execute()
-        
-        if not result.data:
+        if supabase_sql.sql_enabled():
+            run = await supabase_sql.fetch_run_with_reports(run_id)
+        else:
+            run = await run_in_threadpool(_fetch_run_with_reports_rest, run_id)
+
+        if not run:
             raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
-        
-        run = result.data[0]
-        
+
         # Coalesce None to empty list for arrays (PostgREST returns null for empty arrays)
         errors = run.get("errors") or []
-        if errors is None:
-            errors = []
-        
-        # Get artifacts from reports table
-        reports = sb.table("reports").select("supabase_path").eq("run_id", run_id).execute()
-        artifacts = [r["supabase_path"] for r in (reports.data or [])]
-        if artifacts is None:
-            artifacts = []
+        artifacts = run.get("artifacts") or []
+
+        # Queued/running jobs report their own status; the runs row only says 'running'
+        status = run.get("status", "unknown")
+        if job and job["status"] in ("queued", "running"):
+            status = job["status"]
         
         return RunStatusResponse(
             run_id=run["id"],
-            status=run.get("status", "unknown"),
-            started_at=run.get("started_at"),
-            finished_at=run.get("finished_at"),
+            status=status,
+            started_at=_iso(run.get("started_at")),
+            finished_at=_iso(run.get("finished_at")),
             errors=errors,
             artifacts=artifacts,
+            progress=job["progress"] if job else None,
         )
     except HTTPException:
         raise
@@ -203,95 +308,199 @@ async def get_run_status(run_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch run status: {str(e)}")
 
 
+@app.get("/articles/{article_id}/similar", response_model=List[SimilarArticle])
+async def similar_articles(
+    article_id: str,
+    k: int = Query(default=10, ge=1, le=100),
+    ticker: Optional[str] = Query(None, description="Only articles for this ticker"),
+    since: Optional[str] = Query(None, description="Only articles published since (ISO date)"),
+):
+    """
+    Nearest stored articles from the local ANN index (no database round trip).
+
+    Exceptions: EMBED_STORAGE_MODE=halfvec searches in Postgres, and an int8
+    index with EMBED_RERANK_FACTOR > 1 re-ranks against Supabase vectors.
+    """
+    try:
+        uuid.UUID(article_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail=f"Invalid article_id format: {article_id}")
+
+    try:
+        results = await run_in_threadpool(
+            find_similar_articles, article_id, k, ticker.upper() if ticker else None, since
+        )
+    except Exception as e:
+        logger.error("Similar articles lookup failed", article_id=article_id, error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Similar articles lookup failed: {str(e)}")
+    return [SimilarArticle(**r) for r in results]
+
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for the position just after row."""
+    raw = f"{_iso(row['created_at'])}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """(created_at, id) from a cursor; ValueError if it is malformed."""
+    try:
+        created_at, report_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), str(uuid.UUID(report_id))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _fetch_reports_rest(
+    date: Optional[str], path: Optional[str], limit: int, before: Optional[Tuple[datetime, str]]
+) -> List[Dict[str, Any]]:
+    """PostgREST fallback for fetch_reports when SUPABASE_DB_URL is not set."""
+    sb = get_supabase_client()
+    query = (
+        sb.table("reports")
+        .select("id, supabase_path, pdf_path, date_utc, tickers, created_at")
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit)
+    )
+    if path:
+        # Get specific report by path
+        query = query.eq("supabase_path", path).limit(1)
+    elif date:
+        # Filter by date_utc column
+        query = query.eq("date_utc", date)
+    if before:
+        at, report_id = before[0].isoformat(), before[1]
+        query = query.or_(f'created_at.lt."{at}",and(created_at.eq."{at}",id.lt.{report_id})')
+    return query.execute().data or []
+
+
+def _signed_report_items(reports_data: List[Dict[str, Any]]) -> List[ReportItem]:
+    """Report items with Markdown and (stored) PDF links signed in bulk."""
+    bucket = os.getenv("REPORT_BUCKET", "reports")
+    paths = [r.get("supabase_path") for r in reports_data] + [r.get("pdf_path") for r in reports_data]
+    signed = signed_url_cache.get_many(bucket, paths)
+
+    report_items = []
+    for report in reports_data:
+        path_val = report.get("supabase_path", "")
+        if not path_val:
+            continue
+
+        # Get tickers from database column (already an array)
+        tickers = report.get("tickers", [])
+        if not isinstance(tickers, list):
+            tickers = []
+
+        report_items.append(ReportItem(
+            path=path_val,
+            signed_url_md=signed.get(path_val),
+            # Only reports with a stored pdf_path have a PDF; no speculative signing
+            signed_url_pdf=signed.get(report["pdf_path"]) if report.get("pdf_path") else None,
+            date=str(report.get("date_utc", "")),
+            tickers=tickers,
+        ))
+    return report_items
+
+
 @app.get("/reports", response_model=List[ReportItem])
 async def list_reports(
+    response: Response,
     date: Optional[str] = Query(None, description="Filter by date YYYY-MM-DD"),
     path: Optional[str] = Query(None, description="Get specific report by path"),
+    limit: int = Query(200, ge=1, le=1000, description="Reports per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
 ):
     """
-    List reports with signed URLs (server-side via service role).
-    
-    Uses Fix A: Lists from reports table (more reliable than walking storage folders).
-    Can filter by date or get specific report by path.
+    List reports with signed URLs (server-side via service role), newest first.
+
+    Lists from the reports table (more reliable than walking storage folders).
+    Can filter by date or get specific report by path. When more rows may
+    follow, the X-Next-Cursor header holds the cursor for the next page.
     """
+    if date:
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid date format: {date}")
     try:
-        sb = _get_supabase_client()
-        bucket = os.getenv("REPORT_BUCKET", "reports")
-        
-        # Query reports table for report paths (more reliable than walking storage)
-        query = sb.table("reports").select("supabase_path, date_utc, tickers, created_at").order("created_at", desc=True).limit(200)
-        
-        if path:
-            # Get specific report by path
-            query = query.eq("supabase_path", path).limit(1)
-        elif date:
-            # Filter by date_utc column
-            query = query.eq("date_utc", date)
-        
-        result = query.execute()
-        reports_data = result.data or []
-        
+        before = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if supabase_sql.sql_enabled():
+            reports_data = await supabase_sql.fetch_reports(date=date, path=path, limit=limit, before=before)
+        else:
+            reports_data = await run_in_threadpool(_fetch_reports_rest, date, path, limit, before)
+
         if not reports_data:
             return []
-        
-        # Generate signed URLs for each report
-        report_items = []
-        for report in reports_data:
-            path_val = report.get("supabase_path", "")
-            if not path_val:
-                continue
-            
-            # Get date and tickers from database (more reliable than parsing path)
-            folder_date = report.get("date_utc", "")
-            if isinstance(folder_date, str):
-                # If date_utc is a string, use it directly
-                date_str = folder_date
-            else:
-                # If it's a date object, format it
-                date_str = str(folder_date)
-            
-            # Get tickers from database column (already an array)
-            tickers = report.get("tickers", [])
-            if not isinstance(tickers, list):
-                tickers = []
-            
-            # Generate signed URL for Markdown
-            signed_md = None
-            try:
-                md_res = sb.storage.from_(bucket).create_signed_url(path_val, 3600)
-                # Handle both response formats: {"signedURL": "..."} or {"data": {"signedUrl": "..."}}
-                if isinstance(md_res, dict):
-                    signed_md = md_res.get("signedURL") or md_res.get("data", {}).get("signedUrl")
-            except Exception as e:
-                logger.warning("Failed to create signed URL for MD", path=path_val, error=str(e))
-            
-            # Check for PDF version (same path but .pdf extension)
-            pdf_path = path_val.replace(".md", ".pdf")
-            signed_pdf = None
-            try:
-                # Try to create signed URL for PDF (may not exist)
-                pdf_res = sb.storage.from_(bucket).create_signed_url(pdf_path, 3600)
-                if isinstance(pdf_res, dict):
-                    signed_pdf = pdf_res.get("signedURL") or pdf_res.get("data", {}).get("signedUrl")
-            except Exception:
-                # PDF doesn't exist, that's fine
-                pass
-            
-            report_items.append(ReportItem(
-                path=path_val,
-                signed_url_md=signed_md,
-                signed_url_pdf=signed_pdf,
-                date=date_str,
-                tickers=tickers,
-            ))
-        
-        return report_items
-    
+
+        if not path and len(reports_data) == limit:
+            response.headers["X-Next-Cursor"] = _encode_cursor(reports_data[-1])
+
+        return await run_in_threadpool(_signed_report_items, reports_data)
+
     except Exception as e:
         logger.error("Failed to list reports", error=str(e), exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to list reports: {str(e)}")
 
 
+def _latest_report(path: str) -> Optional[Dict[str, Any]]:
+    """Newest reports row for a Markdown storage path."""
+    sb = get_supabase_client()
+    result = (
+        sb.table("reports")
+        .select("id, supabase_path, pdf_path, content_hash")
+        .eq("supabase_path", path)
+        .order("created_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return result.data[0] if result.data else None
+
+
+def _download_markdown(bucket: str, path: str) -> str:
+    return get_supabase_client().storage.from_(bucket).download(path).decode("utf-8")
+
+
+@app.get("/reports/pdf", response_model=ReportPdf)
+async def report_pdf(path: str = Query(..., description="Markdown report path")):
+    """
+    Signed PDF link for a report.
+
+    A report without a stored PDF (REPORT_PDF_MODE=on_demand, or a background
+    build still pending) is rendered on the PDF worker pool, uploaded and
+    recorded first; concurrent requests for it wait on the same build.
+    """
+    bucket = os.getenv("REPORT_BUCKET", "reports")
+    try:
+        report = await run_in_threadpool(_latest_report, path)
+    except Exception as e:
+        logger.error("Failed to look up report", path=path, error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to look up report: {str(e)}")
+    if not report:
+        raise HTTPException(status_code=404, detail=f"Report {path} not found")
+
+    pdf_path = report.get("pdf_path")
+    if not pdf_path:
+        if not WEASYPRINT_AVAILABLE:
+            raise HTTPException(status_code=503, detail="PDF generation is not available on this server")
+        try:
+            md = cached_markdown(report.get("content_hash"))
+            if md is None:
+                md = await run_in_threadpool(_download_markdown, bucket, path)
+            future = pdf_service.store(get_supabase_client(), bucket, path, md, report["id"])
+            pdf_path = await asyncio.wrap_future(future)
+        except Exception as e:
+            logger.error("On-demand PDF generation failed", path=path, error=str(e), exc_info=True)
+            raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
+
+    signed = await run_in_threadpool(signed_url_cache.get_many, bucket, [pdf_path])
+    return ReportPdf(path=path, pdf_path=pdf_path, signed_url_pdf=signed.get(pdf_path))
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
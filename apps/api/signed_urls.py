@@ -0,0 +1,101 @@
+"""Bulk Storage signed URLs with an in-process cache that reuses them until shortly before expiry."""
+import os
+import time
+import threading
+import structlog
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from memory.supabase_client import get_supabase_client
+
+logger = structlog.get_logger()
+
+_ttl = int(os.getenv("REPORT_SIGNED_URL_TTL_SEC", "3600"))
+_refresh_margin = int(os.getenv("REPORT_SIGNED_URL_REFRESH_SEC", "300"))
+_batch_size = int(os.getenv("REPORT_SIGN_BATCH_SIZE", "100"))
+_max_entries = int(os.getenv("REPORT_SIGNED_URL_CACHE_SIZE", "5000"))
+
+
+class SignedUrlCache:
+    """
+    LRU of (bucket, path) -> signed URL.
+
+    A URL is served from cache while more than refresh_margin seconds of its
+    lifetime remain, so clients never receive a link about to expire. Misses
+    are signed with one create_signed_urls call per batch_size paths.
+    """
+
+    def __init__(self, ttl: int = _ttl, refresh_margin: int = _refresh_margin,
+                 batch_size: int = _batch_size, max_entries: int = _max_entries):
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl // 2)
+        self.batch_size = max(1, batch_size)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._sign_calls = 0
+
+    def _sign(self, bucket: str, paths: list) -> Dict[str, Optional[str]]:
+        """One Storage call per batch; paths that fail to sign map to None."""
+        sb = get_supabase_client()
+        signed: Dict[str, Optional[str]] = {}
+        for start in range(0, len(paths), self.batch_size):
+            batch = paths[start:start + self.batch_size]
+            with self._lock:
+                self._sign_calls += 1
+            try:
+                results = sb.storage.from_(bucket).create_signed_urls(batch, self.ttl)
+            except Exception as e:
+                logger.warning("Failed to create signed URLs", bucket=bucket, count=len(batch), error=str(e))
+                continue
+            for item in results:
+                if item.get("error"):
+                    logger.warning("Failed to sign report path", path=item.get("path"), error=item["error"])
+                    continue
+                signed[item["path"]] = item.get("signedURL") or item.get("signedUrl")
+        return signed
+
+    def get_many(self, bucket: str, paths: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Signed URL for each path (None if it could not be signed)."""
+        paths = list(dict.fromkeys(p for p in paths if p))
+        now = time.time()
+        urls: Dict[str, Optional[str]] = {}
+        missing = []
+        with self._lock:
+            for path in paths:
+                entry = self._entries.get((bucket, path))
+                if entry and entry[1] - now > self.refresh_margin:
+                    self._entries.move_to_end((bucket, path))
+                    urls[path] = entry[0]
+                    self._hits += 1
+                else:
+                    missing.append(path)
+            self._misses += len(missing)
+
+        if missing:
+            signed = self._sign(bucket, missing)
+            expires_at = now + self.ttl
+            with self._lock:
+                for path, url in signed.items():
+                    if url:
+                        self._entries[(bucket, path)] = (url, expires_at)
+                        self._entries.move_to_end((bucket, path))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            for path in missing:
+                urls[path] = signed.get(path)
+        return urls
+
+    def stats(self) -> Dict[str, int]:
+        """Cache hits/misses and Storage sign calls since start."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "sign_calls": self._sign_calls,
+            }
+
+
+signed_url_cache = SignedUrlCache()
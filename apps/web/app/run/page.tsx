@@ -13,7 +13,7 @@ const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"
 
 interface RunStatus {
   run_id: string
-  status: "running" | "completed" | "failed"
+  status: "queued" | "running" | "completed" | "failed"
   started_at?: string
   finished_at?: string
   errors: string[]
@@ -82,7 +82,7 @@ export default function RunPage() {
         return
       }
 
-      const response = await fetch(`${API_URL}/run`, {
+      const response = await fetch(`${API_URL}/run?sync=false`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -180,6 +180,12 @@ export default function RunPage() {
             <Card className="glass mt-8">
               <CardHeader>
                 <CardTitle className="flex items-center gap-2">
+                  {runStatus.status === "queued" && (
+                    <>
+                      <Loader2 className="w-5 h-5 animate-spin text-brand" />
+                      Analysis Queued...
+                    </>
+                  )}
                   {runStatus.status === "running" && (
                     <>
                       <Loader2 className="w-5 h-5 animate-spin text-brand" />
@@ -206,7 +212,7 @@ export default function RunPage() {
                   <code className="text-brand">{runStatus.run_id}</code>
                 </div>
 
-                {runStatus.status === "running" && (
+                {(runStatus.status === "queued" || runStatus.status === "running") && (
                   <div className="space-y-2">
                     <Skeleton className="h-4 w-full bg-white/10" />
                     <Skeleton className="h-4 w-3/4 bg-white/10" />
@@ -0,0 +1,70 @@
+-- Compact embedding storage (EMBED_STORAGE_MODE=halfvec), requires pgvector >= 0.7
+-- The HNSW index is built on a float16 copy of each vector (half the memory);
+-- the full-precision column is kept for re-ranking the index candidates.
+
+alter table embeddings add column if not exists embedding_half halfvec(1536);
+alter table embeddings_hf add column if not exists embedding_half halfvec(384);
+
+-- Backfill rows written before the column existed
+update embeddings set embedding_half = embedding::halfvec(1536) where embedding_half is null and embedding is not null;
+update embeddings_hf set embedding_half = embedding::halfvec(384) where embedding_half is null and embedding is not null;
+
+create index if not exists idx_embeddings_half on embeddings using hnsw (embedding_half halfvec_l2_ops);
+create index if not exists idx_embeddings_hf_half on embeddings_hf using hnsw (embedding_half halfvec_l2_ops);
+
+-- Once every writer runs in halfvec mode, the float32 indexes are no longer used:
+-- drop index if exists idx_embeddings_vec;
+-- drop index if exists idx_embeddings_hf_vec;
+
+-- Nearest neighbours: candidate_count rows from the halfvec index, re-ranked by full-precision L2 distance
+create or replace function match_embeddings_half(
+  query_embedding vector(1536),
+  match_count int default 10,
+  candidate_count int default 100,
+  filter_ticker text default null,
+  filter_since timestamptz default null
+)
+returns table (article_id uuid, distance double precision)
+language sql stable
+as $$
+  with candidates as (
+    select e.article_id, e.embedding
+    from embeddings e
+    join articles a on a.id = e.article_id
+    where e.embedding_half is not null
+      and (filter_ticker is null or a.ticker = filter_ticker)
+      and (filter_since is null or a.published_at >= filter_since)
+    order by e.embedding_half <-> query_embedding::halfvec(1536)
+    limit candidate_count
+  )
+  select c.article_id, c.embedding <-> query_embedding as distance
+  from candidates c
+  order by distance
+  limit match_count;
+$$;
+
+create or replace function match_embeddings_hf_half(
+  query_embedding vector(384),
+  match_count int default 10,
+  candidate_count int default 100,
+  filter_ticker text default null,
+  filter_since timestamptz default null
+)
+returns table (article_id uuid, distance double precision)
+language sql stable
+as $$
+  with candidates as (
+    select e.article_id, e.embedding
+    from embeddings_hf e
+    join articles a on a.id = e.article_id
+    where e.embedding_half is not null
+      and (filter_ticker is null or a.ticker = filter_ticker)
+      and (filter_since is null or a.published_at >= filter_since)
+    order by e.embedding_half <-> query_embedding::halfvec(384)
+    limit candidate_count
+  )
+  select c.article_id, c.embedding <-> query_embedding as distance
+  from candidates c
+  order by distance
+  limit match_count;
+$$;
@@ -0,0 +1,15 @@
+-- Record whether a report has a PDF so the API signs it without probing Storage,
+-- and index the (created_at, id) keyset used to page through /reports.
+
+alter table reports
+  add column if not exists pdf_path text;
+
+-- Backfill from PDFs already uploaded next to their Markdown report
+update reports r
+  set pdf_path = replace(r.supabase_path, '.md', '.pdf')
+  from storage.objects o
+  where r.pdf_path is null
+    and o.bucket_id = 'reports'  -- REPORT_BUCKET
+    and o.name = replace(r.supabase_path, '.md', '.pdf');
+
+create index if not exists idx_reports_created_at_id on reports (created_at desc, id desc);
@@ -0,0 +1,7 @@
+-- Content key of a report's render inputs; an unchanged key means the stored
+-- Markdown/PDF are current and the report node skips rendering and upload.
+
+alter table reports
+  add column if not exists content_hash text;
+
+create index if not exists idx_reports_path_created on reports (supabase_path, created_at desc);
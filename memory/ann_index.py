@@ -0,0 +1,550 @@
+"""Local IVF approximate-nearest-neighbour index over article embeddings, backed by memory-mapped files."""
+import os
+import json
+import shutil
+import contextlib
+import threading
+import structlog
+import numpy as np
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from memory.quantization import quantize_int8
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer is assumed
+    fcntl = None
+
+logger = structlog.get_logger()
+
+_index_dir = os.getenv("ANN_INDEX_DIR", os.path.join(os.getenv("CACHE_DIR", ".cache"), "ann"))
+_dtype = os.getenv("ANN_INDEX_DTYPE", "float16")
+_nprobe = int(os.getenv("ANN_NPROBE", "16"))
+_min_train_size = int(os.getenv("ANN_MIN_TRAIN_SIZE", "1024"))
+_compact_tail_fraction = float(os.getenv("ANN_COMPACT_TAIL_FRACTION", "0.1"))
+_max_tail_rows = int(os.getenv("ANN_MAX_TAIL_ROWS", "100000"))
+
+_ID_WIDTH = 36  # uuid text
+_CHUNK_ROWS = 65536
+_TRAIN_SAMPLE_ROWS = 50000
+_UNKNOWN_TIME = np.iinfo(np.int64).min
+
+
+def _to_epoch(value: Any) -> int:
+    """datetime / ISO string -> epoch seconds; unknown -> sentinel."""
+    if value is None:
+        return _UNKNOWN_TIME
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return _UNKNOWN_TIME
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class AnnIndex:
+    """
+    IVF-flat index whose vectors, ids and filter columns live in memory-mapped files.
+
+    Layout: rows [0, sorted_count) are grouped by inverted list (offsets.npy
+    gives each list's row range); rows [sorted_count, count) are an unsorted
+    tail of incremental appends that is scanned exhaustively. compact()
+    retrains the centroids and folds the tail into the grouped segment; add()
+    starts it on a background thread once the tail outgrows
+    ANN_COMPACT_TAIL_FRACTION of the grouped rows (capped at
+    ANN_MAX_TAIL_ROWS), so query cost stays bounded. Only the centroids and
+    the rows of probed lists are touched per query, so the vector file never
+    has to fit in RAM.
+
+    Writers are serialized by _write_lock(); readers take _lock, which
+    compaction only holds while it swaps in the rewritten files, so queries
+    keep running during a compaction.
+    """
+
+    _COLUMNS = {
+        "ids": (f"S{_ID_WIDTH}", ()),
+        "tickers": ("int32", ()),
+        "published": ("int64", ()),
+    }
+
+    def __init__(self, path: str, dtype: Optional[str] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()  # in-memory view (maps, meta, centroids)
+        self._write_mutex = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+        self._maps: Dict[str, np.memmap] = {}
+        self._meta_mtime = None
+        self.meta = {
+            "dim": None,
+            "dtype": dtype or _dtype,
+            "count": 0,
+            "capacity": 0,
+            "sorted_count": 0,
+            "tickers": [],
+        }
+        self.centroids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self._ids_sorted = None
+        self._tail_rows: Dict[bytes, int] = {}
+        self._tail_indexed = 0
+        self._ticker_codes: Dict[str, int] = {}
+        self._load()
+
+    # -- storage -----------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _column_spec(self, name: str) -> Tuple[str, tuple]:
+        if name == "vectors":
+            return self.meta["dtype"], (self.meta["dim"],)
+        if name == "scales":
+            return "float32", ()
+        return self._COLUMNS[name]
+
+    def _column_names(self) -> List[str]:
+        names = ["vectors", *self._COLUMNS]
+        if self.meta["dtype"] == "int8":
+            names.append("scales")  # per-vector scale for the int8 codes
+        return names
+
+    def _vectors(self, rows) -> np.ndarray:
+        """Stored vectors for rows (an index array or slice) as float32."""
+        vectors = np.asarray(self._maps["vectors"][rows], dtype=np.float32)
+        if self.meta["dtype"] == "int8":
+            vectors *= np.asarray(self._maps["scales"][rows], dtype=np.float32)[..., None]
+        return vectors
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        """Serialize writers across threads and processes."""
+        with self._write_mutex:
+            if fcntl is None:
+                yield
+                return
+            with open(self._file("write.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._meta_mtime = os.path.getmtime(meta_path)
+        capacity = self.meta["capacity"]
+        self._maps = {name: self._open_column(name, capacity) for name in self._column_names()} if capacity else {}
+        self.centroids = np.load(self._file("centroids.npy")) if os.path.exists(self._file("centroids.npy")) else None
+        self.offsets = np.load(self._file("offsets.npy")) if os.path.exists(self._file("offsets.npy")) else None
+        self._ids_sorted = None
+        self._tail_rows = {}
+        self._tail_indexed = self.meta["sorted_count"]
+        self._ticker_codes = {t: i for i, t in enumerate(self.meta["tickers"])}
+
+    def refresh(self):
+        """Pick up appends made by other processes since this index was opened."""
+        meta_path = self._file("meta.json")
+        if os.path.exists(meta_path) and os.path.getmtime(meta_path) != self._meta_mtime:
+            with self._lock:
+                self._load()
+
+    def _save_meta(self):
+        for mm in self._maps.values():
+            mm.flush()
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+        self._meta_mtime = os.path.getmtime(self._file("meta.json"))
+
+    def _open_column(self, name: str, capacity: int, suffix: str = "") -> np.memmap:
+        dtype, shape = self._column_spec(name)
+        path = self._file(f"{name}.bin{suffix}")
+        size = capacity * np.dtype(dtype).itemsize * int(np.prod(shape or (1,)))
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, *shape))
+
+    def _ensure_capacity(self, extra: int):
+        needed = self.meta["count"] + extra
+        if needed <= self.meta["capacity"]:
+            return
+        capacity = max(needed, 2 * self.meta["capacity"], 1024)
+        for mm in self._maps.values():
+            mm.flush()
+        self._maps = {name: self._open_column(name, capacity) for name in self._column_names()}
+        self.meta["capacity"] = capacity
+
+    def _ticker_code(self, ticker: Optional[str]) -> int:
+        if not ticker:
+            return -1
+        code = self._ticker_codes.get(ticker)
+        if code is None:
+            code = len(self.meta["tickers"])
+            self.meta["tickers"].append(ticker)
+            self._ticker_codes[ticker] = code
+        return code
+
+    # -- id map ------------------------------------------------------------------
+
+    def _sorted_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(sorted ids, their rows) for the grouped segment, memory-mapped."""
+        if self._ids_sorted is None:
+            if self.meta["sorted_count"] and os.path.exists(self._file("ids_sorted.npy")):
+                self._ids_sorted = (
+                    np.load(self._file("ids_sorted.npy"), mmap_mode="r"),
+                    np.load(self._file("ids_order.npy"), mmap_mode="r"),
+                )
+            else:
+                self._ids_sorted = (np.empty(0, f"S{_ID_WIDTH}"), np.empty(0, np.int64))
+        return self._ids_sorted
+
+    def _rows_of(self, ids: Sequence[str]) -> np.ndarray:
+        """Row for each id, or -1 where it is not indexed (vectorized lookup)."""
+        keys = np.array([i.encode() for i in ids], dtype=f"S{_ID_WIDTH}")
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if not self.meta["count"] or not len(keys):
+            return rows
+        sorted_ids, order = self._sorted_ids()
+        if len(sorted_ids):
+            pos = np.minimum(np.searchsorted(sorted_ids, keys), len(sorted_ids) - 1)
+            found = sorted_ids[pos] == keys
+            rows[found] = order[pos[found]]
+        tail_rows = self._tail_map()
+        if tail_rows:
+            for i in np.nonzero(rows < 0)[0]:
+                rows[i] = tail_rows.get(bytes(keys[i]), -1)
+        return rows
+
+    def _tail_map(self) -> Dict[bytes, int]:
+        """id -> row for the unsorted tail, extended incrementally as rows are appended."""
+        count = self.meta["count"]
+        if self._tail_indexed < count:
+            start = max(self._tail_indexed, self.meta["sorted_count"])
+            tail = self._maps["ids"][start:count]
+            self._tail_rows.update((bytes(article_id), start + i) for i, article_id in enumerate(tail))
+            self._tail_indexed = count
+        return self._tail_rows
+
+    def row_of(self, article_id: str) -> Optional[int]:
+        """Row holding article_id, or None."""
+        with self._lock:
+            row = int(self._rows_of([article_id])[0])
+        return row if row >= 0 else None
+
+    # -- writes ------------------------------------------------------------------
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        tickers: Optional[Sequence[Optional[str]]] = None,
+        published: Optional[Sequence[Any]] = None,
+        check_existing: bool = True,
+        auto_compact: bool = True,
+    ) -> int:
+        """
+        Append new ids and overwrite the stored vector of ids already indexed
+        (re-embedded articles). Returns the number of rows written.
+
+        An overwritten row keeps its inverted list until the next compact().
+        Pass check_existing=False when the ids are known to be new, and
+        auto_compact=False to leave compaction to the caller (bulk rebuild).
+        """
+        if not len(ids):
+            return 0
+        vectors = np.asarray(vectors, dtype=np.float32)
+        tickers = tickers or [None] * len(ids)
+        published = published or [None] * len(ids)
+
+        with self._write_lock(), self._lock:
+            self.refresh()
+            if self.meta["dim"] is None:
+                self.meta["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.meta["dim"]:
+                raise ValueError(f"Vector dim {vectors.shape[1]} does not match index dim {self.meta['dim']}")
+
+            existing = self._rows_of(ids) if check_existing else np.full(len(ids), -1, dtype=np.int64)
+            last = {article_id: i for i, article_id in enumerate(ids)}  # last vector wins for repeated ids
+            keep = sorted(last.values())
+            new = [i for i in keep if existing[i] < 0]
+            updated = [i for i in keep if existing[i] >= 0]
+
+            self._ensure_capacity(len(new))
+            start = self.meta["count"]
+            rows = np.array(
+                [int(existing[i]) for i in updated] + list(range(start, start + len(new))), dtype=np.int64
+            )
+            order = updated + new
+            if len(order):
+                if self.meta["dtype"] == "int8":
+                    codes, scales = quantize_int8(vectors[order])
+                    self._maps["vectors"][rows] = codes
+                    self._maps["scales"][rows] = scales
+                else:
+                    self._maps["vectors"][rows] = vectors[order].astype(self.meta["dtype"])
+                self._maps["ids"][rows] = [ids[i].encode() for i in order]
+                self._maps["tickers"][rows] = [self._ticker_code(tickers[i]) for i in order]
+                self._maps["published"][rows] = [_to_epoch(published[i]) for i in order]
+                self.meta["count"] = start + len(new)
+                self._save_meta()
+
+        if auto_compact and self._needs_compaction():
+            self.compact_in_background()
+        return len(order)
+
+    def _needs_compaction(self) -> bool:
+        """First training once there is enough data, then whenever the tail gets too long."""
+        count, sorted_count = self.meta["count"], self.meta["sorted_count"]
+        if self.centroids is None:
+            return count >= _min_train_size
+        limit = min(_max_tail_rows, max(_min_train_size, int(_compact_tail_fraction * sorted_count)))
+        return count - sorted_count > limit
+
+    def compact_in_background(self) -> bool:
+        """Start compact() on a daemon thread; False if one is already running."""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return False
+            self._compactor = threading.Thread(target=self._compact_quietly, name="ann-compact", daemon=True)
+            self._compactor.start()
+            return True
+
+    def wait_for_compaction(self, timeout: Optional[float] = None) -> bool:
+        """Block until a background compaction finishes. Returns False on timeout."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join(timeout)
+            return not compactor.is_alive()
+        return True
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.warning("Background ANN compaction failed", path=self.path, error=str(e))
+
+    def _train(self, nlist: int, iterations: int = 10, sample_size: Optional[int] = None) -> np.ndarray:
+        """k-means centroids from a random sample of rows (at most one per sampled row)."""
+        count = self.meta["count"]
+        rng = np.random.default_rng(0)
+        sample_size = min(count, sample_size or _TRAIN_SAMPLE_ROWS)
+        sample_rows = np.sort(rng.choice(count, size=sample_size, replace=False))
+        sample = self._vectors(sample_rows)
+        nlist = min(nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        return centroids
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Index of the closest centroid (L2) for each vector."""
+        dots = vectors @ centroids.T
+        dist = (centroids ** 2).sum(axis=1)[None, :] - 2 * dots
+        return dist.argmin(axis=1).astype(np.int32)
+
+    def compact(self, nlist: Optional[int] = None):
+        """
+        Retrain centroids and rewrite all rows grouped by inverted list.
+
+        The rewritten columns are built in .tmp files and swapped in under
+        _lock, so concurrent readers see either the old or the new layout.
+        """
+        with self._write_lock():
+            self.refresh()
+            count = self.meta["count"]
+            if not count:
+                return
+            nlist = nlist or max(1, min(65536, int(4 * np.sqrt(count))))
+            centroids = self._train(min(nlist, count))
+            nlist = len(centroids)
+
+            assign = np.empty(count, dtype=np.int32)
+            for start in range(0, count, _CHUNK_ROWS):
+                end = min(start + _CHUNK_ROWS, count)
+                chunk = self._vectors(slice(start, end))
+                assign[start:end] = self._nearest(chunk, centroids)
+            order = np.argsort(assign, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+
+            capacity = self.meta["capacity"]
+            for name in self._column_names():
+                target = self._open_column(name, capacity, suffix=".tmp")
+                for start in range(0, count, _CHUNK_ROWS):
+                    end = min(start + _CHUNK_ROWS, count)
+                    target[start:end] = self._maps[name][order[start:end]]
+                target.flush()
+                if name == "ids":
+                    ids_order = np.argsort(target[:count], kind="stable")
+                    np.save(self._file("ids_order.tmp.npy"), ids_order)
+                    np.save(self._file("ids_sorted.tmp.npy"), target[ids_order])
+                del target
+            np.save(self._file("centroids.tmp.npy"), centroids)
+            np.save(self._file("offsets.tmp.npy"), offsets)
+
+            with self._lock:
+                for name in self._column_names():
+                    os.replace(self._file(f"{name}.bin.tmp"), self._file(f"{name}.bin"))
+                for name in ("centroids", "offsets", "ids_order", "ids_sorted"):
+                    os.replace(self._file(f"{name}.tmp.npy"), self._file(f"{name}.npy"))
+                self.meta["sorted_count"] = count
+                self.meta["nlist"] = nlist
+                self._save_meta()
+                self._load()
+        logger.info("Compacted ANN index", path=self.path, rows=count, nlist=nlist)
+
+    # -- reads -------------------------------------------------------------------
+
+    def _candidate_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        count, sorted_count = self.meta["count"], self.meta["sorted_count"]
+        if self.centroids is None or not sorted_count:
+            return np.arange(count)
+        dist = ((self.centroids - query) ** 2).sum(axis=1)
+        probes = np.argsort(dist)[:nprobe]
+        ranges = [np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes]
+        ranges.append(np.arange(sorted_count, count))
+        return np.concatenate(ranges)
+
+    def search(
+        self,
+        query: Sequence[float],
+        k: int = 10,
+        nprobe: Optional[int] = None,
+        ticker: Optional[str] = None,
+        since: Optional[Any] = None,
+        until: Optional[Any] = None,
+        exclude: Iterable[str] = (),
+    ) -> List[Tuple[str, float]]:
+        """k nearest (article_id, L2 distance) pairs, optionally filtered by ticker and publish date."""
+        with self._lock:
+            return self._search(query, k, nprobe, ticker, since, until, exclude)
+
+    def _search(self, query, k, nprobe, ticker, since, until, exclude) -> List[Tuple[str, float]]:
+        self.refresh()
+        if not self.meta["count"]:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        rows = self._candidate_rows(query, nprobe or _nprobe)
+
+        if ticker is not None:
+            code = self._ticker_codes.get(ticker)
+            if code is None:
+                return []
+            rows = rows[self._maps["tickers"][rows] == code]
+        if since is not None or until is not None:
+            published = self._maps["published"][rows]
+            mask = published != _UNKNOWN_TIME
+            if since is not None:
+                mask &= published >= _to_epoch(since)
+            if until is not None:
+                mask &= published <= _to_epoch(until)
+            rows = rows[mask]
+        if not len(rows):
+            return []
+
+        vectors = self._vectors(rows)
+        dist = ((vectors - query) ** 2).sum(axis=1)
+        excluded = {e.encode() for e in exclude}
+        take = min(len(rows), k + len(excluded))
+        best = np.argpartition(dist, take - 1)[:take]
+        best = best[np.argsort(dist[best])]
+
+        results = []
+        for i in best:
+            article_id = bytes(self._maps["ids"][rows[i]])
+            if article_id in excluded:
+                continue
+            results.append((article_id.decode(), float(np.sqrt(dist[i]))))
+            if len(results) == k:
+                break
+        return results
+
+    def similar(self, article_id: str, k: int = 10, **filters) -> List[Tuple[str, float]]:
+        """Nearest neighbours of an indexed article (excluding itself)."""
+        with self._lock:
+            self.refresh()
+            row = self.row_of(article_id)
+            if row is None:
+                return []
+            query = self._vectors([row])[0]
+            return self.search(query, k=k, exclude=[article_id], **filters)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self.refresh()
+            return {
+                "rows": self.meta["count"],
+                "tail_rows": self.meta["count"] - self.meta["sorted_count"],
+                "dim": self.meta["dim"],
+                "dtype": self.meta["dtype"],
+                "nlist": self.meta.get("nlist"),
+            }
+
+
+def rebuild_from_supabase(sb, table: str, path: Optional[str] = None, page_size: int = 1000) -> AnnIndex:
+    """
+    Rebuild the index for an embeddings table by paging through it (keyset on article_id).
+
+    Pages are appended without compaction; the index is clustered once at the end.
+    """
+    path = path or os.path.join(_index_dir, table)
+    tmp_path = f"{path}.rebuild"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    index = AnnIndex(tmp_path)
+
+    last_id = None
+    total = 0
+    while True:
+        query = sb.table(table).select("article_id, embedding, articles(ticker, published_at)").order("article_id").limit(page_size)
+        if last_id:
+            query = query.gt("article_id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            break
+        vectors = [json.loads(r["embedding"]) if isinstance(r["embedding"], str) else r["embedding"] for r in rows]
+        articles = [r.get("articles") or {} for r in rows]
+        index.add(
+            [r["article_id"] for r in rows],
+            vectors,
+            tickers=[a.get("ticker") for a in articles],
+            published=[a.get("published_at") for a in articles],
+            check_existing=False,
+            auto_compact=False,
+        )
+        total += len(rows)
+        last_id = rows[-1]["article_id"]
+        logger.info("ANN rebuild progress", table=table, rows=total)
+
+    if index.meta["count"]:
+        index.compact()
+    del index
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    _indexes.pop(table, None)
+    return get_ann_index(table)
+
+
+_indexes: Dict[str, AnnIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_ann_index(table: str) -> AnnIndex:
+    """Process-wide index for an embeddings table (embeddings / embeddings_hf)."""
+    with _indexes_lock:
+        if table not in _indexes:
+            _indexes[table] = AnnIndex(os.path.join(_index_dir, table))
+        return _indexes[table]
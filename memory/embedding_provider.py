@@ -1,33 +1,103 @@
 """Embedding provider abstraction: Hugging Face (local), OpenAI, or HF API."""
 import os
+import time
+import base64
+import hashlib
 import structlog
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 import numpy as np
+from memory.local_cache import SqliteCache
 
 logger = structlog.get_logger()
 
 _provider = os.getenv("EMBED_PROVIDER", "hf").lower()
 _hf_model_name = os.getenv("HF_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+_openai_model_name = "text-embedding-3-small"
+_hf_backend = os.getenv("EMBED_HF_BACKEND", "torch").lower()  # torch | onnx
+_onnx_quantize = os.getenv("EMBED_ONNX_QUANTIZE", "").lower()  # "", avx2, avx512, avx512_vnni, arm64
+_batch_tokens = int(os.getenv("EMBED_BATCH_TOKENS", "16384"))  # padded tokens per local batch
+_max_batch_size = int(os.getenv("EMBED_MAX_BATCH_SIZE", "256"))
+_openai_batch_tokens = int(os.getenv("EMBED_OPENAI_BATCH_TOKENS", "250000"))  # API cap is 300k per request
+_hf_api_batch_tokens = int(os.getenv("EMBED_HF_API_BATCH_TOKENS", "8192"))
+_OPENAI_MAX_INPUT_TOKENS = 8191
+_OPENAI_MAX_INPUTS = 2048
+_HF_API_MAX_INPUT_TOKENS = 256  # MiniLM-class models served by the Inference API
+_onnx_dir = os.getenv("EMBED_ONNX_DIR", os.path.join(os.getenv("CACHE_DIR", ".cache"), "onnx"))
+_cache_enabled = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+_cache_max_entries = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "100000"))
 
 # Lazy-loaded providers
 _hf_model = None
 _openai_client = None
 _hf_api_token = None
+_embedding_cache: Optional[SqliteCache] = None
+
+
+def _onnx_file_name(quantize: str) -> str:
+    """ONNX weights inside the model repo, as laid out by sentence-transformers exports."""
+    if not quantize:
+        return "onnx/model.onnx"
+    prefix = "quint8" if quantize == "avx2" else "qint8"
+    return f"onnx/model_{prefix}_{quantize}.onnx"
+
+
+def load_hf_model(backend: str = "torch", quantize: str = ""):
+    """
+    Load the local sentence-transformers model on the given backend.
+
+    backend="onnx" runs ONNX Runtime on the same weights; with quantize set
+    (avx2, avx512, avx512_vnni or arm64) it uses dynamically int8-quantized
+    weights, exporting them once into EMBED_ONNX_DIR if the model repo does
+    not ship that file.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("sentence-transformers not installed. Run: pip install sentence-transformers torch")
+
+    if backend == "torch":
+        return SentenceTransformer(_hf_model_name)
+    if backend != "onnx":
+        raise ValueError(f"Unknown EMBED_HF_BACKEND: {backend}")
+
+    file_name = _onnx_file_name(quantize)
+    try:
+        return SentenceTransformer(_hf_model_name, backend="onnx", model_kwargs={"file_name": file_name})
+    except ImportError:
+        raise ImportError("ONNX backend needs extra packages. Run: pip install 'sentence-transformers[onnx]'")
+    except Exception as e:
+        if not quantize:
+            raise
+        logger.info("Quantized ONNX weights not published, exporting", model=_hf_model_name, file=file_name, error=str(e)[:100])
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    local_dir = os.path.join(_onnx_dir, _hf_model_name.replace("/", "__"))
+    local_file = os.path.join(local_dir, file_name)
+    if not os.path.exists(local_file):
+        model = SentenceTransformer(_hf_model_name, backend="onnx")
+        model.save_pretrained(local_dir)
+        export_dynamic_quantized_onnx_model(model, quantize, local_dir)
+    return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
 
 
 def _get_hf_local():
     """Get or initialize local Hugging Face model."""
     global _hf_model
     if _hf_model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            _hf_model = SentenceTransformer(_hf_model_name)
-            logger.info("Loaded HF local model", model=_hf_model_name)
-        except ImportError:
-            raise ImportError("sentence-transformers not installed. Run: pip install sentence-transformers torch")
+        _hf_model = load_hf_model(_hf_backend, _onnx_quantize)
+        logger.info("Loaded HF local model", model=_hf_model_name, backend=_hf_backend, quantize=_onnx_quantize or None)
     return _hf_model
 
 
+def preload_embedding_model():
+    """Load the local model and run one warm-up batch, so the first request does not pay for it."""
+    if _provider != "hf":
+        return
+    start = time.perf_counter()
+    _get_hf_local().encode(["warm-up"], normalize_embeddings=True, show_progress_bar=False)
+    logger.info("Preloaded embedding model", model=_hf_model_name, latency_ms=int((time.perf_counter() - start) * 1000))
+
+
 def _get_openai():
     """Get or initialize OpenAI client."""
     global _openai_client
@@ -40,36 +110,136 @@ def _get_openai():
     return _openai_client
 
 
-def generate_embeddings(texts: List[str], batch_size: int = 64) -> Optional[List[List[float]]]:
+def plan_batches(lengths: List[int], max_tokens: int, max_batch_size: int, padded: bool = True) -> List[List[int]]:
+    """
+    Group text positions into batches under a token budget.
+
+    Texts are taken shortest first, so each batch holds similar lengths. With
+    padded=True a batch costs len(batch) * longest (local models pad to the
+    longest text); otherwise it costs the sum of lengths (API request size).
+    A single text over the budget still gets a batch of its own.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    longest = total = 0
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        n = max(1, lengths[i])
+        cost = max(longest, n) * (len(current) + 1) if padded else total + n
+        if current and (cost > max_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current, longest, total = [], 0, 0
+        current.append(i)
+        longest = max(longest, n)
+        total += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _run_batches(
+    texts: List[str],
+    lengths: List[int],
+    encode: Callable[[List[str]], List[List[float]]],
+    max_tokens: int,
+    max_batch_size: int,
+    padded: bool = True,
+) -> List[List[float]]:
+    """Encode texts batch by batch (see plan_batches) and return vectors in input order."""
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    batches = plan_batches(lengths, max_tokens, max_batch_size, padded=padded)
+    for batch in batches:
+        for i, vector in zip(batch, encode([texts[i] for i in batch])):
+            vectors[i] = vector
+    logger.debug("Embedded in token-budget batches", texts=len(texts), batches=len(batches), max_tokens=max_tokens)
+    return vectors
+
+
+def _hf_token_lengths(model, texts: List[str]) -> List[int]:
+    """Token counts as the model will see them (special tokens included, capped at max_seq_length)."""
+    encoded = model.tokenizer(
+        texts,
+        add_special_tokens=True,
+        truncation=True,
+        max_length=model.max_seq_length,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def _truncate_for_api(texts: List[str], max_input_tokens: int) -> Tuple[List[str], List[int]]:
+    """
+    Truncate texts to a per-input token limit; returns (texts, token counts).
+
+    Uses tiktoken when installed (exact for OpenAI models), otherwise ~4
+    characters per token.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        encoding = None
+
+    out, lengths = [], []
+    for text in texts:
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            if len(tokens) > max_input_tokens:
+                tokens = tokens[:max_input_tokens]
+                text = encoding.decode(tokens)
+            lengths.append(len(tokens))
+        else:
+            text = text[:max_input_tokens * 4]
+            lengths.append(len(text) // 4 + 1)
+        out.append(text)
+    return out, lengths
+
+
+def generate_embeddings(texts: List[str], batch_size: Optional[int] = None) -> Optional[List[List[float]]]:
     """
     Generate embeddings based on EMBED_PROVIDER.
+
+    Texts are truncated to the model's input limit and sent in length-sorted
+    batches sized by a token budget (batch_size caps texts per batch);
+    results come back in input order.
     
     Returns:
         List of embedding vectors, or None if generation failed
     """
     if not texts:
         return []
+    max_batch_size = batch_size or _max_batch_size
     
     try:
         if _provider == "hf":
             # Local Hugging Face
             model = _get_hf_local()
-            embeddings = model.encode(
-                texts,
-                batch_size=batch_size,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-            )
-            return embeddings.tolist()
+
+            def encode(batch: List[str]) -> List[List[float]]:
+                return model.encode(
+                    batch,
+                    batch_size=len(batch),
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                ).tolist()
+
+            return _run_batches(texts, _hf_token_lengths(model, texts), encode, _batch_tokens, max_batch_size)
         
         elif _provider == "openai":
             # OpenAI API
             client = _get_openai()
-            response = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=texts,
+
+            def encode(batch: List[str]) -> List[List[float]]:
+                response = client.embeddings.create(
+                    model=_openai_model_name,
+                    input=batch,
+                )
+                return [item.embedding for item in response.data]
+
+            texts, lengths = _truncate_for_api(texts, _OPENAI_MAX_INPUT_TOKENS)
+            return _run_batches(
+                texts, lengths, encode, _openai_batch_tokens, min(max_batch_size, _OPENAI_MAX_INPUTS), padded=False
             )
-            return [item.embedding for item in response.data]
         
         elif _provider == "hf_api":
             # Hugging Face Inference API
@@ -84,9 +254,13 @@ def generate_embeddings(texts: List[str], batch_size: int = 64) -> Optional[List
             headers = {"Authorization": f"Bearer {_hf_api_token}"}
             
             with httpx.Client(timeout=30.0) as client:
-                response = client.post(url, json={"inputs": texts}, headers=headers)
-                response.raise_for_status()
-                return response.json()
+                def encode(batch: List[str]) -> List[List[float]]:
+                    response = client.post(url, json={"inputs": batch}, headers=headers)
+                    response.raise_for_status()
+                    return response.json()
+
+                texts, lengths = _truncate_for_api(texts, _HF_API_MAX_INPUT_TOKENS)
+                return _run_batches(texts, lengths, encode, _hf_api_batch_tokens, max_batch_size, padded=False)
         
         else:
             logger.error("Unknown EMBED_PROVIDER", provider=_provider)
@@ -113,3 +287,77 @@ def get_embedding_dimension() -> int:
         return 384  # Default HF API models
     return 384
 
+
+def _get_embedding_cache() -> SqliteCache:
+    """Get or create the shared embedding cache (no TTL, LRU-bounded)."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = SqliteCache("embeddings", max_entries=_cache_max_entries)
+    return _embedding_cache
+
+
+def _model_name() -> str:
+    if _provider == "openai":
+        return _openai_model_name
+    if _provider == "hf" and _hf_backend == "onnx" and _onnx_quantize:
+        return f"{_hf_model_name}#onnx-{_onnx_quantize}"  # int8 weights drift slightly; keep them apart
+    return _hf_model_name
+
+
+def embedding_cache_key(text: str) -> str:
+    """(provider, model, sha256 of whitespace-normalized text)."""
+    normalized = " ".join(text.split())
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{_provider}|{_model_name()}|{digest}"
+
+
+def _encode_vector(vector: List[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(value: str) -> List[float]:
+    return np.frombuffer(base64.b64decode(value), dtype=np.float32).tolist()
+
+
+def generate_embeddings_cached(texts: List[str], batch_size: Optional[int] = None) -> Tuple[Optional[List[List[float]]], int]:
+    """
+    generate_embeddings with a content-hash cache in front.
+
+    Only texts not embedded before by this provider/model are sent to the
+    provider. Returns (embeddings in input order or None on failure, cache hits).
+    """
+    if not _cache_enabled or not texts:
+        return generate_embeddings(texts, batch_size=batch_size), 0
+
+    cache = _get_embedding_cache()
+    keys = [embedding_cache_key(text) for text in texts]
+    cached = cache.get_many(keys)
+
+    miss_index = {}  # cache key -> text to embed (identical texts embedded once)
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in miss_index:
+            miss_index[key] = text
+    vectors = {key: _decode_vector(value) for key, value in cached.items()}
+
+    if miss_index:
+        fresh = generate_embeddings(list(miss_index.values()), batch_size=batch_size)
+        if fresh is None:
+            return None, len(cached)
+        fresh_by_key = dict(zip(miss_index.keys(), fresh))
+        cache.set_many({key: _encode_vector(vector) for key, vector in fresh_by_key.items()})
+        vectors.update(fresh_by_key)
+
+    hits = sum(1 for key in keys if key in cached)
+    logger.info("Embedding cache lookup", hits=hits, misses=len(keys) - hits, provider=_provider)
+    return [vectors[key] for key in keys], hits
+
+
+def embedding_cache_enabled() -> bool:
+    return _cache_enabled
+
+
+def embedding_cache_stats() -> dict:
+    """Hit/miss counters of the embedding cache."""
+    if not _cache_enabled:
+        return {"enabled": False}
+    return {"enabled": True, **_get_embedding_cache().stats()}
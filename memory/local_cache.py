@@ -0,0 +1,159 @@
+"""Local SQLite key-value cache with TTL and LRU eviction, shared by worker processes."""
+import os
+import json
+import time
+import sqlite3
+import threading
+import structlog
+from typing import Any, Dict, Iterable, Optional
+
+logger = structlog.get_logger()
+
+_default_db_path = os.getenv("CACHE_DB", os.path.join(os.getenv("CACHE_DIR", ".cache"), "cache.sqlite3"))
+
+
+class SqliteCache:
+    """
+    JSON values stored in one SQLite file, partitioned by namespace.
+
+    Entries expire after their TTL (or never, with ttl=None) and each
+    namespace is capped at max_entries, evicting the least recently used
+    rows. Any process pointing at the same file shares the cache; hit/miss
+    counters are per process.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        db_path: Optional[str] = None,
+        max_entries: int = 1000,
+        default_ttl: Optional[float] = None,
+    ):
+        self.namespace = namespace
+        self.db_path = db_path or _default_db_path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("pragma journal_mode=wal")
+        return conn
+
+    def _init_db(self):
+        parent = os.path.dirname(self.db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                """create table if not exists cache (
+                    namespace text not null,
+                    key text not null,
+                    value text not null,
+                    expires_at real,
+                    last_access real not null,
+                    primary key (namespace, key)
+                )"""
+            )
+            conn.execute("create index if not exists idx_cache_lru on cache (namespace, last_access)")
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return {key: value} for every key that is present and fresh."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found: Dict[str, Any] = {}
+        conn = self._connect()
+        try:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"select key, value, expires_at from cache where namespace = ? and key in ({placeholders})",
+                    (self.namespace, *chunk),
+                ).fetchall()
+                for key, value, expires_at in rows:
+                    if expires_at is not None and expires_at <= now:
+                        continue
+                    found[key] = json.loads(value)
+            if found:
+                conn.executemany(
+                    "update cache set last_access = ? where namespace = ? and key = ?",
+                    [(now, self.namespace, key) for key in found],
+                )
+        except sqlite3.Error as e:
+            logger.warning("Cache read failed", namespace=self.namespace, error=str(e))
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None):
+        """Store a JSON-serializable value."""
+        self.set_many({key: value}, ttl=ttl, expires_at=expires_at)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None, expires_at: Optional[float] = None):
+        """Store several values with one TTL (or absolute expiry), then enforce max_entries."""
+        if not items:
+            return
+        now = time.time()
+        if expires_at is None:
+            ttl = ttl if ttl is not None else self.default_ttl
+            expires_at = now + ttl if ttl is not None else None
+        conn = self._connect()
+        try:
+            conn.execute("begin immediate")
+            conn.executemany(
+                """insert into cache (namespace, key, value, expires_at, last_access)
+                   values (?, ?, ?, ?, ?)
+                   on conflict(namespace, key) do update set
+                     value = excluded.value, expires_at = excluded.expires_at,
+                     last_access = excluded.last_access""",
+                [(self.namespace, key, json.dumps(value), expires_at, now) for key, value in items.items()],
+            )
+            conn.execute(
+                "delete from cache where namespace = ? and expires_at is not null and expires_at <= ?",
+                (self.namespace, now),
+            )
+            conn.execute(
+                """delete from cache where namespace = ? and key in (
+                     select key from cache where namespace = ?
+                     order by last_access desc limit -1 offset ?)""",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+            conn.execute("commit")
+        except sqlite3.Error as e:
+            logger.warning("Cache write failed", namespace=self.namespace, error=str(e))
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-process hit/miss counters plus the shared entry count."""
+        conn = self._connect()
+        try:
+            entries = conn.execute(
+                "select count(*) from cache where namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,22 @@
+"""Scalar quantization of embeddings to int8 with a per-vector scale."""
+from typing import Sequence, Tuple
+import numpy as np
+
+
+def quantize_int8(vectors: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric scalar quantization, one scale per vector.
+
+    Returns (int8 codes of shape (n, dim), float32 scales of shape (n,)) with
+    x ~= codes * scale.
+    """
+    x = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(x).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(x / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Inverse of quantize_int8 (float32)."""
+    return np.asarray(codes, dtype=np.float32) * np.asarray(scales, dtype=np.float32).reshape(-1, 1)
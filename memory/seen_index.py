@@ -0,0 +1,140 @@
+"""Cross-run index of stored articles (canonical URL -> content hash and scores)."""
+import os
+import hashlib
+import structlog
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from agent.state import Article
+from agent.analysis.dedupe import canonicalize_url
+from memory.local_cache import SqliteCache
+from memory.vector_store import embed_table_name
+
+logger = structlog.get_logger()
+
+_enabled = os.getenv("SEEN_INDEX_ENABLED", "true").lower() == "true"
+_max_entries = int(os.getenv("SEEN_INDEX_MAX_ENTRIES", "500000"))
+_warm_days = int(os.getenv("SEEN_INDEX_WARM_DAYS", "7"))
+
+_index: Optional["SeenIndex"] = None
+
+
+def content_hash(title: str, summary: Optional[str]) -> str:
+    """sha256 of whitespace-normalized title and summary."""
+    text = " ".join(f"{title}\n{summary or ''}".split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha1(canonicalize_url(url).encode("utf-8")).hexdigest()
+
+
+class SeenIndex:
+    """
+    Hash set of stored articles, keyed by canonical URL, in the local SQLite cache.
+
+    Each entry keeps the content hash, article id and scores, so an article
+    whose URL and content are unchanged can skip scoring and storage and
+    reuse what was saved for it last time.
+    """
+
+    def __init__(self, cache: SqliteCache):
+        self.cache = cache
+        self._warm_checked = False
+
+    def partition(self, articles: List[Article]) -> Tuple[List[Article], List[Tuple[Article, Dict[str, Any]]]]:
+        """Split into (new or changed articles, [(unchanged article, stored entry)])."""
+        entries = self.cache.get_many(_url_key(a.url) for a in articles)
+        fresh, known = [], []
+        for article in articles:
+            entry = entries.get(_url_key(article.url))
+            if (
+                entry
+                and entry.get("embedded", True)
+                and entry.get("content_hash") == content_hash(article.title, article.summary)
+            ):
+                known.append((article, entry))
+            else:
+                fresh.append(article)
+        return fresh, known
+
+    def record(self, articles: List[Article], article_ids: Dict[str, str], embedded: bool = True):
+        """Remember articles that were stored (those with an id)."""
+        self.cache.set_many({
+            _url_key(a.url): {
+                "content_hash": content_hash(a.title, a.summary),
+                "article_id": article_ids[a.url],
+                "sentiment": a.sentiment,
+                "relevance": a.relevance,
+                "embedded": embedded,
+            }
+            for a in articles
+            if a.url in article_ids
+        })
+
+    def warm_once(self, get_client: Callable[[], Any]):
+        """Warm from Supabase the first time this process finds the index empty."""
+        if self._warm_checked:
+            return
+        self._warm_checked = True
+        try:
+            if not self.cache.stats()["entries"]:
+                self.warm_from_supabase(get_client())
+        except Exception as e:
+            logger.warning("Failed to warm seen-article index", error=str(e))
+
+    def warm_from_supabase(self, sb, days: Optional[int] = None, page_size: int = 1000) -> int:
+        """
+        Load recently inserted articles (keyset pagination on id). Returns rows loaded.
+
+        Articles without a row in the embeddings table are loaded as not
+        embedded, so an embedding write that failed or never drained is retried.
+        """
+        since = (datetime.utcnow() - timedelta(days=days if days is not None else _warm_days)).isoformat()
+        embed_table = embed_table_name()
+        last_id = None
+        total = 0
+        while True:
+            query = (
+                sb.table("articles")
+                .select(f"id, url, title, summary, sentiment, relevance, {embed_table}(article_id)")
+                .gte("inserted_at", since)
+                .order("id")
+                .limit(page_size)
+            )
+            if last_id:
+                query = query.gt("id", last_id)
+            rows = query.execute().data or []
+            if not rows:
+                break
+            self.cache.set_many({
+                _url_key(r["url"]): {
+                    "content_hash": content_hash(r["title"], r.get("summary")),
+                    "article_id": r["id"],
+                    "sentiment": r.get("sentiment"),
+                    "relevance": r.get("relevance"),
+                    "embedded": bool(r.get(embed_table)),  # one-to-one embed: object, list or null
+                }
+                for r in rows
+            })
+            total += len(rows)
+            last_id = rows[-1]["id"]
+        logger.info("Warmed seen-article index", rows=total, days=days if days is not None else _warm_days)
+        return total
+
+
+def get_seen_index() -> Optional[SeenIndex]:
+    """Process-wide index, or None when SEEN_INDEX_ENABLED=false."""
+    global _index
+    if not _enabled:
+        return None
+    if _index is None:
+        _index = SeenIndex(SqliteCache("seen_articles", max_entries=_max_entries))
+    return _index
+
+
+def seen_index_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the seen-article index."""
+    index = get_seen_index()
+    if index is None:
+        return {"enabled": False}
+    return {"enabled": True, **index.cache.stats()}
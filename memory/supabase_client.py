@@ -0,0 +1,96 @@
+"""Process-wide Supabase client on one pooled keep-alive HTTP transport."""
+import os
+import threading
+import httpx
+import structlog
+from typing import Any, Dict, Optional
+from supabase import Client, ClientOptions, create_client
+
+logger = structlog.get_logger()
+
+_http2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+_max_connections = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+_max_keepalive = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+_keepalive_expiry = float(os.getenv("SUPABASE_POOL_KEEPALIVE_SEC", "30"))
+_timeout = float(os.getenv("SUPABASE_TIMEOUT_SEC", "60"))
+
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "new_connections": 0, "tls_handshakes": 0, "http2_responses": 0}
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _trace(event_name: str, info: Dict[str, Any]):
+    """httpcore trace hook: only fires for work a pooled connection would have avoided."""
+    if event_name == "connection.connect_tcp.complete":
+        _count("new_connections")
+    elif event_name == "connection.start_tls.complete":
+        _count("tls_handshakes")
+
+
+def _on_request(request: httpx.Request):
+    request.extensions["trace"] = _trace
+    _count("requests")
+
+
+def _on_response(response: httpx.Response):
+    if response.http_version == "HTTP/2":
+        _count("http2_responses")
+
+
+def _build_http_client() -> httpx.Client:
+    http2 = _http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("h2 not installed, Supabase client falls back to HTTP/1.1 keep-alive")
+            http2 = False
+    return httpx.Client(
+        http2=http2,
+        timeout=_timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=_max_connections,
+            max_keepalive_connections=_max_keepalive,
+            keepalive_expiry=_keepalive_expiry,
+        ),
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+
+
+def get_supabase_client() -> Client:
+    """
+    Shared Supabase client, created on first use.
+
+    PostgREST, Storage and Functions calls from every thread go through one
+    httpx connection pool (HTTP/2 when h2 is installed), so connections and
+    TLS sessions are reused across runs and API requests.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            sb_url = os.getenv("SUPABASE_URL")
+            sb_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+            if not sb_url or not sb_key:
+                raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+            _client = create_client(sb_url, sb_key, options=ClientOptions(httpx_client=_build_http_client()))
+            logger.info("Created shared Supabase client", http2=_http2, max_connections=_max_connections)
+    return _client
+
+
+def supabase_pool_stats() -> Dict[str, Any]:
+    """Requests vs. new connections on the shared transport."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["reused_connections"] = max(0, stats["requests"] - stats["new_connections"])
+    stats["reuse_rate"] = round(stats["reused_connections"] / stats["requests"], 3) if stats["requests"] else 0.0
+    stats["client_created"] = _client is not None
+    return stats
@@ -1,27 +1,133 @@
-"""Supabase Postgres async engine."""
+"""Supabase Postgres async engine and the API's read queries."""
 import os
+import uuid
 import structlog
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from datetime import date as date_type, datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 logger = structlog.get_logger()
 
 _db_url = os.getenv("SUPABASE_DB_URL")
-if not _db_url:
-    raise ValueError("SUPABASE_DB_URL not set")
+_pool_size = int(os.getenv("SQL_POOL_SIZE", "5"))
+_max_overflow = int(os.getenv("SQL_MAX_OVERFLOW", "10"))
+_pool_recycle = int(os.getenv("SQL_POOL_RECYCLE_SEC", "1800"))
+# Set to 0 behind the Supabase transaction pooler (pgbouncer), which cannot keep prepared statements
+_statement_cache_size = int(os.getenv("SQL_STATEMENT_CACHE_SIZE", "100"))
 
-# Convert postgres:// to postgresql+asyncpg://
-if _db_url.startswith("postgres://"):
-    _db_url = _db_url.replace("postgres://", "postgresql+asyncpg://", 1)
-elif not _db_url.startswith("postgresql+asyncpg://"):
-    _db_url = f"postgresql+asyncpg://{_db_url}"
+# SQLAlchemy's asyncio extension is imported with the engine, so the API can
+# import this module (and fall back to PostgREST) without SUPABASE_DB_URL.
+_engine = None
+AsyncSessionLocal = None
 
-engine = create_async_engine(_db_url, echo=False, pool_pre_ping=True)
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+_RUN_WITH_REPORTS = """
+    select r.id::text as id, r.status, r.started_at, r.finished_at, r.errors,
+           coalesce(
+             array_agg(rep.supabase_path order by rep.created_at)
+               filter (where rep.supabase_path is not null),
+             '{}'
+           ) as artifacts
+    from runs r
+    left join reports rep on rep.run_id = r.id
+    where r.id = cast(:run_id as uuid)
+    group by r.id
+"""
+
+
+def _async_url(url: str) -> str:
+    """postgres:// or postgresql:// URL -> postgresql+asyncpg:// URL."""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("postgresql+asyncpg://"):
+        return url
+    return f"postgresql+asyncpg://{url}"
+
+
+def sql_enabled() -> bool:
+    """True when SUPABASE_DB_URL is configured for direct SQL reads."""
+    return bool(_db_url)
+
+
+def get_engine():
+    """Pooled async engine, created on first use."""
+    global _engine, AsyncSessionLocal
+    if _engine is None:
+        if not _db_url:
+            raise ValueError("SUPABASE_DB_URL not set")
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+        from sqlalchemy.orm import sessionmaker
+
+        _engine = create_async_engine(
+            _async_url(_db_url),
+            echo=False,
+            pool_pre_ping=True,
+            pool_size=_pool_size,
+            max_overflow=_max_overflow,
+            pool_recycle=_pool_recycle,
+            connect_args={"statement_cache_size": _statement_cache_size},
+        )
+        AsyncSessionLocal = sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+        logger.info("Created async SQL engine", pool_size=_pool_size, max_overflow=_max_overflow)
+    return _engine
+
+
+async def dispose_engine():
+    """Close pooled connections (API shutdown)."""
+    global _engine, AsyncSessionLocal
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        AsyncSessionLocal = None
 
 
 async def get_session():
     """Get async database session."""
+    get_engine()
     async with AsyncSessionLocal() as session:
         yield session
 
+
+async def fetch_run_with_reports(run_id: str) -> Optional[Dict[str, Any]]:
+    """Run row plus its report paths ("artifacts") in one round trip, or None."""
+    from sqlalchemy import text
+
+    async with get_engine().connect() as conn:
+        row = (await conn.execute(text(_RUN_WITH_REPORTS), {"run_id": uuid.UUID(run_id)})).mappings().first()
+    return dict(row) if row else None
+
+
+async def fetch_reports(
+    date: Optional[str] = None,
+    path: Optional[str] = None,
+    limit: int = 200,
+    before: Optional[Tuple[datetime, str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Newest reports rows, optionally for one date (YYYY-MM-DD) or one storage path.
+
+    before=(created_at, id) continues a keyset page: only rows strictly older
+    than that position in (created_at desc, id desc) order are returned.
+    """
+    from sqlalchemy import text
+
+    clauses, params = [], {"limit": 1 if path else limit}
+    if path:
+        clauses.append("supabase_path = :path")
+        params["path"] = path
+    elif date:
+        clauses.append("date_utc = cast(:date as date)")
+        params["date"] = date_type.fromisoformat(date)  # asyncpg binds dates, not strings
+    if before:
+        clauses.append("(created_at, id) < (cast(:before_at as timestamptz), cast(:before_id as uuid))")
+        params["before_at"], params["before_id"] = before[0], uuid.UUID(before[1])
+    where = f"where {' and '.join(clauses)}" if clauses else ""
+    query = text(f"""
+        select id::text as id, supabase_path, pdf_path, date_utc, tickers, created_at
+        from reports
+        {where}
+        order by created_at desc, id desc
+        limit :limit
+    """)
+    async with get_engine().connect() as conn:
+        rows = (await conn.execute(query, params)).mappings().all()
+    return [dict(r) for r in rows]
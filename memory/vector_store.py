@@ -1,124 +1,382 @@
 """Vector store: pgvector embeddings with provider abstraction."""
 import os
+import json
+import time
+import queue
+import atexit
+import threading
 import structlog
-from typing import List, Optional
-from supabase import create_client
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional
+from memory.supabase_client import get_supabase_client
 from agent.state import Article
-from memory.embedding_provider import generate_embeddings, get_embedding_dimension
+from memory.embedding_provider import generate_embeddings_cached, get_embedding_dimension
+from memory.ann_index import get_ann_index
 
 logger = structlog.get_logger()
 
 _provider = os.getenv("EMBED_PROVIDER", "hf").lower()
+_article_chunk_size = int(os.getenv("ARTICLE_UPSERT_CHUNK_SIZE", "200"))
+_embed_chunk_size = int(os.getenv("EMBED_UPSERT_CHUNK_SIZE", "100"))
+_embed_write_retries = int(os.getenv("EMBED_WRITE_RETRIES", "3"))
+_write_behind = os.getenv("EMBED_WRITE_BEHIND", "false").lower() == "true"
+_ann_enabled = os.getenv("ANN_INDEX_ENABLED", "false").lower() == "true"
+_storage_mode = os.getenv("EMBED_STORAGE_MODE", "float32").lower()  # float32 | halfvec
+_rerank_factor = int(os.getenv("EMBED_RERANK_FACTOR", "4"))
 
+# Retry backoff; a module-level name so tests can skip the delay without patching time.sleep
+_sleep = time.sleep
 
-def _get_supabase_client():
-    """Lazy initialization of Supabase client."""
-    SB_URL = os.getenv("SUPABASE_URL")
-    SB_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-    
-    if not SB_URL or not SB_KEY:
-        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
-    
-    return create_client(SB_URL, SB_KEY)
 
+def _article_row(article: Article) -> Dict[str, Any]:
+    """Column values for an articles row."""
+    return {
+        "ticker": article.ticker,
+        "title": article.title,
+        "url": article.url,
+        "source": article.source,
+        "published_at": article.published_at.isoformat() if article.published_at else None,
+        "summary": article.summary,
+        "sentiment": article.sentiment,
+        "relevance": article.relevance,
+        "impact": article.impact,
+        "raw": article.raw,
+    }
+
+
+def embedding_text(article: Article) -> str:
+    """Text embedded for an article (also the embedding cache key input)."""
+    return f"{article.title}\n{article.summary or ''}"[:8000]  # Limit length
+
+
+def upsert_articles(sb, articles: List[Article], run_id: Optional[str] = None) -> Dict[str, str]:
+    """
+    Upsert articles in chunked bulk requests keyed on the unique url column.
+
+    Returns {url: article_id}. If a chunk is rejected, its rows are retried one
+    by one so a single bad article only fails (and is logged) on its own.
+    """
+    rows_by_url: Dict[str, Dict[str, Any]] = {}
+    for article in articles:
+        # Postgres rejects an upsert that touches the same row twice
+        rows_by_url[article.url] = _article_row(article)
+    rows = list(rows_by_url.values())
+
+    ids: Dict[str, str] = {}
+    for start in range(0, len(rows), _article_chunk_size):
+        chunk = rows[start:start + _article_chunk_size]
+        try:
+            result = sb.table("articles").upsert(chunk, on_conflict="url").execute()
+            ids.update({r["url"]: r["id"] for r in (result.data or [])})
+            continue
+        except Exception as e:
+            logger.warning(
+                "Bulk article upsert failed, retrying rows individually",
+                rows=len(chunk),
+                error=str(e),
+                run_id=run_id,
+            )
+
+        for row in chunk:
+            try:
+                result = sb.table("articles").upsert(row, on_conflict="url").execute()
+                if result.data:
+                    ids[row["url"]] = result.data[0]["id"]
+            except Exception as e:
+                logger.warning("Failed to save article", url=row["url"], error=str(e), run_id=run_id)
+
+    logger.info("Upserted articles", count=len(ids), failed=len(rows) - len(ids), run_id=run_id)
+    return ids
+
+
+def write_embeddings(sb, table: str, rows: List[Dict[str, Any]], run_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Upsert embedding rows in chunks of EMBED_UPSERT_CHUNK_SIZE.
+
+    A failed chunk is retried with backoff; the upsert is keyed on article_id,
+    so a retry after a partially applied request never duplicates rows.
+    Returns row counts, per-batch latencies and the article ids written.
+    """
+    stats: Dict[str, Any] = {"batches": 0, "rows": 0, "failed_rows": 0, "batch_latency_ms": [], "written_ids": []}
+    for start in range(0, len(rows), _embed_chunk_size):
+        chunk = rows[start:start + _embed_chunk_size]
+        for attempt in range(_embed_write_retries):
+            batch_start = time.perf_counter()
+            try:
+                sb.table(table).upsert(chunk, on_conflict="article_id").execute()
+            except Exception as e:
+                if attempt < _embed_write_retries - 1:
+                    delay = 2 ** attempt
+                    logger.warning(
+                        "Embedding batch failed, retrying",
+                        table=table,
+                        rows=len(chunk),
+                        attempt=attempt + 1,
+                        delay=delay,
+                        error=str(e)[:100],
+                        run_id=run_id,
+                    )
+                    _sleep(delay)
+                    continue
+                logger.warning("Failed to upsert embedding batch", table=table, rows=len(chunk), error=str(e), run_id=run_id)
+                stats["failed_rows"] += len(chunk)
+                break
+
+            latency_ms = int((time.perf_counter() - batch_start) * 1000)
+            stats["batches"] += 1
+            stats["rows"] += len(chunk)
+            stats["batch_latency_ms"].append(latency_ms)
+            stats["written_ids"].extend(row["article_id"] for row in chunk)
+            logger.info("Upserted embedding batch", table=table, rows=len(chunk), latency_ms=latency_ms, run_id=run_id)
+            break
+    return stats
+
+
+class EmbeddingWriter:
+    """
+    Background write-behind for embedding rows.
 
-def upsert_embeddings_for_articles(articles: List[Article], run_id: Optional[str] = None):
+    submit() enqueues a flush and returns immediately; a single daemon thread
+    drains the queue through write_embeddings and hands the ids it wrote to the
+    submission's on_written callback. flush() blocks until everything
+    submitted so far is written; it also runs at interpreter exit.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {"submitted": 0, "batches": 0, "rows": 0, "failed_rows": 0, "last_batch_latency_ms": []}
+        self._thread = threading.Thread(target=self._run, name="embedding-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, 30)
+
+    def submit(
+        self,
+        sb,
+        table: str,
+        rows: List[Dict[str, Any]],
+        run_id: Optional[str] = None,
+        on_written: Optional[Callable[[List[str]], None]] = None,
+    ):
+        with self._lock:
+            self._stats["submitted"] += len(rows)
+        self._queue.put((sb, table, rows, run_id, on_written))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued writes. Returns False if the timeout expired first."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "queue_depth": self._queue.qsize()}
+
+    def _run(self):
+        while True:
+            sb, table, rows, run_id, on_written = self._queue.get()
+            try:
+                result = write_embeddings(sb, table, rows, run_id)
+                with self._lock:
+                    for key in ("batches", "rows", "failed_rows"):
+                        self._stats[key] += result[key]
+                    self._stats["last_batch_latency_ms"] = result["batch_latency_ms"]
+                if on_written and result["written_ids"]:
+                    on_written(result["written_ids"])
+            except Exception as e:
+                logger.error("Embedding write-behind failed", table=table, rows=len(rows), error=str(e), run_id=run_id)
+            finally:
+                self._queue.task_done()
+
+
+_writer: Optional[EmbeddingWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_embedding_writer() -> EmbeddingWriter:
+    """Get or start the process-wide write-behind worker."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EmbeddingWriter()
+    return _writer
+
+
+def embedding_writer_stats() -> Dict[str, Any]:
+    """Write-behind counters, or disabled if the mode is off."""
+    if not _write_behind:
+        return {"enabled": False}
+    return {"enabled": True, **get_embedding_writer().stats()}
+
+
+def upsert_embeddings_for_articles(
+    articles: List[Article],
+    run_id: Optional[str] = None,
+    on_embedded: Optional[Callable[[List[Article], Dict[str, str]], None]] = None,
+) -> Dict[str, Any]:
     """
     Generate embeddings and upsert to Supabase.
     
     Uses batch processing for efficiency. On any error (429/timeout/etc),
-    logs warning, skips embeddings, continues run.
+    logs warning, skips embeddings, continues run. With EMBED_WRITE_BEHIND=true
+    the vector writes are handed to a background worker instead of awaited.
+
+    on_embedded(articles, article_ids) is called with the articles whose
+    vectors were actually written, once the write is confirmed (from the
+    write-behind thread when that mode is on).
     """
+    summary: Dict[str, Any] = {"articles": 0, "embedded": 0, "cache_hits": 0, "article_ids": {}}
     if not articles:
-        return
+        return summary
 
-    sb = _get_supabase_client()
-    
-    # Batch process articles
-    articles_to_embed = []
-    article_map = {}  # text -> article_id mapping
-    
-    for article in articles:
-        try:
-            text = f"{article.title}\n{article.summary or ''}"
-            if not text.strip():
-                continue
-
-            # Insert/update article first
-            existing = sb.table("articles").select("id").eq("url", article.url).limit(1).execute()
-
-            article_id = None
-            if existing.data:
-                article_id = existing.data[0]["id"]
-                sb.table("articles").update({
-                    "title": article.title,
-                    "summary": article.summary,
-                    "sentiment": article.sentiment,
-                    "relevance": article.relevance,
-                    "impact": article.impact,
-                    "source": article.source,
-                    "published_at": article.published_at.isoformat() if article.published_at else None,
-                }).eq("id", article_id).execute()
-            else:
-                result = sb.table("articles").insert({
-                    "ticker": article.ticker,
-                    "title": article.title,
-                    "url": article.url,
-                    "source": article.source,
-                    "published_at": article.published_at.isoformat() if article.published_at else None,
-                    "summary": article.summary,
-                    "sentiment": article.sentiment,
-                    "relevance": article.relevance,
-                    "impact": article.impact,
-                    "raw": article.raw,
-                }).execute()
-                if result.data:
-                    article_id = result.data[0]["id"]
+    sb = get_supabase_client()
 
-            if article_id:
-                articles_to_embed.append(text[:8000])  # Limit length
-                article_map[text[:8000]] = article_id
-        except Exception as e:
-            logger.warning("Failed to save article", url=article.url, error=str(e), run_id=run_id)
-            continue
+    articles = [a for a in articles if f"{a.title}\n{a.summary or ''}".strip()]
+    article_ids = upsert_articles(sb, articles, run_id)
+    summary["articles"] = len(article_ids)
+    summary["article_ids"] = article_ids
 
-    if not articles_to_embed:
-        return
+    # Batch process articles (one row per article_id; bulk upserts reject repeats)
+    to_embed = {}  # article_id -> (article, text)
+    for article in articles:
+        article_id = article_ids.get(article.url)
+        if article_id:
+            to_embed[article_id] = (article, embedding_text(article))
 
-    # Generate embeddings in batch
-    embeddings = generate_embeddings(articles_to_embed, batch_size=64)
+    if not to_embed:
+        return summary
+
+    # Generate embeddings in batch; unchanged texts come from the embedding cache
+    embeddings, cache_hits = generate_embeddings_cached([text for _, text in to_embed.values()])
+    summary["cache_hits"] = cache_hits
     
     if embeddings is None:
         logger.warning("Embedding generation failed, continuing without embeddings", run_id=run_id)
-        return
+        return summary
 
     # Upsert embeddings to appropriate table
-    embed_table = "embeddings_hf" if _provider == "hf" else "embeddings"
-    
-    for text, embedding in zip(articles_to_embed, embeddings):
+    embed_table = embed_table_name()
+    rows = [
+        {"article_id": article_id, "embedding": embedding}
+        for article_id, embedding in zip(to_embed, embeddings)
+    ]
+    if _storage_mode == "halfvec":
+        # pgvector rounds to float16 on insert; the HNSW index is built on this column
+        for row in rows:
+            row["embedding_half"] = row["embedding"]
+    summary["embedded"] = len(rows)
+
+    if _ann_enabled:
         try:
-            article_id = article_map.get(text)
-            if not article_id:
-                continue
-            
-            sb.table(embed_table).upsert({
-                "article_id": article_id,
-                "embedding": embedding,
-            }, on_conflict="article_id").execute()
-            
-            logger.debug(
-                "Upserted embedding",
-                article_id=article_id,
-                provider=_provider,
-                dim=len(embedding),
-                run_id=run_id,
+            indexed = to_embed.values()
+            get_ann_index(embed_table).add(
+                list(to_embed),
+                embeddings,
+                tickers=[article.ticker for article, _ in indexed],
+                published=[article.published_at for article, _ in indexed],
             )
         except Exception as e:
-            logger.warning(
-                "Failed to upsert embedding",
-                article_id=article_id,
-                error=str(e),
-                run_id=run_id,
-            )
-            continue
+            logger.warning("Failed to append to ANN index", error=str(e), run_id=run_id)
+
+    def _confirm(written_ids: List[str]):
+        if on_embedded and written_ids:
+            on_embedded([to_embed[i][0] for i in written_ids], article_ids)
+
+    if _write_behind:
+        get_embedding_writer().submit(sb, embed_table, rows, run_id, on_written=_confirm)
+        summary["write"] = "background"
+    else:
+        summary["write"] = write_embeddings(sb, embed_table, rows, run_id)
+        _confirm(summary["write"]["written_ids"])
+    return summary
+
+
+def embed_table_name() -> str:
+    """Embeddings table for the configured provider."""
+    return "embeddings_hf" if _provider == "hf" else "embeddings"
+
+
+def _parse_vector(value) -> List[float]:
+    """pgvector columns come back from PostgREST as '[...]' strings."""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _fetch_vectors(sb, table: str, article_ids: List[str]) -> Dict[str, np.ndarray]:
+    """Full-precision embeddings for article_ids."""
+    result = sb.table(table).select("article_id, embedding").in_("article_id", article_ids).execute()
+    return {
+        r["article_id"]: np.asarray(_parse_vector(r["embedding"]), dtype=np.float32)
+        for r in (result.data or [])
+        if r.get("embedding") is not None
+    }
+
+
+def rerank_full_precision(
+    query: np.ndarray,
+    candidates: Dict[str, np.ndarray],
+    k: int,
+) -> List[Dict[str, Any]]:
+    """Exact L2 ordering of candidate vectors; the top k as {article_id, distance}."""
+    if not candidates:
+        return []
+    ids = list(candidates)
+    dist = np.sqrt(((np.stack([candidates[i] for i in ids]) - query) ** 2).sum(axis=1))
+    order = np.argsort(dist)[:k]
+    return [{"article_id": ids[i], "distance": float(dist[i])} for i in order]
+
+
+def find_similar_articles(
+    article_id: str,
+    k: int = 10,
+    ticker: Optional[str] = None,
+    since: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Nearest stored articles to `article_id`.
+
+    With EMBED_STORAGE_MODE=halfvec the database does the search (halfvec HNSW
+    candidates re-ranked in SQL). Otherwise the local ANN index answers without
+    a database round trip; only an int8 index (ANN_INDEX_DTYPE=int8) with
+    EMBED_RERANK_FACTOR > 1 fetches full-precision vectors from Supabase to
+    re-rank its candidates.
+    """
+    table = embed_table_name()
+    candidate_count = k * max(1, _rerank_factor)
+
+    if _storage_mode == "halfvec":
+        sb = get_supabase_client()
+        query = _fetch_vectors(sb, table, [article_id]).get(article_id)
+        if query is None:
+            return []
+        result = sb.rpc(f"match_{table}_half", {
+            "query_embedding": query.tolist(),
+            "match_count": k + 1,
+            "candidate_count": candidate_count,
+            "filter_ticker": ticker,
+            "filter_since": since,
+        }).execute()
+        rows = [r for r in (result.data or []) if r["article_id"] != article_id]
+        return [{"article_id": r["article_id"], "distance": float(r["distance"])} for r in rows[:k]]
+
+    index = get_ann_index(table)
+    if index.meta["dtype"] != "int8" or _rerank_factor <= 1:
+        return [
+            {"article_id": neighbour, "distance": distance}
+            for neighbour, distance in index.similar(article_id, k=k, ticker=ticker, since=since)
+        ]
 
+    candidates = index.similar(article_id, k=candidate_count, ticker=ticker, since=since)
+    if not candidates:
+        return []
+    try:
+        vectors = _fetch_vectors(get_supabase_client(), table, [article_id] + [c for c, _ in candidates])
+    except Exception as e:
+        logger.warning("Full-precision re-rank failed, returning index order", error=str(e))
+        return [{"article_id": c, "distance": d} for c, d in candidates[:k]]
+    query = vectors.pop(article_id, None)
+    if query is None:
+        return [{"article_id": c, "distance": d} for c, d in candidates[:k]]
+    return rerank_full_precision(query, vectors, k)
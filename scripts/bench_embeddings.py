@@ -0,0 +1,66 @@
+"""Benchmark local embedding backends: load time, texts/sec and cosine drift vs. PyTorch."""
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import numpy as np
+
+from memory.embedding_provider import load_hf_model
+
+SAMPLE_TEXTS = [
+    "Apple shares rise after record iPhone sales beat analyst estimates",
+    "Microsoft expands Azure AI capacity with new data centers in Europe",
+    "Nvidia guidance disappoints as export restrictions weigh on China revenue",
+    "Tesla recalls vehicles over software issue affecting rear-view camera",
+    "Fed holds rates steady, signals patience on future cuts amid sticky inflation",
+    "Amazon to cut warehouse jobs as automation spending accelerates",
+    "Alphabet faces antitrust ruling that could force changes to search deals",
+    "Oil prices slide as OPEC+ weighs output increase for next quarter",
+]
+
+
+def _encode(model, texts, batch_size):
+    return model.encode(texts, batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False)
+
+
+def main():
+    """Usage: python scripts/bench_embeddings.py [n_texts] [batch_size] [quantize: avx2|avx512|avx512_vnni|arm64]"""
+    n_texts = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    quantize = sys.argv[3] if len(sys.argv) > 3 else "avx2"
+    texts = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(n_texts)]
+
+    backends = [("torch", ""), ("onnx", ""), ("onnx", quantize)]
+    reference = None
+    print(f"{n_texts} texts, batch_size={batch_size}")
+    print(f"{'backend':<18}{'load s':>8}{'texts/s':>10}{'cos mean':>10}{'cos min':>10}")
+    for backend, quant in backends:
+        label = f"{backend}-{quant}" if quant else backend
+        try:
+            start = time.perf_counter()
+            model = load_hf_model(backend, quant)
+            load_s = time.perf_counter() - start
+        except Exception as e:
+            print(f"{label:<18} skipped: {e}")
+            continue
+
+        _encode(model, texts[:batch_size], batch_size)  # warm-up
+        start = time.perf_counter()
+        vectors = np.asarray(_encode(model, texts, batch_size), dtype=np.float32)
+        rate = n_texts / (time.perf_counter() - start)
+
+        if reference is None:
+            reference = vectors
+        cosine = (vectors * reference).sum(axis=1)  # both normalized
+        print(f"{label:<18}{load_s:>8.2f}{rate:>10.1f}{cosine.mean():>10.5f}{cosine.min():>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
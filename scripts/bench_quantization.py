@@ -0,0 +1,78 @@
+"""Benchmark recall@k vs. memory for compact embedding encodings, with and without re-ranking."""
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from memory.quantization import quantize_int8, dequantize_int8
+
+
+def _clustered_vectors(n: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Normalized vectors around random centres, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    x = centres[rng.integers(clusters, size=n)] + 0.6 * rng.normal(size=(n, dim))
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _top_k(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    dist = (base ** 2).sum(axis=1)[None, :] - 2 * queries @ base.T
+    top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    rows = np.arange(len(queries))[:, None]
+    return top[rows, np.argsort(dist[rows, top], axis=1)]
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def _rerank(base: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    out = np.empty((len(queries), k), dtype=np.int64)
+    for i, (query, cand) in enumerate(zip(queries, candidates)):
+        dist = ((base[cand] - query) ** 2).sum(axis=1)
+        out[i] = cand[np.argsort(dist)[:k]]
+    return out
+
+
+def main():
+    """Usage: python scripts/bench_quantization.py [vectors.npy] [k] [rerank_factor]"""
+    args = sys.argv[1:]
+    if args and args[0].endswith(".npy"):
+        base = np.load(args.pop(0)).astype(np.float32)
+    else:
+        base = _clustered_vectors(20000, 384)
+    k = int(args[0]) if args else 10
+    factor = int(args[1]) if len(args) > 1 else 4
+
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(base), size=min(200, len(base)), replace=False)
+    queries = base[query_rows] + 0.05 * rng.normal(size=(len(query_rows), base.shape[1])).astype(np.float32)
+    truth = _top_k(base, queries, k)
+
+    codes, scales = quantize_int8(base)
+    encodings = {
+        "float32": (base, base.nbytes),
+        "halfvec": (base.astype(np.float16).astype(np.float32), base.astype(np.float16).nbytes),
+        "int8": (dequantize_int8(codes, scales), codes.nbytes + scales.nbytes),
+    }
+
+    print(f"{len(base)} vectors x {base.shape[1]} dims, {len(queries)} queries, k={k}, re-rank top {k * factor}")
+    print(f"{'encoding':<10}{'bytes/vec':>10}{'memory MB':>11}{'recall@k':>10}{'re-ranked':>11}{'ms/query':>10}")
+    for name, (decoded, nbytes) in encodings.items():
+        start = time.perf_counter()
+        approx = _top_k(decoded, queries, k * factor)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        reranked = _rerank(base, queries, approx, k)
+        print(
+            f"{name:<10}{nbytes / len(base):>10.0f}{nbytes / 1e6:>11.1f}"
+            f"{_recall(approx[:, :k], truth):>10.3f}{_recall(reranked, truth):>11.3f}{elapsed_ms:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Microbenchmark: per-article vs. batch sentiment and impact scoring."""
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from agent.state import Article, PriceSnapshot
+from agent.analysis.finance import batch_sentiment, score_impact, simple_sentiment
+
+TEMPLATES = [
+    "{t} beats estimates as quarterly profit jumps and shares surge",
+    "{t} misses revenue guidance, stock falls after analyst downgrade",
+    "{t} did not beat expectations; growth remains weak",
+    "{t} announces annual shareholder meeting date",
+    "{t} rally continues on record demand, bullish outlook",
+    "{t} faces lawsuit over product recall, shares drop",
+]
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "TSLA", "META", "JPM"]
+
+
+def _articles(n: int):
+    rng = np.random.default_rng(0)
+    out = []
+    for i in range(n):
+        ticker = TICKERS[i % len(TICKERS)]
+        title = TEMPLATES[rng.integers(len(TEMPLATES))].format(t=ticker)
+        summary = " ".join(TEMPLATES[j].format(t=ticker) for j in rng.integers(len(TEMPLATES), size=3))
+        out.append(Article(
+            ticker=ticker,
+            title=title,
+            url=f"https://example.com/{i}",
+            summary=summary,
+            relevance=float(rng.random()),
+        ))
+    return out
+
+
+def _timed(label: str, n: int, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed * 1000:>10.1f} ms{n / elapsed:>14,.0f} articles/s")
+
+
+def main():
+    """Usage: python scripts/bench_sentiment.py [n_articles]"""
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    articles = _articles(n)
+    texts = [f"{a.title} {a.summary or ''}" for a in articles]
+    prices = [PriceSnapshot(ticker=t, as_of=datetime.utcnow(), d1_change=1.5) for t in TICKERS]
+
+    batch_sentiment(texts[:10])  # build the vectorizer outside the timings
+    print(f"{n} articles")
+    _timed("per-article simple_sentiment", n, lambda: [simple_sentiment(t) for t in texts])
+    _timed("batch_sentiment", n, lambda: batch_sentiment(texts))
+    _timed("score_impact (batch)", n, lambda: score_impact(articles, prices))
+
+    scores = batch_sentiment(texts)
+    print(f"sentiment mean={scores.mean():.3f} std={scores.std():.3f} distinct={len(np.unique(scores))}")
+
+
+if __name__ == "__main__":
+    main()
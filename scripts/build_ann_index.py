@@ -0,0 +1,37 @@
+"""Rebuild or compact the local ANN index over stored embeddings."""
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from memory.ann_index import get_ann_index, rebuild_from_supabase
+from memory.supabase_client import get_supabase_client
+from memory.vector_store import embed_table_name
+
+
+def main():
+    """Usage: python scripts/build_ann_index.py [rebuild|compact] [table]"""
+    action = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    table = sys.argv[2] if len(sys.argv) > 2 else embed_table_name()
+
+    if action == "rebuild":
+        print(f"Rebuilding ANN index from {table}...")
+        index = rebuild_from_supabase(get_supabase_client(), table)
+    elif action == "compact":
+        print(f"Compacting ANN index for {table}...")
+        index = get_ann_index(table)
+        index.compact()
+    else:
+        print("Usage: python scripts/build_ann_index.py [rebuild|compact] [table]")
+        sys.exit(1)
+
+    print(f"✅ Done: {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,9 @@ def main():
     try:
         state = RunState(tickers=tickers, time_window_hours=hours)
         result = app.invoke(state)
+        # LangGraph returns the final state as a dict
+        if isinstance(result, dict):
+            result = RunState(**result)
 
         print(f"\n✅ Run completed!")
         print(f"Run ID: {result.run_id}")
@@ -37,6 +40,10 @@ def main():
             print(f"\nNotes:")
             for note in result.notes:
                 print(f"  - {note}")
+        if result.timings:
+            print(f"\nTimings (s):")
+            for node, seconds in result.timings.items():
+                print(f"  - {node}: {seconds:.2f}")
         if result.errors:
             print(f"\n⚠️  Errors:")
             for error in result.errors:
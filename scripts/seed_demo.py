@@ -7,7 +7,7 @@ from datetime import datetime, timedelta
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from dotenv import load_dotenv
-from supabase import create_client
+from memory.supabase_client import get_supabase_client
 
 load_dotenv()
 
@@ -18,7 +18,7 @@ if not SB_URL or not SB_KEY:
     print("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
     sys.exit(1)
 
-sb = create_client(SB_URL, SB_KEY)
+sb = get_supabase_client()
 
 # Create a demo run
 run = sb.table("runs").insert({
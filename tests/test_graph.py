@@ -21,3 +21,164 @@ def test_graph_runs_smoke():
             pytest.skip("API keys not configured")
         raise
 
+
+def test_news_and_prices_run_in_parallel(monkeypatch):
+    """news and prices branches overlap and both merge notes/timings at analyze."""
+    import threading
+    import agent.graph as graph_module
+    from agent.state import Article, PriceSnapshot
+    from datetime import datetime
+
+    # Each fetch waits for the other; run one after the other, they time out and the run records errors
+    both_running = threading.Barrier(2, timeout=10)
+
+    def fake_news(tickers, hours, run_id=None):
+        both_running.wait()
+        return [Article(ticker=t, title=f"{t} news", url=f"https://example.com/{t}") for t in tickers] * 3
+
+    def fake_prices(tickers, run_id=None):
+        both_running.wait()
+        return [PriceSnapshot(ticker=t, as_of=datetime.utcnow(), close=1.0) for t in tickers]
+
+    monkeypatch.setattr(graph_module, "create_run", lambda tickers, hours: "run-1")
+    monkeypatch.setattr(graph_module, "fetch_news_for_tickers", fake_news)
+    monkeypatch.setattr(graph_module, "fetch_rss_fallback", lambda tickers, hours: [])
+    monkeypatch.setattr(graph_module, "fetch_prices_snapshot", fake_prices)
+    monkeypatch.setattr(graph_module, "upsert_embeddings_for_articles", lambda articles, run_id=None, on_embedded=None: None)
+    monkeypatch.setattr(graph_module, "render_and_store_report", lambda state: "reports/test.md")
+
+    result = graph_module.app.invoke(RunState(tickers=["AAPL", "MSFT"]))
+
+    assert result["run_id"] == "run-1"
+    assert len(result["articles"]) == 2
+    assert len(result["prices"]) == 2
+    assert any(n.startswith("news:") for n in result["notes"])
+    assert any(n.startswith("prices:") for n in result["notes"])
+    assert result["artifacts"] == ["reports/test.md"]
+    assert set(result["timings"]) == {"plan", "news", "prices", "analyze", "report"}
+    assert result["errors"] == []
+
+
+def test_job_queue_resumes_interrupted_runs(tmp_path, monkeypatch):
+    """Jobs persisted by a previous process are re-run with per-node progress."""
+    import time
+    import apps.api.jobs as jobs
+
+    class FakeGraph:
+        def stream(self, state, stream_mode):
+            yield "updates", {"plan": {"timings": {"plan": 0.1}}}
+            yield "values", {"errors": [], "artifacts": ["reports/x.md"]}
+            yield "updates", {"report": {"timings": {"report": 0.2}}}
+
+    statuses = {}
+    monkeypatch.setattr(jobs, "agent_app", FakeGraph())
+    monkeypatch.setattr(jobs, "update_run_status", lambda run_id, status, errors=None: statuses.update({run_id: status}))
+
+    db = str(tmp_path / "jobs.sqlite3")
+    first = jobs.JobQueue(db_path=db, max_workers=1)
+    conn = first._connect()
+    conn.execute(
+        "insert into jobs (run_id, tickers, time_window_hours, status, created_at) values (?, ?, ?, ?, ?)",
+        ("run-1", '["AAPL"]', 24, "running", time.time()),
+    )
+    conn.close()
+
+    second = jobs.JobQueue(db_path=db, max_workers=1)
+    second.start()
+    second.shutdown(wait=True)
+
+    job = second.get("run-1")
+    assert job["status"] == "completed"
+    assert job["artifacts"] == ["reports/x.md"]
+    assert job["progress"]["completed_nodes"] == ["plan", "report"]
+    assert statuses == {"run-1": "completed"}
+
+
+def test_job_queue_leaves_live_jobs_of_other_processes(tmp_path, monkeypatch):
+    """Only running jobs with a stale heartbeat are taken over; the DB is created on first use."""
+    import time
+    import apps.api.jobs as jobs
+
+    ran = []
+
+    class FakeGraph:
+        def stream(self, state, stream_mode):
+            ran.append(state.run_id)
+            yield "values", {"errors": [], "artifacts": []}
+
+    monkeypatch.setattr(jobs, "agent_app", FakeGraph())
+    monkeypatch.setattr(jobs, "update_run_status", lambda run_id, status, errors=None: None)
+
+    db = tmp_path / "jobs.sqlite3"
+    queue = jobs.JobQueue(db_path=str(db), max_workers=1)
+    assert not db.exists()
+
+    conn = queue._connect()
+    now = time.time()
+    conn.executemany(
+        "insert into jobs (run_id, tickers, time_window_hours, status, created_at, owner, updated_at) "
+        "values (?, '[\"AAPL\"]', 24, 'running', ?, 'other-host:1', ?)",
+        [("live", now, now), ("dead", now, now - 3600)],
+    )
+    conn.close()
+
+    queue.start()
+    queue.shutdown(wait=True)
+
+    assert ran == ["dead"]
+    assert queue.get("live")["status"] == "running"
+    assert queue.get("dead")["status"] == "completed"
+
+def test_streaming_pipeline_overlaps_fetch_and_scoring(monkeypatch):
+    """Stages consume batches while fetches are still arriving; duplicates across batches are dropped."""
+    import time
+    import agent.pipeline as pipeline
+    from agent.state import Article
+
+    def slow_stream(tickers, hours, run_id=None):
+        for t in tickers:
+            time.sleep(0.05)
+            yield [Article(ticker=t, title=f"{t} shares rise", url=f"https://example.com/{t}"),
+                   Article(ticker=t, title="shared story", url="https://example.com/shared")]
+
+    embedded = []
+    monkeypatch.setattr(pipeline, "iter_news_for_tickers", slow_stream)
+    monkeypatch.setattr(pipeline, "fetch_rss_fallback", lambda tickers, hours: [])
+    monkeypatch.setattr(pipeline, "embedding_cache_enabled", lambda: True)
+    monkeypatch.setattr(pipeline, "generate_embeddings_cached", lambda texts: embedded.extend(texts))
+    monkeypatch.setattr(pipeline, "_embed_batch", 2)
+
+    result = pipeline.stream_news(["AAPL", "MSFT", "NVDA"], 24, "run-1")
+
+    urls = [a.url for a in result["articles"]]
+    assert len(urls) == len(set(urls)) == 4
+    assert all(a.sentiment is not None for a in result["articles"])
+    assert len(embedded) == 4
+    assert result["errors"] == []
+    assert set(result["timings"]) == {"news.fetch", "news.dedupe", "news.sentiment", "news.embed"}
+
+
+def test_analyze_marks_embedded_only_after_confirmed_write(tmp_path, monkeypatch):
+    """Stored articles whose vector write was not confirmed are analyzed again next run."""
+    import agent.graph as graph_module
+    from agent.state import Article
+    from memory.local_cache import SqliteCache
+    from memory.seen_index import SeenIndex
+
+    seen = SeenIndex(SqliteCache("seen", db_path=str(tmp_path / "c.sqlite3")))
+    seen._warm_checked = True
+    a = Article(ticker="AAPL", title="AAPL shares rise", url="https://example.com/a")
+    b = Article(ticker="AAPL", title="AAPL misses", url="https://example.com/b")
+
+    def fake_upsert(articles, run_id=None, on_embedded=None):
+        ids = {x.url: f"id-{x.url[-1]}" for x in articles}
+        on_embedded([a], ids)  # b's vector batch failed
+        return {"articles": 2, "embedded": 2, "article_ids": ids}
+
+    monkeypatch.setattr(graph_module, "get_seen_index", lambda: seen)
+    monkeypatch.setattr(graph_module, "upsert_embeddings_for_articles", fake_upsert)
+    graph_module.analyze(RunState(tickers=["AAPL"], articles=[a, b], run_id="run-1"))
+
+    fresh, known = seen.partition([a, b])
+    assert fresh == [b]
+    assert [(x, e["article_id"]) for x, e in known] == [(a, "id-a")]
@@ -1,5 +1,6 @@
 """Tests for reporting module."""
 import pytest
+from datetime import datetime
 from agent.state import RunState, Article, PriceSnapshot
 from agent.analysis.nlp import score_articles
 from agent.analysis.finance import score_impact
@@ -36,7 +37,7 @@ def test_score_impact():
     prices = [
         PriceSnapshot(
             ticker="AAPL",
-            as_of=None,
+            as_of=datetime(2026, 1, 2, 21, 0),
             close=150.0,
             d1_change=2.5,
         ),
@@ -47,3 +48,205 @@ def test_score_impact():
     assert scored[0].impact is not None
     assert scored[0].sentiment is not None
 
+
+def test_batch_sentiment_reads_text_and_negation():
+    """Scores depend on the matched terms, including negated ones."""
+    from agent.analysis.finance import batch_sentiment
+
+    scores = batch_sentiment([
+        "Apple beats estimates, shares surge",
+        "Nvidia misses and the stock falls",
+        "Revenue did not beat expectations",
+        "Company schedules annual meeting",
+    ])
+    assert scores.shape == (4,)
+    assert scores[0] > 0.5 and scores[1] < -0.5
+    assert -0.5 < scores[2] < 0
+    assert scores[3] == 0.0
+
+    articles = [
+        Article(ticker="AAPL", title="Apple beats", url="https://example.com/1", relevance=0.5),
+        Article(ticker="MSFT", title="Microsoft misses", url="https://example.com/2", relevance=1.0),
+    ]
+    prices = [PriceSnapshot(ticker="AAPL", as_of=datetime(2026, 1, 2), d1_change=-10.0)]
+    score_impact(articles, prices)
+    assert articles[0].impact == pytest.approx(0.5 * 0.5 * 1.1)
+    assert articles[1].impact == pytest.approx(0.5)
+
+
+def test_idf_model_merges_workers_and_scores_vectorized(tmp_path, monkeypatch):
+    """Documents are counted once across processes; relevance uses the persisted IDF."""
+    import agent.analysis.idf_model as idf_model
+    import agent.analysis.nlp as nlp
+
+    path = str(tmp_path / "idf.json")
+    first, second = idf_model.IdfModel(path), idf_model.IdfModel(path)
+    assert first.update(["apple stock rises", "market falls", "apple stock rises"]) == 2
+    assert second.update(["market falls", "nvda earnings beat"]) == 2
+    first.save()
+    second.save()
+
+    reloaded = idf_model.IdfModel(path)
+    assert reloaded.n_docs == 3
+    assert reloaded.df["market"] == 1 and reloaded.df["apple"] == 1
+    nvda, market, unseen = reloaded.idf(["nvda", "market", "unseen"])
+    assert nvda == market < unseen
+
+    monkeypatch.setattr(nlp, "get_idf_model", lambda: reloaded)
+    articles = [
+        Article(ticker="AAPL", title="AAPL shares up", url="https://example.com/a", summary="aapl stock"),
+        Article(ticker="AAPL", title="Weather report", url="https://example.com/b", summary="rain"),
+    ]
+    scored = score_articles(articles, ["AAPL"])
+    assert scored[0].relevance > 0 and scored[1].relevance == 0.0
+    assert reloaded.n_docs == 5
+
+
+def test_report_content_hash_follows_rendered_content():
+    """Changes the template would not show keep the key; visible changes move it."""
+    from agent.reporting.render import report_content_hash
+
+    article = Article(ticker="AAPL", title="Apple beats", url="https://example.com/a", impact=0.4321, relevance=0.5)
+    price = PriceSnapshot(ticker="AAPL", as_of=datetime(2024, 1, 2, 16), close=190.0, d1_change=1.2)
+    key = report_content_hash("2024-01-02", ["AAPL"], 24, [article], [price])
+
+    noise = article.model_copy(update={"impact": 0.43209})
+    later_quote = price.model_copy(update={"as_of": datetime(2024, 1, 2, 17)})
+    assert report_content_hash("2024-01-02", ["AAPL"], 24, [noise], [later_quote]) == key
+
+    retitled = article.model_copy(update={"title": "Apple beats estimates"})
+    assert report_content_hash("2024-01-02", ["AAPL"], 24, [retitled], [price]) != key
+    assert report_content_hash("2024-01-02", ["AAPL"], 48, [article], [price]) != key
+
+
+def test_pdf_service_shares_one_build_per_report(monkeypatch):
+    """Concurrent store() calls for a report render and upload its PDF once."""
+    import threading
+    from agent.reporting.pdf_service import PdfService
+
+    release = threading.Event()
+    uploads, updates = [], []
+
+    class _Query:
+        def __init__(self, values):
+            self.values = values
+
+        def eq(self, column, value):
+            updates.append((self.values, column, value))
+            return self
+
+        def execute(self):
+            return None
+
+    class _Client:
+        class storage:
+            @staticmethod
+            def from_(bucket):
+                return type("Bucket", (), {"upload": staticmethod(lambda path, data, file_options: uploads.append(path))})
+
+        @staticmethod
+        def table(name):
+            return type("Table", (), {"update": staticmethod(lambda values: _Query(values))})
+
+    service = PdfService(workers=2)
+    monkeypatch.setattr(service, "render", lambda md: release.wait(5) and b"%PDF")
+
+    first = service.store(_Client, "reports", "2024-01-02/report_AAPL.md", "# Report", "report-1")
+    second = service.store(_Client, "reports", "2024-01-02/report_AAPL.md", "# Report", "report-1")
+    assert first is second
+    assert service.stats()["running"] + service.stats()["queued"] == 1
+
+    release.set()
+    assert first.result(timeout=5) == "2024-01-02/report_AAPL.pdf"
+    assert uploads == ["2024-01-02/report_AAPL.pdf"]
+    assert updates == [({"pdf_path": "2024-01-02/report_AAPL.pdf"}, "id", "report-1")]
+
+    monkeypatch.setattr(service, "render", lambda md: 1 / 0)
+    failed = service.store(_Client, "reports", "2024-01-02/report_MSFT.md", "# Report", "report-2")
+    with pytest.raises(ZeroDivisionError):
+        failed.result(timeout=5)
+    assert service.stats()["store_failed"] == 1
+    service.shutdown(wait=True)
+
+
+def test_unchanged_report_links_run_without_rendering(monkeypatch):
+    """A report whose content hash is stored is not re-rendered or re-uploaded, but the run still gets its row."""
+    import types
+    import agent.reporting.render as render
+
+    state = RunState(tickers=["AAPL"], run_id="run-2")
+    date_str = datetime.utcnow().date().isoformat()
+    md_path = f"{date_str}/report_AAPL.md"
+    key = render.report_content_hash(date_str, state.tickers, state.time_window_hours, [], [])
+    stored = {"id": "report-1", "content_hash": key, "pdf_path": f"{date_str}/report_AAPL.pdf"}
+    inserts, uploads = [], []
+
+    class _Query:
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: self
+
+        def execute(self):
+            return types.SimpleNamespace(data=[stored])
+
+    class _Table(_Query):
+        def insert(self, row):
+            inserts.append(row)
+            return self
+
+    sb = types.SimpleNamespace(
+        table=lambda name: _Table(),
+        storage=types.SimpleNamespace(from_=lambda bucket: types.SimpleNamespace(upload=lambda *a, **k: uploads.append(a))),
+    )
+    monkeypatch.setattr(render, "get_supabase_client", lambda: sb)
+    monkeypatch.setattr(render, "_render_markdown", lambda *a, **k: pytest.fail("unchanged report was rendered"))
+
+    assert render.render_and_store_report(state) == f"reports/{md_path}"
+    assert uploads == []
+    assert inserts == [{
+        "run_id": "run-2",
+        "date_utc": date_str,
+        "tickers": ["AAPL"],
+        "supabase_path": md_path,
+        "pdf_path": stored["pdf_path"],
+        "content_hash": key,
+    }]
+
+
+def test_reports_pdf_endpoint_builds_missing_pdf_once(monkeypatch):
+    """/reports/pdf builds a missing PDF through the service and signs stored ones directly."""
+    from concurrent.futures import Future
+    from fastapi.testclient import TestClient
+    import apps.api.main as main
+
+    reports = {
+        "2024-01-02/report_AAPL.md": {"id": "report-1", "pdf_path": None, "content_hash": "h1"},
+        "2024-01-02/report_MSFT.md": {"id": "report-2", "pdf_path": "2024-01-02/report_MSFT.pdf"},
+    }
+    stores = []
+
+    def fake_store(sb, bucket, md_path, md, report_id):
+        stores.append((bucket, md_path, md, report_id))
+        future = Future()
+        future.set_result(md_path[:-len(".md")] + ".pdf")
+        return future
+
+    monkeypatch.setattr(main, "_latest_report", reports.get)
+    monkeypatch.setattr(main, "WEASYPRINT_AVAILABLE", True)
+    monkeypatch.setattr(main, "cached_markdown", lambda content_hash: None)
+    monkeypatch.setattr(main, "_download_markdown", lambda bucket, path: "# Report")
+    monkeypatch.setattr(main, "get_supabase_client", lambda: None)
+    monkeypatch.setattr(main.pdf_service, "store", fake_store)
+    monkeypatch.setattr(main.signed_url_cache, "get_many", lambda bucket, paths: {p: f"https://signed/{p}" for p in paths})
+    client = TestClient(main.app)
+
+    built = client.get("/reports/pdf", params={"path": "2024-01-02/report_AAPL.md"})
+    assert built.status_code == 200
+    assert built.json()["pdf_path"] == "2024-01-02/report_AAPL.pdf"
+    assert built.json()["signed_url_pdf"] == "https://signed/2024-01-02/report_AAPL.pdf"
+    assert stores == [("reports", "2024-01-02/report_AAPL.md", "# Report", "report-1")]
+
+    stored = client.get("/reports/pdf", params={"path": "2024-01-02/report_MSFT.md"})
+    assert stored.json()["pdf_path"] == "2024-01-02/report_MSFT.pdf"
+    assert len(stores) == 1
+
+    assert client.get("/reports/pdf", params={"path": "2024-01-02/missing.md"}).status_code == 404
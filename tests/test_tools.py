@@ -17,3 +17,533 @@ def test_dedupe_by_url():
     assert unique[0].url == "https://example.com/1"
     assert unique[1].url == "https://example.com/2"
 
+
+async def test_fetch_news_async_groups_by_ticker(httpx_mock, monkeypatch):
+    """Concurrent Tavily fetch keeps results grouped in ticker order."""
+    import json
+    import httpx
+    from agent.tools.tavily_client import fetch_news_for_tickers_async
+
+    monkeypatch.setenv("TAVILY_API_KEY", "test-key")
+
+    def _respond(request: httpx.Request):
+        ticker = json.loads(request.content)["query"].split()[0]
+        return httpx.Response(200, json={"results": [
+            {"title": f"{ticker} news {i}", "url": f"https://example.com/{ticker}/{i}"}
+            for i in range(2)
+        ]})
+
+    httpx_mock.add_callback(_respond, is_reusable=True)
+
+    articles = await fetch_news_for_tickers_async(["MSFT", "AAPL", "NVDA"], max_concurrency=2)
+    assert [a.ticker for a in articles] == ["MSFT", "MSFT", "AAPL", "AAPL", "NVDA", "NVDA"]
+
+
+def test_rate_limiter_only_waits_when_budget_used(tmp_path):
+    """Token bucket allows a burst, then asks to wait; daily quota raises."""
+    from agent.tools.rate_limit import RateLimiter, RateLimitExceeded
+
+    db = str(tmp_path / "limits.sqlite3")
+    limiter = RateLimiter("test", calls_per_minute=2, calls_per_day=3, db_path=db)
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() > 0
+
+    # A second instance (e.g. another worker process) shares the same budget
+    other = RateLimiter("test", calls_per_minute=2, calls_per_day=3, db_path=db)
+    assert other.try_acquire() > 0
+
+    other.penalize(30)
+    assert limiter.try_acquire() >= 29
+
+    exhausted = RateLimiter("daily", calls_per_minute=60, calls_per_day=1, db_path=db)
+    assert exhausted.try_acquire() == 0
+    with pytest.raises(RateLimitExceeded):
+        exhausted.try_acquire()
+
+
+def test_parse_retry_after():
+    """Retry-After accepts delta-seconds and ignores garbage."""
+    from agent.tools.rate_limit import parse_retry_after
+
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+async def test_rss_feed_cache_uses_conditional_get(httpx_mock, tmp_path, monkeypatch):
+    """A 304 on the second fetch serves the cached, already-parsed entries."""
+    import agent.tools.rss_client as rss_client
+
+    monkeypatch.setattr(rss_client, "_cache_dir", str(tmp_path))
+    feed_url = "https://example.com/feed.xml"
+    body = (
+        '<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>'
+        "<item><title>AAPL beats estimates</title><link>https://example.com/a</link></item>"
+        "</channel></rss>"
+    )
+    httpx_mock.add_response(url=feed_url, text=body, headers={"ETag": '"v1"'})
+    httpx_mock.add_response(url=feed_url, status_code=304, match_headers={"If-None-Match": '"v1"'})
+
+    first = await rss_client.fetch_feed_entries_async([feed_url])
+    second = await rss_client.fetch_feed_entries_async([feed_url])
+    assert first[feed_url][0]["title"] == "AAPL beats estimates"
+    assert second == first
+
+
+def test_news_cache_serves_repeat_queries(httpx_mock, tmp_path, monkeypatch):
+    """A second run for the same ticker/window is served without calling Tavily."""
+    import agent.tools.tavily_client as tavily_client
+    from memory.local_cache import SqliteCache
+
+    monkeypatch.setenv("TAVILY_API_KEY", "test-key")
+    monkeypatch.setattr(tavily_client, "_cache_enabled", True)
+    cache = SqliteCache("tavily", db_path=str(tmp_path / "cache.sqlite3"), default_ttl=60)
+    monkeypatch.setattr(tavily_client, "_news_cache", cache)
+    httpx_mock.add_response(json={"results": [{"title": "AAPL up", "url": "https://example.com/a"}]})
+
+    first = tavily_client.fetch_news_for_tickers(["AAPL"], 24)
+    second = tavily_client.fetch_news_for_tickers(["AAPL"], 24)
+    assert [a.url for a in second] == [a.url for a in first] == ["https://example.com/a"]
+    assert len(httpx_mock.get_requests()) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_sqlite_cache_ttl_and_lru(tmp_path):
+    """Expired entries are misses and the namespace is capped at max_entries."""
+    from memory.local_cache import SqliteCache
+
+    cache = SqliteCache("test", db_path=str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("expired", 1, ttl=-1)
+    assert cache.get("expired") is None
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.stats()["entries"] == 2
+
+
+def test_market_hours_calendar():
+    """Regular session, weekends and NYSE holidays drive the quote cache TTL."""
+    from datetime import date, datetime, timezone
+    from agent.tools.market_hours import is_market_open, next_open, nyse_holidays
+
+    assert is_market_open(datetime(2026, 10, 16, 15, 0))  # Fri 11:00 ET
+    assert not is_market_open(datetime(2026, 10, 16, 21, 0))  # Fri 17:00 ET
+    assert not is_market_open(datetime(2026, 10, 17, 15, 0))  # Saturday
+    assert next_open(datetime(2026, 10, 17, 15, 0)) == datetime(2026, 10, 19, 13, 30, tzinfo=timezone.utc)
+
+    holidays = nyse_holidays(2026)
+    assert date(2026, 4, 3) in holidays  # Good Friday
+    assert date(2026, 11, 26) in holidays  # Thanksgiving
+    assert date(2026, 7, 3) in holidays  # July 4th on Saturday, observed Friday
+    # Wednesday before Thanksgiving -> next open is Friday morning
+    assert next_open(datetime(2026, 11, 25, 22, 0)) == datetime(2026, 11, 27, 14, 30, tzinfo=timezone.utc)
+
+
+class _FakeTable:
+    """Minimal stand-in for a supabase-py table query builder."""
+
+    def __init__(self, calls, fail_urls):
+        self.calls = calls
+        self.fail_urls = fail_urls
+        self.rows = None
+
+    def upsert(self, rows, on_conflict=None):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def execute(self):
+        import types
+        self.calls.append(len(self.rows))
+        if any(r["url"] in self.fail_urls for r in self.rows):
+            raise RuntimeError("bad row")
+        return types.SimpleNamespace(data=[{"id": f"id-{r['url']}", "url": r["url"]} for r in self.rows])
+
+
+class _FakeSupabase:
+    def __init__(self, fail_urls=()):
+        self.calls = []
+        self.fail_urls = set(fail_urls)
+
+    def table(self, name):
+        return _FakeTable(self.calls, self.fail_urls)
+
+
+def test_upsert_articles_bulk_with_per_url_fallback():
+    """Articles go up in one request; a rejected chunk is retried row by row."""
+    from memory.vector_store import upsert_articles
+
+    articles = [Article(ticker="AAPL", title=f"t{i}", url=f"https://example.com/{i}") for i in range(3)]
+
+    sb = _FakeSupabase()
+    ids = upsert_articles(sb, articles + articles[:1])
+    assert sb.calls == [3]
+    assert ids["https://example.com/0"] == "id-https://example.com/0"
+
+    sb = _FakeSupabase(fail_urls={"https://example.com/1"})
+    ids = upsert_articles(sb, articles)
+    assert sb.calls == [3, 1, 1, 1]
+    assert set(ids) == {"https://example.com/0", "https://example.com/2"}
+
+
+def test_write_embeddings_chunks_and_write_behind(monkeypatch):
+    """Vectors go up in chunks; failed batches are retried; write-behind drains in the background."""
+    import types
+    import memory.vector_store as vector_store
+
+    monkeypatch.setattr(vector_store, "_embed_chunk_size", 2)
+    monkeypatch.setattr(vector_store, "_sleep", lambda s: None)
+    calls = []
+
+    class FlakyTable:
+        def upsert(self, rows, on_conflict=None):
+            self.rows = rows
+            return self
+
+        def execute(self):
+            calls.append(len(self.rows))
+            if len(calls) == 1:
+                raise RuntimeError("timeout")
+            return types.SimpleNamespace(data=[])
+
+    sb = types.SimpleNamespace(table=lambda name: FlakyTable())
+    rows = [{"article_id": f"a{i}", "embedding": [0.0, 1.0]} for i in range(5)]
+
+    stats = vector_store.write_embeddings(sb, "embeddings_hf", rows)
+    assert calls == [2, 2, 2, 1]
+    assert (stats["batches"], stats["rows"], stats["failed_rows"]) == (3, 5, 0)
+
+    assert stats["written_ids"] == [f"a{i}" for i in range(5)]
+
+    # Without retries the failed chunk is not reported as written
+    monkeypatch.setattr(vector_store, "_embed_write_retries", 1)
+    calls.clear()
+    written = []
+    writer = vector_store.EmbeddingWriter()
+    writer.submit(sb, "embeddings_hf", rows, on_written=written.extend)
+    assert writer.flush(timeout=5)
+    assert writer.stats()["rows"] == 3
+    assert written == ["a2", "a3", "a4"]
+
+
+def test_plan_batches_token_budget_and_order():
+    """Length-sorted batches respect the padded token budget; vectors return in input order."""
+    from memory.embedding_provider import _run_batches, plan_batches
+
+    lengths = [200, 10, 12, 190, 11, 500]
+    batches = plan_batches(lengths, max_tokens=400, max_batch_size=8)
+    assert batches == [[1, 4, 2], [3, 0], [5]]  # 3 * 12, 2 * 200, oversized alone
+    assert plan_batches(lengths, max_tokens=1000, max_batch_size=2)[0] == [1, 4]
+    assert plan_batches(lengths, max_tokens=500, max_batch_size=8, padded=False) == [[1, 4, 2, 3, 0], [5]]
+
+    texts = [f"t{i}" for i in range(len(lengths))]
+    calls = []
+
+    def encode(batch):
+        calls.append(batch)
+        return [[float(t[1:])] for t in batch]
+
+    assert _run_batches(texts, lengths, encode, 400, 8) == [[float(i)] for i in range(6)]
+    assert len(calls) == 3
+
+
+def test_embedding_cache_only_embeds_misses(tmp_path, monkeypatch):
+    """Unchanged texts are served from the content-hash cache."""
+    import memory.embedding_provider as embedding_provider
+    from memory.local_cache import SqliteCache
+
+    embedded = []
+
+    def fake_generate(texts, batch_size=64):
+        embedded.extend(texts)
+        return [[float(len(t)), 0.5] for t in texts]
+
+    monkeypatch.setattr(embedding_provider, "_cache_enabled", True)
+    monkeypatch.setattr(embedding_provider, "generate_embeddings", fake_generate)
+    monkeypatch.setattr(
+        embedding_provider, "_embedding_cache", SqliteCache("embeddings", db_path=str(tmp_path / "c.sqlite3"))
+    )
+
+    first, hits = embedding_provider.generate_embeddings_cached(["apple up", "msft down"])
+    assert hits == 0
+    second, hits = embedding_provider.generate_embeddings_cached(["msft  down", "nvda flat", "apple up"])
+    assert hits == 2
+    assert embedded == ["apple up", "msft down", "nvda flat"]
+    assert second == [first[1], [9.0, 0.5], first[0]]
+
+
+def test_ann_index_search_filters_and_appends(tmp_path, monkeypatch):
+    """IVF index finds neighbours, filters by ticker/date and reopens from disk."""
+    import numpy as np
+    import memory.ann_index as ann_index
+
+    monkeypatch.setattr(ann_index, "_min_train_size", 64)
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(4, 16)) * 5
+    vectors = np.concatenate([c + rng.normal(size=(50, 16)) for c in centers]).astype(np.float32)
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(len(vectors))]
+    tickers = ["AAPL" if i % 2 else "MSFT" for i in range(len(vectors))]
+    published = ["2026-01-01T00:00:00" if i < 100 else "2026-06-01T00:00:00" for i in range(len(vectors))]
+
+    index = ann_index.AnnIndex(str(tmp_path / "idx"))
+    assert index.add(ids[:150], vectors[:150], tickers[:150], published[:150]) == 150
+    assert index.wait_for_compaction(timeout=10)
+    assert index.centroids is not None  # trained in the background once past the minimum size
+    assert index.add(ids[100:], vectors[100:], tickers[100:], published[100:]) == 100  # 50 overwritten, 50 appended
+    assert index.stats()["rows"] == 200 and index.stats()["tail_rows"] == 50
+
+    reopened = ann_index.AnnIndex(str(tmp_path / "idx"))
+    assert reopened.stats()["rows"] == 200
+    top = reopened.search(vectors[175], k=1)
+    assert top[0][0] == ids[175]
+
+    neighbours = reopened.similar(ids[3], k=5, ticker="AAPL", since="2026-03-01")
+    assert neighbours and ids[3] not in [n for n, _ in neighbours]
+    assert all(int(n[-12:]) % 2 == 1 and int(n[-12:]) >= 100 for n, _ in neighbours)
+
+
+def test_ann_index_overwrites_reembedded_and_compacts_tail(tmp_path, monkeypatch):
+    """Re-embedded ids replace their vector; a long tail is folded back in the background."""
+    import numpy as np
+    import memory.ann_index as ann_index
+
+    monkeypatch.setattr(ann_index, "_min_train_size", 64)
+    monkeypatch.setattr(ann_index, "_compact_tail_fraction", 0.1)
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(300, 8)).astype(np.float32)
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(len(vectors))]
+
+    index = ann_index.AnnIndex(str(tmp_path / "idx"), dtype="float32")
+    index.add(ids[:200], vectors[:200])
+    assert index.wait_for_compaction(timeout=10)
+    assert index.stats()["tail_rows"] == 0
+
+    moved = vectors[0] + 50
+    assert index.add([ids[0]], [moved]) == 1
+    assert index.stats()["rows"] == 200
+    assert np.allclose(index._vectors([index.row_of(ids[0])])[0], moved)
+
+    index.add(ids[200:250], vectors[200:250])
+    assert index.stats()["tail_rows"] == 50  # below max(64, 10% of 200)
+    index.add(ids[250:], vectors[250:])
+    assert index.wait_for_compaction(timeout=10)
+    assert index.stats()["tail_rows"] == 0  # 100 > 64: compacted
+    assert index.search(vectors[275], k=1)[0][0] == ids[275]
+
+    # Bulk loads defer compaction; nlist never exceeds the training sample
+    index.add([f"00000000-0000-0000-0001-{i:012d}" for i in range(100)], vectors[:100], auto_compact=False)
+    assert index.stats()["tail_rows"] == 100
+    monkeypatch.setattr(ann_index, "_TRAIN_SAMPLE_ROWS", 32)
+    index.compact(nlist=100)
+    assert index.stats()["nlist"] == 32 and index.stats()["tail_rows"] == 0
+
+
+def test_int8_quantization_and_rerank(tmp_path):
+    """int8 codes round-trip within one step per vector; re-ranking restores exact order."""
+    import numpy as np
+    from memory.ann_index import AnnIndex
+    from memory.quantization import dequantize_int8, quantize_int8
+    from memory.vector_store import rerank_full_precision
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 32)).astype(np.float32)
+    vectors[5] = 0.0  # all-zero vector must not divide by zero
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8 and scales.shape == (100,)
+    error = np.abs(dequantize_int8(codes, scales) - vectors).max(axis=1)
+    assert np.all(error <= scales / 2 + 1e-6)
+
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(100)]
+    index = AnnIndex(str(tmp_path / "idx"), dtype="int8")
+    index.add(ids, vectors)
+    assert AnnIndex(str(tmp_path / "idx")).search(vectors[42], k=1)[0][0] == ids[42]
+
+    candidates = {ids[i]: vectors[i] for i in (7, 42, 9)}
+    ranked = rerank_full_precision(vectors[42], candidates, k=2)
+    assert ranked[0] == {"article_id": ids[42], "distance": 0.0}
+    assert len(ranked) == 2
+
+
+def test_ticker_matcher_symbols_aliases_and_short_symbols():
+    """One scan finds symbols, cashtags and aliases; short symbols need a marker."""
+    from agent.tools.ticker_matcher import TickerMatcher
+
+    matcher = TickerMatcher(
+        ["AAPL", "MSFT", "IT", "A", "NOW", "BRK.B"],
+        aliases={"AAPL": ["Apple"], "BRK.B": ["Berkshire Hathaway"], "TSLA": ["Tesla"]},
+    )
+    assert matcher.match("IT spending lifts MSFT; A rally NOW") == ["MSFT"]
+    assert matcher.match("Gartner (IT) and $now rise, NYSE: A flat") == ["IT", "NOW", "A"]
+    assert matcher.match("Berkshire Hathaway trims Apple stake; AAPL falls") == ["BRK.B", "AAPL"]
+    assert matcher.match("Tesla and apple pie") == []
+
+    symbols = [f"T{i:04d}" for i in range(5000)]
+    assert TickerMatcher(symbols).match("Shares of T4321 and T0007 jump") == ["T4321", "T0007"]
+
+
+def test_dedupe_canonical_urls_and_near_duplicates():
+    """Tracking variants and syndicated rewrites collapse onto the first article."""
+    from agent.analysis.dedupe import canonicalize_url, dedupe_articles
+    from agent.state import Article
+
+    assert canonicalize_url("http://WWW.Example.com:443/a/b/?utm_source=x&id=7&fbclid=1#top") == \
+        "https://example.com/a/b?id=7"
+    assert canonicalize_url("https://example.com/story?src=rss&ref=home") == "https://example.com/story?ref=home&src=rss"
+
+    story = "Apple shares rose 3% on Tuesday after the company reported record iPhone sales and raised its dividend"
+    articles = [
+        Article(ticker="AAPL", title="Apple beats", url="https://example.com/a?utm_medium=rss", summary=story, source="wire"),
+        Article(ticker="AAPL", title="Apple beats", url="https://www.example.com/a/", summary="dup", source="feed"),
+        Article(ticker="AAPL", title="Apple beats estimates", url="https://other.com/x", summary=story + " again", source="syndicated"),
+        Article(ticker="AAPL", title="Apple faces EU probe", url="https://example.com/b", summary="Regulators opened an inquiry into App Store rules"),
+        Article(ticker="MSFT", title="Apple beats", url="https://msft.example.com/x", summary=story),
+    ]
+    unique = dedupe_articles(articles)
+
+    # kept articles link to the URL as fetched; canonical forms are only compared
+    assert [a.url for a in unique] == ["https://example.com/a?utm_medium=rss", "https://example.com/b", "https://msft.example.com/x"]
+    duplicates = unique[0].raw["duplicates"]
+    assert [(d["source"], d["match"]) for d in duplicates] == [("feed", "url"), ("syndicated", "content")]
+
+
+def test_seen_index_splits_known_and_changed_articles(tmp_path):
+    """Unchanged stored articles are reused; edited or unembedded ones are reprocessed."""
+    from agent.state import Article
+    from memory.local_cache import SqliteCache
+    from memory.seen_index import SeenIndex
+
+    index = SeenIndex(SqliteCache("seen", db_path=str(tmp_path / "c.sqlite3")))
+    a = Article(ticker="AAPL", title="Apple beats", url="https://example.com/a", summary="x", relevance=0.4, sentiment=0.5)
+    b = Article(ticker="AAPL", title="Apple misses", url="https://example.com/b", summary="y")
+    c = Article(ticker="AAPL", title="Apple flat", url="https://example.com/c", summary="z")
+    index.record([a, b], {a.url: "id-a", b.url: "id-b"})
+    index.record([c], {c.url: "id-c"}, embedded=False)
+
+    edited = b.model_copy(update={"summary": "y, updated"})
+    new = Article(ticker="AAPL", title="New", url="https://example.com/d")
+    fresh, known = index.partition([a.model_copy(update={"relevance": None}), edited, c, new])
+
+    assert [x.url for x in fresh] == [edited.url, c.url, new.url]
+    assert [(x.url, e["relevance"], e["article_id"]) for x, e in known] == [(a.url, 0.4, "id-a")]
+
+
+def test_seen_index_warms_articles_without_vectors_as_unembedded(tmp_path, monkeypatch):
+    """Warming keeps articles whose embedding never landed eligible for another embedding pass."""
+    import types
+    import memory.seen_index as seen_index
+    from agent.state import Article
+    from memory.local_cache import SqliteCache
+
+    monkeypatch.setattr(seen_index, "embed_table_name", lambda: "embeddings_hf")
+    pages = [[
+        {"id": "id-a", "url": "https://example.com/a", "title": "Apple beats", "summary": "x", "embeddings_hf": {"article_id": "id-a"}},
+        {"id": "id-b", "url": "https://example.com/b", "title": "Apple misses", "summary": "y", "embeddings_hf": None},
+    ], []]
+    selects = []
+
+    class _Query:
+        def select(self, columns):
+            selects.append(columns)
+            return self
+
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: self
+
+        def execute(self):
+            return types.SimpleNamespace(data=pages.pop(0))
+
+    index = seen_index.SeenIndex(SqliteCache("seen", db_path=str(tmp_path / "c.sqlite3")))
+    assert index.warm_from_supabase(types.SimpleNamespace(table=lambda name: _Query())) == 2
+    assert "embeddings_hf(article_id)" in selects[0]
+
+    a = Article(ticker="AAPL", title="Apple beats", url="https://example.com/a", summary="x")
+    b = Article(ticker="AAPL", title="Apple misses", url="https://example.com/b", summary="y")
+    fresh, known = index.partition([a, b])
+    assert fresh == [b] and [x for x, _ in known] == [a]
+
+
+def test_supabase_client_is_shared_and_counts_requests(httpx_mock, monkeypatch):
+    """One client per process; REST and Storage go through the same pooled transport."""
+    import memory.supabase_client as supabase_client
+
+    monkeypatch.setenv("SUPABASE_URL", "https://example.supabase.co")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "test-key")
+    monkeypatch.setattr(supabase_client, "_client", None)
+    httpx_mock.add_response(json=[{"id": "run-1"}])
+
+    sb = supabase_client.get_supabase_client()
+    assert supabase_client.get_supabase_client() is sb
+    assert sb.postgrest.session is sb.storage._client
+
+    before = supabase_client.supabase_pool_stats()["requests"]
+    rows = sb.table("runs").select("id").execute().data
+    assert rows == [{"id": "run-1"}]
+    assert supabase_client.supabase_pool_stats()["requests"] == before + 1
+
+
+def test_supabase_sql_engine_is_lazy(monkeypatch):
+    """Importing the SQL layer without SUPABASE_DB_URL is fine; using it is not."""
+    import memory.supabase_sql as supabase_sql
+
+    monkeypatch.setattr(supabase_sql, "_db_url", None)
+    monkeypatch.setattr(supabase_sql, "_engine", None)
+    assert not supabase_sql.sql_enabled()
+    with pytest.raises(ValueError):
+        supabase_sql.get_engine()
+
+    assert supabase_sql._async_url("postgres://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+    assert supabase_sql._async_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+    assert supabase_sql._async_url("postgresql+asyncpg://u@h/db") == "postgresql+asyncpg://u@h/db"
+
+
+def test_signed_url_cache_batches_and_reuses_until_near_expiry(monkeypatch):
+    """Misses are signed in bulk; cached links are reused until the refresh margin."""
+    import apps.api.signed_urls as signed_urls
+
+    calls = []
+
+    def _sign(self, bucket, paths):
+        calls.append(list(paths))
+        return {p: f"https://signed/{p}" for p in paths if not p.endswith("missing.pdf")}
+
+    monkeypatch.setattr(signed_urls.SignedUrlCache, "_sign", _sign)
+    cache = signed_urls.SignedUrlCache(ttl=3600, refresh_margin=300)
+
+    first = cache.get_many("reports", ["a.md", "b.md", None, "missing.pdf"])
+    assert first == {"a.md": "https://signed/a.md", "b.md": "https://signed/b.md", "missing.pdf": None}
+    assert calls == [["a.md", "b.md", "missing.pdf"]]
+
+    cache.get_many("reports", ["a.md", "c.md"])
+    assert calls[-1] == ["c.md"]
+
+    now = signed_urls.time.time()
+    monkeypatch.setattr(signed_urls.time, "time", lambda: now + 3600 - 200)
+    cache.get_many("reports", ["a.md"])
+    assert calls[-1] == ["a.md"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_find_similar_articles_stays_local_for_float16_index(tmp_path, monkeypatch):
+    """Only an int8 index re-ranks through Supabase; float16 lookups never touch it."""
+    import numpy as np
+    import memory.vector_store as vector_store
+    from memory.ann_index import AnnIndex
+
+    index = AnnIndex(str(tmp_path / "idx"), dtype="float16")
+    vectors = np.random.default_rng(0).normal(size=(20, 8)).astype(np.float32)
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(20)]
+    index.add(ids, vectors)
+
+    def _no_database():
+        raise AssertionError("unexpected Supabase round trip")
+
+    monkeypatch.setattr(vector_store, "_storage_mode", "float32")
+    monkeypatch.setattr(vector_store, "_rerank_factor", 4)
+    monkeypatch.setattr(vector_store, "get_ann_index", lambda table: index)
+    monkeypatch.setattr(vector_store, "get_supabase_client", _no_database)
+
+    results = vector_store.find_similar_articles(ids[0], k=3)
+    assert len(results) == 3 and ids[0] not in [r["article_id"] for r in results]